@@ -0,0 +1,34 @@
+from fastapi import Request
+
+from app.services.container import ServiceContainer
+from app.services.vector_store import VectorStoreService
+from app.services.document_processor import DocumentProcessor
+from app.services.document_registry import DocumentRegistry
+from app.services.rag_agent import RAGAgent
+from app.services.ingestion_queue import IngestionJobQueue
+
+# 以下依赖为同步函数，FastAPI 在线程池中执行，首次构建服务时不会阻塞事件循环
+
+
+def get_services(request: Request) -> ServiceContainer:
+    return request.app.state.services
+
+
+def get_vector_store_service(request: Request) -> VectorStoreService:
+    return get_services(request).vector_store_service
+
+
+def get_document_processor(request: Request) -> DocumentProcessor:
+    return get_services(request).document_processor
+
+
+def get_document_registry(request: Request) -> DocumentRegistry:
+    return get_services(request).document_registry
+
+
+def get_rag_agent(request: Request) -> RAGAgent:
+    return get_services(request).rag_agent
+
+
+def get_ingestion_queue(request: Request) -> IngestionJobQueue:
+    return get_services(request).ingestion_queue
@@ -1,79 +1,132 @@
 import os
-import tempfile
 from datetime import datetime
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from app.models.schemas import (
     DocumentUpload, DocumentInfo, QueryRequest, QueryResponse, HealthCheck
 )
+from app.api.dependencies import (
+    get_services, get_vector_store_service, get_document_processor,
+    get_document_registry, get_rag_agent, get_ingestion_queue
+)
+from app.services.container import ServiceContainer
 from app.services.document_processor import DocumentProcessor
 from app.services.vector_store import VectorStoreService
 from app.services.rag_agent import RAGAgent
+from app.services.ingestion_queue import IngestionJobQueue, IngestionQueueFullError
+from app.services.document_registry import DocumentRegistry
+from app.utils.helpers import format_sse
+from app.utils.upload_stream import receive_upload, UploadRejectedError, UploadTooLargeError
 
 router = APIRouter()
 
-# 全局服务实例
-vector_store_service = VectorStoreService()
-document_processor = DocumentProcessor()
-rag_agent = RAGAgent(vector_store_service)
+# 服务实例在应用启动时由 ServiceContainer 延迟构建，通过依赖注入获取
+# 阻塞调用（SQLite、向量库、多进程部署时检索服务的套接字调用）不能在事件循环中执行：
+# 只做阻塞调用的接口定义为普通函数，由FastAPI放入线程池；异步接口中使用 run_in_threadpool
 
 
-@router.post("/upload", summary="上传文档")
-async def upload_document(file: UploadFile = File(...)):
-    """上传并处理文档"""
+@router.post(
+    "/upload",
+    summary="上传文档",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"]
+                    }
+                }
+            }
+        }
+    }
+)
+async def upload_document(request: Request,
+                          document_processor: DocumentProcessor = Depends(get_document_processor),
+                          document_registry: DocumentRegistry = Depends(get_document_registry),
+                          ingestion_queue: IngestionJobQueue = Depends(get_ingestion_queue)):
+    """流式接收上传文档并提交后台入库任务，立即返回任务ID"""
     try:
-        # 验证文件
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="文件名不能为空")
-
-        # 创建临时文件
-        temp_file = tempfile.NamedTemporaryFile(
-            delete=False,
-            suffix=os.path.splitext(file.filename)[1]
-        )
+        # 边接收边写入临时文件（由入库任务在处理完成后删除）
+        upload = await receive_upload(request)
 
         try:
-            # 保存上传的文件
-            content = await file.read()
-            temp_file.write(content)
-            temp_file.close()
+            # 相同内容的文件已入库时直接返回已有的文档块ID
+            existing = await run_in_threadpool(document_registry.find_by_hash, upload["file_hash"])
+            if existing:
+                os.unlink(upload["file_path"])
+                return {
+                    "message": "文档内容未变化，已跳过处理",
+                    "job_id": None,
+                    "status": "duplicate",
+                    "filename": upload["filename"],
+                    "file_size": upload["file_size"],
+                    "result": IngestionJobQueue.duplicate_result(existing),
+                    "upload_time": datetime.now().isoformat()
+                }
 
             # 验证文件
-            document_processor.validate_file(temp_file.name, file.filename)
-
-            # 处理文档
-            documents = document_processor.process_file(temp_file.name, file.filename)
-
-            # 存储到向量数据库
-            doc_ids = vector_store_service.add_documents(documents)
-
-            # 返回结果
-            return {
-                "message": "文档上传成功",
-                "filename": file.filename,
-                "chunks_count": len(documents),
-                "document_ids": doc_ids,
-                "file_size": len(content),
-                "upload_time": datetime.now().isoformat()
-            }
+            await run_in_threadpool(document_processor.validate_file, upload["file_path"], upload["filename"])
+
+            # 提交入库任务
+            job = await run_in_threadpool(
+                ingestion_queue.submit,
+                upload["file_path"], upload["filename"], upload["file_size"], upload["file_hash"]
+            )
+
+        except Exception:
+            # 未能提交任务时清理临时文件
+            if os.path.exists(upload["file_path"]):
+                os.unlink(upload["file_path"])
+            raise
 
-        finally:
-            # 清理临时文件
-            if os.path.exists(temp_file.name):
-                os.unlink(temp_file.name)
+        return {
+            "message": "文档已提交处理",
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "filename": upload["filename"],
+            "file_size": upload["file_size"],
+            "upload_time": datetime.now().isoformat()
+        }
 
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadRejectedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except IngestionQueueFullError as e:
+        raise HTTPException(status_code=429, detail=f"文档处理队列已满，请稍后重试: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"文档处理失败: {str(e)}")
 
 
+@router.get("/jobs", summary="获取入库任务列表")
+def list_jobs(limit: int = 50, ingestion_queue: IngestionJobQueue = Depends(get_ingestion_queue)):
+    """获取最近的入库任务"""
+    return {"jobs": ingestion_queue.list_jobs(limit)}
+
+
+@router.get("/jobs/{job_id}", summary="查询入库任务状态")
+def get_job(job_id: str, ingestion_queue: IngestionJobQueue = Depends(get_ingestion_queue)):
+    """查询入库任务的状态、进度与错误信息"""
+    job = ingestion_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
 @router.post("/query", response_model=QueryResponse, summary="问答查询")
-async def query_documents(request: QueryRequest):
+async def query_documents(request: QueryRequest, rag_agent: RAGAgent = Depends(get_rag_agent)):
     """处理用户查询"""
     try:
         if not request.question.strip():
             raise HTTPException(status_code=400, detail="问题不能为空")
 
         # 处理查询
-        result = rag_agent.process_query(
+        result = await rag_agent.aprocess_query(
             query=request.question,
             session_id=request.session_id,
             max_results=request.max_results or 5
@@ -85,26 +138,90 @@ async def query_documents(request: QueryRequest):
         raise HTTPException(status_code=500, detail=f"查询处理失败: {str(e)}")
 
 
+@router.post("/query/stream", summary="流式问答查询")
+async def query_documents_stream(request: QueryRequest, rag_agent: RAGAgent = Depends(get_rag_agent)):
+    """以Server-Sent Events流式返回回答：先发送来源，再逐段发送token，最后发送计时信息"""
+    if not request.question.strip():
+        raise HTTPException(status_code=400, detail="问题不能为空")
+
+    async def event_stream():
+        async for event in rag_agent.astream_query(
+            query=request.question,
+            session_id=request.session_id,
+            max_results=request.max_results or 5
+        ):
+            yield format_sse(event["event"], event["data"])
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/documents", summary="获取文档列表")
-async def get_documents():
-    """获取已上传的文档列表"""
+def get_documents(page: int = 1,
+                  page_size: int = 20,
+                  vector_store_service: VectorStoreService = Depends(get_vector_store_service),
+                  document_registry: DocumentRegistry = Depends(get_document_registry)):
+    """分页获取已上传的文档列表（按上传时间倒序）"""
+    if page < 1 or not 1 <= page_size <= 100:
+        raise HTTPException(status_code=400, detail="分页参数无效: page >= 1, 1 <= page_size <= 100")
+
     try:
         collection_info = vector_store_service.get_collection_info()
+        rows = document_registry.list_documents(offset=(page - 1) * page_size, limit=page_size)
+        documents = [
+            DocumentInfo(
+                id=row['document_id'],
+                filename=row['filename'],
+                upload_time=row['upload_time'],
+                chunks_count=row['chunks_count'],
+                status=row['status'],
+                metadata={"file_hash": row['file_hash'], "file_size": row['file_size']}
+            )
+            for row in rows
+        ]
         return {
             "total_documents": collection_info.get('total_documents', 0),
+            "total_files": document_registry.count(),
+            "page": page,
+            "page_size": page_size,
+            "documents": documents,
             "collection_name": collection_info.get('collection_name', ''),
+            "vector_backend": collection_info.get('vector_backend', ''),
             "persist_directory": collection_info.get('persist_directory', '')
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取文档列表失败: {str(e)}")
 
 
+@router.delete("/documents/{document_id}", summary="删除文档")
+def delete_document(document_id: str, ingestion_queue: IngestionJobQueue = Depends(get_ingestion_queue)):
+    """按文档ID删除该文件的全部文档块（经入库队列执行，与同一文档的入库任务串行）"""
+    try:
+        document = ingestion_queue.delete_document(document_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"删除文档失败: {str(e)}")
+    if document is None:
+        raise HTTPException(status_code=404, detail="文档不存在")
+
+    return {
+        "message": "文档已删除",
+        "document_id": document_id,
+        "filename": document['filename'],
+        "chunks_removed": len(document['chunk_ids'])
+    }
+
+
 @router.delete("/documents", summary="清空所有文档")
-async def clear_documents():
+def clear_documents(vector_store_service: VectorStoreService = Depends(get_vector_store_service),
+                    document_registry: DocumentRegistry = Depends(get_document_registry)):
     """清空所有文档"""
     try:
         success = vector_store_service.reset_collection()
         if success:
+            document_registry.clear()
             return {"message": "所有文档已清空"}
         else:
             raise HTTPException(status_code=500, detail="清空文档失败")
@@ -112,30 +229,54 @@ async def clear_documents():
         raise HTTPException(status_code=500, detail=f"清空文档失败: {str(e)}")
 
 
-@router.post("/memory/clear", summary="清空对话记忆")
-async def clear_memory():
-    """清空对话记忆"""
+@router.post("/memory/clear", summary="清空会话的对话记忆")
+def clear_memory(session_id: str, rag_agent: RAGAgent = Depends(get_rag_agent)):
+    """清空指定会话的对话记忆（清空全部会话使用 /memory/clear_all）"""
+    if not session_id:
+        raise HTTPException(status_code=400, detail="缺少session_id")
     try:
-        rag_agent.clear_memory()
-        return {"message": "对话记忆已清空"}
+        rag_agent.clear_memory(session_id)
+        return {"message": "对话记忆已清空", "session_id": session_id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"清空记忆失败: {str(e)}")
+
+
+@router.post("/memory/clear_all", summary="清空全部会话的对话记忆")
+def clear_all_memory(rag_agent: RAGAgent = Depends(get_rag_agent)):
+    """管理操作：清空所有用户的对话记忆"""
+    try:
+        rag_agent.clear_all_memory()
+        return {"message": "全部对话记忆已清空"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"清空记忆失败: {str(e)}")
 
 
 @router.get("/memory/info", summary="获取记忆信息")
-async def get_memory_info():
-    """获取记忆信息"""
+def get_memory_info(session_id: Optional[str] = None, rag_agent: RAGAgent = Depends(get_rag_agent)):
+    """获取记忆信息，指定session_id时返回该会话详情"""
     try:
-        return rag_agent.get_memory_info()
+        return rag_agent.get_memory_info(session_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取记忆信息失败: {str(e)}")
 
 
+@router.get("/stats", summary="获取缓存与批处理统计")
+async def get_stats(vector_store_service: VectorStoreService = Depends(get_vector_store_service),
+                    rag_agent: RAGAgent = Depends(get_rag_agent)):
+    """获取各级缓存的命中统计、查询向量微批直方图、LLM网关的重试/排队统计与查询合并统计"""
+    return {
+        **await run_in_threadpool(vector_store_service.get_cache_stats),
+        "answer_cache": rag_agent.answer_cache.get_stats(),
+        "llm_gateway": rag_agent.llm_gateway.get_stats(),
+        "query_coalescing": rag_agent.query_coalescer.get_stats()
+    }
+
+
 @router.get("/health", response_model=HealthCheck, summary="健康检查")
-async def health_check():
+def health_check(vector_store_service: VectorStoreService = Depends(get_vector_store_service)):
     """健康检查"""
     try:
-        # 检查向量存储
+        # 检查向量存储（计数为O(1)操作，不扫描集合）
         collection_info = vector_store_service.get_collection_info()
 
         return HealthCheck(
@@ -148,4 +289,20 @@ async def health_check():
             status="unhealthy",
             message=f"服务异常: {str(e)}",
             timestamp=datetime.now()
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/health/live", summary="存活检查")
+async def liveness():
+    """进程存活即返回，不访问任何服务"""
+    return {"status": "alive", "timestamp": datetime.now()}
+
+
+@router.get("/health/ready", summary="就绪检查")
+async def readiness(services: ServiceContainer = Depends(get_services)):
+    """服务构建与预热完成后返回200，否则返回503；附带各服务构建耗时与冷启动耗时"""
+    status = services.get_status()
+    return JSONResponse(
+        status_code=200 if services.is_ready() else 503,
+        content={"status": "ready" if services.is_ready() else "not_ready", **status}
+    )
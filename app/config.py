@@ -14,7 +14,27 @@ class Settings(BaseSettings):
 
     # 向量数据库设置
     CHROMA_DB_PATH: str = "./chroma_db"
-    EMBEDDING_MODEL: str = "text-embedding-3-small"
+    VECTOR_BACKEND: str = "chroma"  # chroma / numpy（中小规模语料的精确暴力检索）
+    NUMPY_INDEX_PATH: str = "./chroma_db/numpy_index"
+    NUMPY_INDEX_DTYPE: str = "float16"  # float16 内存减半；float32 检索时无需转换，延迟更低
+    NUMPY_SEARCH_BLOCK_SIZE: int = 4096  # 暴力检索时每次参与矩阵乘法的行数
+    NUMPY_QUANTIZATION: str = "none"  # none / int8 / pq：第一轮检索使用的压缩编码，候选再用原始向量精排
+    NUMPY_RESCORE_FACTOR: int = 4  # 压缩编码检索的候选数 = top-k × 该倍数
+    NUMPY_PQ_SUBVECTORS: int = 48  # PQ子空间数（每向量编码字节数），需整除向量维度
+    NUMPY_PQ_TRAIN_SIZE: int = 10000  # 文档块达到该数量后训练PQ码本，此前使用精确检索
+    DOCUMENT_REGISTRY_PATH: str = "./chroma_db/document_registry.db"  # 文件哈希登记表
+    CORPUS_VERSION_PATH: str = "./chroma_db/corpus_version.db"  # 语料版本计数器，使用同一数据目录的进程共享
+    EMBEDDING_MODEL: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"  # "onnx:<导出目录>" 使用ONNX Runtime引擎
+    EMBEDDING_ONNX_QUANTIZED: bool = True  # 导出目录中有 model_quantized.onnx（动态int8）时优先使用
+    EMBEDDING_ONNX_THREADS: int = 0  # ONNX Runtime 算子内线程数，0表示使用默认值（物理核数）
+    EMBEDDING_ONNX_BATCH_SIZE: int = 32  # 按长度排序后每次推理的文本数
+    EMBEDDING_MAX_SEQ_LENGTH: int = 128  # 与 sentence-transformers 模型的 max_seq_length 一致
+    QUERY_EMBEDDING_CACHE_SIZE: int = 10000  # 查询向量LRU缓存条数，0表示关闭
+    EMBEDDING_BATCH_WINDOW_MS: float = 5.0  # 查询向量微批收集窗口（毫秒），0表示关闭
+    EMBEDDING_BATCH_MAX_SIZE: int = 32  # 查询向量微批最大批大小
+    EMBEDDING_CACHE_ENABLED: bool = True  # 文档块向量持久化缓存，重建索引时复用
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache/embeddings.db"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 1000000
 
     # 文档处理设置
     MAX_FILE_SIZE: int = 10 * 1024 * 1024  # 10MB
@@ -22,9 +42,81 @@ class Settings(BaseSettings):
     CHUNK_SIZE: int = 350
     CHUNK_OVERLAP: int = 50
 
+    # 后台入库设置
+    INGEST_MAX_WORKERS: int = 2  # 并发入库任务数，避免上传高峰挤占查询
+    INGEST_MAX_PENDING_JOBS: int = 100  # 排队与执行中的任务上限
+    INGEST_JOB_HISTORY: int = 1000  # 保留的已结束任务数
+    INGEST_BATCH_SIZE: int = 64  # 每批向量化并写入的文档块数
+
     # 检索设置
     SIMILARITY_THRESHOLD: float = 0.6
     MAX_RETRIEVED_DOCS: int = 5
+    CONTEXT_MAX_TOKENS: int = 2000  # 提示词中检索上下文的token预算
+    CONTEXT_MERGE_ADJACENT: bool = True  # 合并同一文档中相邻的文档块并去掉分块重叠
+
+    # 混合检索设置（BM25词法索引 + 稠密向量，倒数排名融合）
+    HYBRID_SEARCH_ENABLED: bool = True
+    HYBRID_CANDIDATE_MULTIPLIER: int = 4  # 两路各召回 max_results 的倍数后再融合
+    HYBRID_RRF_K: int = 60  # RRF 平滑常数：score = Σ 1 / (k + rank)
+    LEXICAL_INDEX_PATH: str = "./chroma_db/lexical_index.db"
+    LEXICAL_MAX_QUERY_TERMS: int = 32
+    LEXICAL_MAX_POSTINGS: int = 5000  # 单次检索遍历的倒排表总长度上限，超出后忽略更高频的词项
+
+    # 重排序设置
+    RERANKER: str = "none"  # none / lexical / cross-encoder / stub
+    RERANK_MODEL: str = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+    RERANK_CANDIDATE_MULTIPLIER: int = 4  # 召回 max_results 的倍数作为重排序候选
+    RERANK_TIME_BUDGET_MS: float = 200.0  # 重排序时间预算，超出时不等待打分结果，使用检索顺序
+    RERANK_BATCH_SIZE: int = 32
+    RERANK_MAX_WORKERS: int = 4  # 重排序打分线程数（超时的打分在后台完成前仍占用线程）
+
+    # 语义答案缓存设置
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # 查询向量余弦相似度达到该值视为同一问题
+    ANSWER_CACHE_TTL: int = 3600  # 缓存答案有效期（秒）
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+
+    # 并发设置
+    QUERY_MAX_CONCURRENCY: int = 32  # 同时处理的查询数上限
+    RETRIEVAL_MAX_WORKERS: int = 16  # 嵌入/检索线程池大小（同时也是查询向量微批的并发上限）
+    QUERY_COALESCING_ENABLED: bool = True  # 同时到达的相同无历史查询（规范化问题 + max_results + 语料版本）合并为一次检索与生成
+
+    # LLM调用设置
+    LLM_TIMEOUT: float = 60.0  # 单次请求超时（秒）：非流式为整个请求，流式为首个token之前
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_MAX_RETRIES: int = 3  # 429、5xx、超时与连接错误的重试次数
+    LLM_RETRY_BACKOFF: float = 0.5  # 全抖动指数退避的基数（秒）
+    LLM_RETRY_MAX_BACKOFF: float = 8.0
+    LLM_MAX_CONCURRENCY: int = 16  # 同时发往LLM的请求数上限，超出时排队
+    LLM_MAX_CONNECTIONS: int = 32  # 长连接池大小（对冲请求也占用连接）
+    LLM_KEEPALIVE_EXPIRY: float = 30.0  # 空闲连接保留时间（秒）
+    LLM_HEDGE_DELAY: float = 0.0  # 请求超过该时间（秒）未返回时发送对冲请求，0表示关闭
+    LLM_HEDGE_MAX_RATIO: float = 0.1  # 对冲请求数占请求总数的上限
+
+    # 对话记忆设置
+    MEMORY_BACKEND: str = "memory"  # memory: 进程内存储, sqlite: 持久化并可多进程共享
+    MEMORY_SQLITE_PATH: str = "./memory.db"
+    MEMORY_WINDOW: int = 5  # 每个会话保留的对话轮数
+    MEMORY_MAX_SESSIONS: int = 10000  # 会话数上限，超出按LRU淘汰
+    MEMORY_SESSION_TTL: int = 3600  # 会话空闲过期时间（秒）
+    MEMORY_MAX_TOKENS_PER_SESSION: int = 4000  # 单个会话历史的token预算
+    HISTORY_SUMMARY_ENABLED: bool = True  # 回答返回后在后台把最近一轮之前的对话并入滚动摘要
+    HISTORY_MAX_TOKENS: int = 1000  # 提示词中对话历史（摘要 + 最近一轮）的token上限
+    HISTORY_SUMMARY_MAX_TOKENS: int = 300  # 滚动摘要的token上限
+
+    # 启动设置
+    SERVICES_PRELOAD: bool = True  # 启动后在后台线程构建服务并预热，False 时在首个请求时构建
+    WARMUP_EMBEDDING_PASSES: int = 2  # 预热时执行的查询向量化与检索次数，0表示不预热
+    WARMUP_QUERY: str = "系统预热查询"
+
+    # 多进程部署设置（python -m app.serve）
+    API_WORKERS: int = 0  # API工作进程数，0表示按CPU核数
+    SEARCH_SERVER_SOCKET: Optional[str] = None  # 设置后通过该本地套接字使用共享的嵌入/检索服务进程，API进程不再加载模型、打开向量库
+    SEARCH_SERVER_AUTHKEY: Optional[str] = None  # 套接字连接的认证密钥（至少16个字符，无默认值），app.serve 每次启动生成随机密钥
+    SEARCH_CLIENT_POOL_SIZE: int = 16  # 每个API进程到检索服务的连接数（即并发调用上限）
+
+    # 监控设置
+    METRICS_ENABLED: bool = True  # 在 /metrics 暴露Prometheus指标
 
     # 日志设置
     LOG_LEVEL: str = "INFO"
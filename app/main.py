@@ -1,10 +1,14 @@
 import logging
+from contextlib import asynccontextmanager
+
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
 from app.api.endpoints import router
+from app.services.container import ServiceContainer
+from app.utils import metrics
 
 # 配置日志
 logging.basicConfig(
@@ -12,11 +16,25 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """启动时创建服务容器（默认在后台预加载模型与索引），就绪状态见 /health/ready"""
+    app.state.services = ServiceContainer()
+    metrics.service_stats_collector.bind(app.state.services)
+    app.state.services.start()
+    yield
+    await app.state.services.aclose()
+    metrics.mark_process_dead()
+
+
 # 创建FastAPI应用
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version="1.0.0",
-    description="基于大模型的智能文档问答系统"
+    description="基于大模型的智能文档问答系统",
+    lifespan=lifespan
 )
 
 # 添加CORS中间件
@@ -31,6 +49,14 @@ app.add_middleware(
 # 包含API路由
 app.include_router(router, prefix=settings.API_V1_STR)
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        """Prometheus抓取端点"""
+        return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     uvicorn.run(
         "app.main:app",
@@ -36,7 +36,17 @@ class QueryResponse(BaseModel):
     sources: List[SourceInfo]
     confidence: float
     retrieved_count: int
-    processing_time: float
+    processing_time: float  # 总耗时
+    retrieval_time: Optional[float] = None  # 检索耗时
+    time_to_first_token: Optional[float] = None  # 首个token耗时（仅流式）
+    stage_timings: Optional[Dict[str, float]] = None  # 各阶段耗时：embedding/cache_lookup/retrieval/rerank/prompt/generation
+    context_tokens: Optional[int] = None  # 提示词中检索上下文的token数
+    context_tokens_saved: Optional[int] = None  # 合并相邻文档块与token预算节省的token数
+    history_tokens: Optional[int] = None  # 提示词中对话历史（摘要 + 最近一轮）的token数
+    prompt_tokens: Optional[int] = None  # 发送给LLM的完整提示词token数
+    completion_tokens: Optional[int] = None  # LLM生成回答的token数
+    cached: bool = False  # 是否来自语义答案缓存
+    coalesced: bool = False  # 是否加入了进行中的相同查询（共享其检索与生成）
     session_id: Optional[str] = None
 
 
@@ -0,0 +1,110 @@
+"""
+多进程部署启动器：先启动共享的嵌入/检索服务进程，再以多个 uvicorn 工作进程运行无状态的API
+
+- 嵌入模型、向量库、词法索引与入库队列只在检索服务进程中加载一份，工作进程经本地套接字调用，
+  每个工作进程只有 FastAPI 与LLM客户端的内存开销
+- 会话记忆使用SQLite（MEMORY_BACKEND=sqlite），同一会话的请求可以落在任一工作进程
+- Prometheus 指标写入共享目录，/metrics 返回全部工作进程的汇总
+- 语义答案缓存、查询合并与LLM连接池仍在各工作进程内
+
+运行: python -m app.serve --workers 4 --port 8000
+"""
+
+import os
+import sys
+import time
+import shutil
+import secrets
+import logging
+import argparse
+import tempfile
+import subprocess
+
+import uvicorn
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def default_socket_path() -> str:
+    if sys.platform == "win32":
+        return rf"\\.\pipe\rag-search-{os.getpid()}"
+    return os.path.join(tempfile.gettempdir(), f"rag-search-{os.getpid()}.sock")
+
+
+def wait_for_search_server(process: subprocess.Popen, address: str, authkey: str, timeout: float):
+    """等待检索服务加载模型、预热并开始监听"""
+    from app.services.search_client import SearchClient, SearchServerError
+
+    client = SearchClient(address, authkey, pool_size=1)
+    deadline = time.time() + timeout
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"检索服务进程启动失败，退出码 {process.returncode}")
+        try:
+            client.ping()
+            client.close()
+            return
+        except SearchServerError:
+            if time.time() > deadline:
+                raise RuntimeError(f"等待检索服务就绪超时（{timeout}秒）")
+            time.sleep(0.2)
+
+
+def stop_process(process: subprocess.Popen, timeout: float = 30.0):
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程部署：共享的检索服务进程 + 多个API工作进程")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=settings.API_WORKERS, help="API工作进程数，0表示按CPU核数")
+    parser.add_argument("--socket", default=settings.SEARCH_SERVER_SOCKET, help="检索服务的本地套接字路径")
+    parser.add_argument("--startup-timeout", type=float, default=300.0, help="等待检索服务加载模型的时间（秒）")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    workers = args.workers or os.cpu_count() or 1
+    address = args.socket or default_socket_path()
+
+    # 工作进程与检索服务进程通过环境变量读取部署配置
+    env = {
+        "SEARCH_SERVER_SOCKET": address,
+        "SEARCH_SERVER_AUTHKEY": secrets.token_hex(16),
+    }
+    if workers > 1 and settings.MEMORY_BACKEND != "sqlite":
+        logger.warning("多个工作进程需要共享会话记忆，MEMORY_BACKEND 改为 sqlite")
+        env["MEMORY_BACKEND"] = "sqlite"
+    metrics_dir = None
+    if settings.METRICS_ENABLED and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        metrics_dir = tempfile.mkdtemp(prefix="rag-metrics-")
+        env["PROMETHEUS_MULTIPROC_DIR"] = metrics_dir
+    os.environ.update(env)
+
+    search_server = subprocess.Popen([sys.executable, "-m", "app.services.search_server", "--socket", address])
+    try:
+        start = time.time()
+        wait_for_search_server(search_server, address, env["SEARCH_SERVER_AUTHKEY"], args.startup_timeout)
+        logger.info(f"检索服务已就绪（{time.time() - start:.1f}秒），启动 {workers} 个API工作进程")
+        uvicorn.run("app.main:app", host=args.host, port=args.port, workers=workers)
+
+    finally:
+        stop_process(search_server)
+        if metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
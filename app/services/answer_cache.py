@@ -0,0 +1,139 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from app.config import settings
+
+
+class _Entry:
+    __slots__ = ("result", "max_results", "created_at")
+
+    def __init__(self, result: Dict[str, Any], max_results: int, created_at: float):
+        self.result = result
+        self.max_results = max_results
+        self.created_at = created_at
+
+
+class SemanticAnswerCache:
+    """语义答案缓存
+
+    以查询向量为键：新查询与已缓存查询的余弦相似度达到阈值时直接返回缓存的答案与来源。
+    缓存绑定语料版本，语料变化（增删文档、重置集合）后全部失效。
+    """
+
+    def __init__(self,
+                 similarity_threshold: float = settings.ANSWER_CACHE_SIMILARITY,
+                 ttl: int = settings.ANSWER_CACHE_TTL,
+                 max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES):
+        self.similarity_threshold = similarity_threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim)，已归一化
+        self._entries: List[Optional[_Entry]] = [None] * max_entries
+        self._lru: "OrderedDict[int, None]" = OrderedDict()  # 已占用槽位，按最近使用排序
+        self._corpus_version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self,
+               embedding: List[float],
+               max_results: int,
+               corpus_version: int) -> Optional[Dict[str, Any]]:
+        """查找语义相近的已缓存答案，未命中返回None"""
+        with self._lock:
+            if self._is_stale(corpus_version):
+                self.misses += 1
+                return None
+            self._sync_version(corpus_version)
+            if not self._lru:
+                self.misses += 1
+                return None
+
+            slots = np.fromiter(self._lru.keys(), dtype=np.int64, count=len(self._lru))
+            similarities = self._vectors[slots] @ self._normalize(embedding)
+
+            now = time.time()
+            for index in np.argsort(-similarities):
+                if similarities[index] < self.similarity_threshold:
+                    break
+                slot = int(slots[index])
+                entry = self._entries[slot]
+                if now - entry.created_at > self.ttl:
+                    self._remove(slot)
+                    continue
+                if entry.max_results != max_results:
+                    continue
+                self._lru.move_to_end(slot)
+                self.hits += 1
+                return entry.result
+
+            self.misses += 1
+            return None
+
+    def put(self,
+            embedding: List[float],
+            max_results: int,
+            corpus_version: int,
+            result: Dict[str, Any]):
+        """缓存答案"""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if self._is_stale(corpus_version):
+                # 生成期间语料已更新，答案可能已过期
+                return
+            self._sync_version(corpus_version)
+            vector = self._normalize(embedding)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+            if len(self._lru) >= self.max_entries:
+                slot, _ = self._lru.popitem(last=False)
+            else:
+                slot = self._entries.index(None)
+
+            self._vectors[slot] = vector
+            self._entries[slot] = _Entry(result, max_results, time.time())
+            self._lru[slot] = None
+
+    def clear(self):
+        with self._lock:
+            self._entries = [None] * self.max_entries
+            self._lru.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._lru),
+                'max_entries': self.max_entries,
+                'corpus_version': self._corpus_version,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+    def _is_stale(self, corpus_version: int) -> bool:
+        return self._corpus_version is not None and corpus_version < self._corpus_version
+
+    def _sync_version(self, corpus_version: int):
+        """语料版本变化时清空缓存，保证不返回过期语料上的答案"""
+        if corpus_version != self._corpus_version:
+            self._entries = [None] * self.max_entries
+            self._lru.clear()
+            self._corpus_version = corpus_version
+
+    def _remove(self, slot: int):
+        self._entries[slot] = None
+        self._lru.pop(slot, None)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -0,0 +1,15 @@
+"""
+Chroma 产品遥测的空实现
+
+chromadb 0.4.x 的 Posthog 客户端在未加锁的字典中合并事件，检索线程池并发调用 get/query 时
+可能重复删除同一个键并抛出 KeyError，使查询失败（与是否关闭遥测无关）。ChromaBackend 使用本实现替换。
+"""
+
+from chromadb.telemetry.product import ProductTelemetryClient, ProductTelemetryEvent
+from overrides import override
+
+
+class NoopProductTelemetry(ProductTelemetryClient):
+    @override
+    def capture(self, event: ProductTelemetryEvent) -> None:
+        pass
@@ -0,0 +1,152 @@
+import time
+import logging
+import threading
+from typing import Dict, Any, Callable, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+STATE_CREATED = "created"
+STATE_LOADING = "loading"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+STATE_LAZY = "lazy"  # 未预加载：服务在首个请求时构建
+
+
+class ServiceContainer:
+    """应用服务的延迟构建、后台预加载与预热
+
+    服务在首次访问时构建（加载嵌入模型、打开向量库），构建过程加锁只执行一次；
+    start_preload 在后台线程提前构建全部服务并执行预热检索，完成后进入就绪状态。
+    各服务的构建耗时与冷启动总耗时记录在 timings 中。
+    配置了检索服务套接字时，向量存储与入库队列使用检索服务进程的远程代理，本进程不加载模型。
+    """
+
+    def __init__(self,
+                 warmup_passes: int = settings.WARMUP_EMBEDDING_PASSES,
+                 search_server: Optional[str] = settings.SEARCH_SERVER_SOCKET):
+        self.warmup_passes = warmup_passes
+        self.search_server = search_server
+        self.created_at = time.time()
+        self.state = STATE_CREATED
+        self.error: Optional[str] = None
+        self.timings: Dict[str, float] = {}
+        self._services: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+        self._preload_thread: Optional[threading.Thread] = None
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        service = self._services.get(name)
+        if service is None:
+            with self._lock:
+                service = self._services.get(name)
+                if service is None:
+                    start = time.time()
+                    service = factory()
+                    self.timings[name] = time.time() - start
+                    self._services[name] = service
+                    logger.info(f"服务构建完成: {name}，耗时 {self.timings[name]:.2f}秒")
+        return service
+
+    def peek(self, name: str) -> Optional[Any]:
+        """返回已构建的服务，未构建时返回None（不触发构建）"""
+        return self._services.get(name)
+
+    @property
+    def search_client(self):
+        from app.services.search_client import SearchClient
+        return self._get("search_client", lambda: SearchClient(self.search_server))
+
+    @property
+    def vector_store_service(self):
+        if self.search_server:
+            from app.services.search_client import RemoteVectorStoreService
+            return self._get("vector_store_service", lambda: RemoteVectorStoreService(self.search_client))
+        from app.services.vector_store import VectorStoreService
+        return self._get("vector_store_service", VectorStoreService)
+
+    @property
+    def document_processor(self):
+        from app.services.document_processor import DocumentProcessor
+        return self._get("document_processor", DocumentProcessor)
+
+    @property
+    def document_registry(self):
+        from app.services.document_registry import DocumentRegistry
+        return self._get("document_registry", DocumentRegistry)
+
+    @property
+    def rag_agent(self):
+        from app.services.rag_agent import RAGAgent
+        return self._get("rag_agent", lambda: RAGAgent(self.vector_store_service))
+
+    @property
+    def ingestion_queue(self):
+        if self.search_server:
+            from app.services.search_client import RemoteIngestionQueue
+            return self._get("ingestion_queue", lambda: RemoteIngestionQueue(self.search_client))
+        from app.services.ingestion_queue import IngestionJobQueue
+        return self._get("ingestion_queue", lambda: IngestionJobQueue(
+            self.document_processor, self.vector_store_service, self.document_registry
+        ))
+
+    def start(self, preload: bool = settings.SERVICES_PRELOAD):
+        """应用启动时调用：预加载时在后台构建服务，否则保持延迟构建"""
+        if preload:
+            self.start_preload()
+        else:
+            self.state = STATE_LAZY
+
+    def start_preload(self):
+        """在后台线程构建全部服务并预热"""
+        self._preload_thread = threading.Thread(target=self.preload, name="service-preload", daemon=True)
+        self._preload_thread.start()
+
+    def preload(self):
+        """构建全部服务并执行预热，完成后进入就绪状态"""
+        self.state = STATE_LOADING
+        try:
+            self.vector_store_service
+            self.document_processor
+            self.document_registry
+            self.rag_agent
+            self.ingestion_queue
+
+            start = time.time()
+            self.warm_up()
+            self.timings["warm_up"] = time.time() - start
+            self.timings["cold_start"] = time.time() - self.created_at
+            self.state = STATE_READY
+            logger.info(f"服务已就绪，冷启动耗时 {self.timings['cold_start']:.2f}秒")
+
+        except Exception as e:
+            self.state = STATE_FAILED
+            self.error = str(e)
+            logger.error(f"服务预加载失败: {str(e)}")
+
+    def warm_up(self):
+        """预热嵌入模型与检索索引（使用检索服务进程时只建立连接，模型已由检索服务预热）"""
+        self.vector_store_service.warm_up(self.warmup_passes)
+
+    async def aclose(self):
+        """应用关闭时调用：释放LLM连接池与检索服务连接"""
+        rag_agent = self.peek("rag_agent")
+        if rag_agent is not None:
+            await rag_agent.llm_gateway.aclose()
+        search_client = self.peek("search_client")
+        if search_client is not None:
+            search_client.close()
+
+    def is_ready(self) -> bool:
+        return self.state in (STATE_READY, STATE_LAZY)
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'state': self.state,
+            'error': self.error,
+            'uptime': time.time() - self.created_at,
+            'services': sorted(self._services),
+            'search_server': self.search_server,
+            'timings': dict(self.timings)
+        }
@@ -0,0 +1,135 @@
+import logging
+from typing import Dict, List, Any, Tuple
+
+from langchain.schema import Document
+
+from app.config import settings
+from app.utils.helpers import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+# 相邻文档块的重叠部分短于该长度时视为巧合，不做合并去重
+MIN_OVERLAP_CHARS = 5
+
+
+class ContextPacker:
+    """按token预算把检索到的文档块打包为提示词上下文
+
+    - 按检索（或重排序）顺序依次选入文档块，放不下的跳过，直到预算用完
+    - 同一文档中 chunk_index 相邻的文档块合并为一个片段，去掉分块时的重叠文本
+    - 片段按其中最靠前的文档块排序，每个片段只输出一次来源
+    """
+
+    def __init__(self,
+                 max_tokens: int = settings.CONTEXT_MAX_TOKENS,
+                 merge_adjacent: bool = settings.CONTEXT_MERGE_ADJACENT,
+                 max_overlap_chars: int = settings.CHUNK_OVERLAP * 2):
+        self.max_tokens = max_tokens
+        self.merge_adjacent = merge_adjacent
+        self.max_overlap_chars = max_overlap_chars
+
+    def pack(self, docs_with_scores: List[Tuple[Document, float]]) -> Dict[str, Any]:
+        """返回打包后的上下文及token统计
+
+        baseline_tokens 为不合并、不限预算时（每个文档块单独输出）的token数，
+        tokens_saved 为打包后节省的token数。
+        """
+        # 来源 -> {chunk_index: (排名, 文本)}
+        sources: Dict[Any, Dict[int, Tuple[int, str]]] = {}
+        source_names: Dict[Any, str] = {}
+        source_tokens: Dict[Any, int] = {}
+        used_tokens = 0
+        baseline_tokens = 0
+        chunks_used = 0
+
+        for rank, (doc, _) in enumerate(docs_with_scores):
+            text = doc.page_content.strip()
+            if not text:
+                continue
+            name = doc.metadata.get('source', 'Unknown')
+            baseline_tokens += count_tokens(self._header(0, name)) + count_tokens(text)
+
+            index = doc.metadata.get('chunk_index')
+            if self.merge_adjacent and index is not None:
+                key = doc.metadata.get('document_id') or name
+            else:
+                key, index = ('chunk', rank), 0
+
+            chunks = sources.setdefault(key, {})
+            if index in chunks:
+                continue
+            source_names[key] = name
+            chunks[index] = (rank, text)
+
+            tokens = self._source_cost(chunks, name)
+            new_total = used_tokens - source_tokens.get(key, 0) + tokens
+            if new_total <= self.max_tokens:
+                source_tokens[key] = tokens
+                used_tokens = new_total
+                chunks_used += 1
+                continue
+
+            del chunks[index]
+            if used_tokens == 0:
+                # 排名第一的文档块本身超出预算时截断后使用
+                budget = self.max_tokens - count_tokens(self._header(0, name))
+                chunks[index] = (rank, truncate_to_tokens(text, budget))
+                source_tokens[key] = used_tokens = self._source_cost(chunks, name)
+                chunks_used += 1
+            elif not chunks:
+                del sources[key]
+
+        segments = []
+        for key, chunks in sources.items():
+            for run in self._runs(chunks):
+                segments.append((min(chunks[i][0] for i in run), source_names[key], self._merge_run(chunks, run)))
+        segments.sort(key=lambda segment: segment[0])
+
+        context = "\n\n".join(
+            f"{self._header(i + 1, name)}\n{text}" for i, (_, name, text) in enumerate(segments)
+        )
+        context_tokens = count_tokens(context)
+        return {
+            "context": context,
+            "context_tokens": context_tokens,
+            "baseline_tokens": baseline_tokens,
+            "tokens_saved": max(0, baseline_tokens - context_tokens),
+            "chunks_used": chunks_used,
+            "chunks_dropped": len(docs_with_scores) - chunks_used
+        }
+
+    @staticmethod
+    def _header(number: int, source: str) -> str:
+        return f"[{number}] 来源: {source}"
+
+    @staticmethod
+    def _runs(chunks: Dict[int, Tuple[int, str]]) -> List[List[int]]:
+        """把 chunk_index 分为连续的若干段"""
+        runs: List[List[int]] = []
+        for index in sorted(chunks):
+            if runs and index == runs[-1][-1] + 1:
+                runs[-1].append(index)
+            else:
+                runs.append([index])
+        return runs
+
+    def _merge_run(self, chunks: Dict[int, Tuple[int, str]], run: List[int]) -> str:
+        merged = chunks[run[0]][1]
+        for index in run[1:]:
+            merged = self._merge_texts(merged, chunks[index][1])
+        return merged
+
+    def _merge_texts(self, previous: str, following: str) -> str:
+        """拼接相邻文档块，去掉前一块结尾与后一块开头的重叠文本"""
+        limit = min(len(previous), len(following), self.max_overlap_chars)
+        for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+            if previous.endswith(following[:size]):
+                return previous + following[size:]
+        return f"{previous}\n{following}"
+
+    def _source_cost(self, chunks: Dict[int, Tuple[int, str]], name: str) -> int:
+        """同一来源全部片段（含来源行）的token数"""
+        return sum(
+            count_tokens(self._header(0, name)) + count_tokens(self._merge_run(chunks, run))
+            for run in self._runs(chunks)
+        )
@@ -0,0 +1,45 @@
+"""
+语料版本计数器
+
+向量库每次增删文档后递增，答案缓存与查询合并据此失效。版本保存在SQLite的单行表中，
+使用同一数据目录的所有进程（例如 uvicorn --workers N）共享同一个版本：
+任一进程写入文档后，其他进程的下一次查询即可看到新版本。
+"""
+
+import threading
+
+from app.config import settings
+from app.utils.helpers import connect_sqlite
+
+
+class CorpusVersion:
+    """持久化、可跨进程共享的语料版本"""
+
+    def __init__(self, db_path: str = settings.CORPUS_VERSION_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS corpus_version (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                version INTEGER NOT NULL
+            )
+        """)
+        conn.execute("INSERT OR IGNORE INTO corpus_version(id, version) VALUES (0, 0)")
+
+    def _connect(self):
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_sqlite(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def get(self) -> int:
+        """当前语料版本（单行主键查询，每次查询读取一次）"""
+        return self._connect().execute("SELECT version FROM corpus_version WHERE id = 0").fetchone()[0]
+
+    def bump(self):
+        """语料发生变化：版本加一（单条UPDATE，多进程并发时不会丢失递增）"""
+        self._connect().execute("UPDATE corpus_version SET version = version + 1 WHERE id = 0")
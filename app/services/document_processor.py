@@ -1,7 +1,8 @@
 import os
-import uuid
+import time
+import hashlib
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 from pathlib import Path
 
 from langchain_community.document_loaders import PyMuPDFLoader, UnstructuredWordDocumentLoader, TextLoader
@@ -9,6 +10,7 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 
 from app.config import settings
+from app.utils import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +30,30 @@ class DocumentProcessor:
             '.txt': TextLoader
         }
 
-    def process_file(self, file_path: str, filename: str) -> List[Document]:
+    @staticmethod
+    def make_document_id(filename: str) -> str:
+        """由文件名生成确定性的文档ID，同名文件的新版本沿用同一ID"""
+        return hashlib.sha256(filename.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def make_chunk_ids(document_id: str, chunks: List[Document]) -> List[str]:
+        """由文档ID与块内容哈希生成确定性的块ID，内容不变的块在新版本中ID不变"""
+        chunk_ids = []
+        seen: Dict[str, int] = {}
+        for chunk in chunks:
+            content_hash = hashlib.sha256(chunk.page_content.encode('utf-8')).hexdigest()[:16]
+            # 同一文档内重复出现的相同内容按出现次序区分
+            occurrence = seen.get(content_hash, 0)
+            seen[content_hash] = occurrence + 1
+            suffix = f"-{occurrence}" if occurrence else ""
+            chunk_ids.append(f"{document_id}-{content_hash}{suffix}")
+        return chunk_ids
+
+    def process_file(self,
+                     file_path: str,
+                     filename: str,
+                     progress_callback: Optional[Callable[..., None]] = None,
+                     document_id: Optional[str] = None) -> List[Document]:
         """处理单个文件并返回文档块"""
         try:
             file_ext = Path(filename).suffix.lower()
@@ -41,19 +66,28 @@ class DocumentProcessor:
             if not loader_class:
                 raise ValueError(f"没有找到适合的加载器: {file_ext}")
 
+            stage_start = time.time()
             loader = loader_class(file_path)
             documents = loader.load()
+            metrics.observe_ingest_stage("load", time.time() - stage_start)
+            if progress_callback:
+                progress_callback(pages_parsed=len(documents))
 
             # 分块处理
+            stage_start = time.time()
             chunks = self.text_splitter.split_documents(documents)
+            metrics.observe_ingest_stage("split", time.time() - stage_start)
 
             # 添加元数据
+            document_id = document_id or self.make_document_id(filename)
+            chunk_ids = self.make_chunk_ids(document_id, chunks)
             for i, chunk in enumerate(chunks):
                 chunk.metadata.update({
                     'source': filename,
                     'file_path': file_path,
                     'file_type': file_ext,
-                    'chunk_id': str(uuid.uuid4()),
+                    'document_id': document_id,
+                    'chunk_id': chunk_ids[i],
                     'chunk_index': i,
                     'total_chunks': len(chunks)
                 })
@@ -0,0 +1,141 @@
+import json
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+from app.config import settings
+from app.utils.helpers import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+DOCUMENT_STATUS_INDEXED = "indexed"
+
+
+class DocumentHashConflictError(Exception):
+    """相同内容的文件已以其他文档ID登记"""
+
+
+class DocumentRegistry:
+    """已入库文档的持久化目录（每个文件一行）
+
+    相同内容的文件再次上传时可直接返回已有的文档块ID，无需重新解析与向量化；
+    文档列表、文档数量与按文档删除都基于该目录完成，无需扫描整个向量集合。
+    """
+
+    def __init__(self, db_path: str = settings.DOCUMENT_REGISTRY_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_sqlite(self.db_path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                document_id TEXT PRIMARY KEY,
+                file_hash TEXT NOT NULL UNIQUE,
+                filename TEXT NOT NULL,
+                file_size INTEGER NOT NULL,
+                upload_time TEXT NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                chunks_count INTEGER NOT NULL DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'indexed'
+            );
+        """)
+        self._migrate_schema()
+        self._connect().execute(
+            "CREATE INDEX IF NOT EXISTS idx_documents_upload_time ON documents(upload_time)"
+        )
+
+    def _migrate_schema(self):
+        """为旧版本登记表补充目录字段"""
+        conn = self._connect()
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(documents)")}
+        if 'chunks_count' not in columns:
+            conn.execute("ALTER TABLE documents ADD COLUMN chunks_count INTEGER NOT NULL DEFAULT 0")
+            conn.execute("UPDATE documents SET chunks_count = json_array_length(chunk_ids)")
+        if 'status' not in columns:
+            conn.execute("ALTER TABLE documents ADD COLUMN status TEXT NOT NULL DEFAULT 'indexed'")
+
+    def find_by_hash(self, file_hash: str) -> Optional[Dict[str, Any]]:
+        """按文件内容哈希查找已入库的文档"""
+        row = self._connect().execute(
+            "SELECT * FROM documents WHERE file_hash = ?", (file_hash,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """按文档ID查找已入库的文档"""
+        row = self._connect().execute(
+            "SELECT * FROM documents WHERE document_id = ?", (document_id,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def register(self,
+                 document_id: str,
+                 file_hash: str,
+                 filename: str,
+                 file_size: int,
+                 chunk_ids: List[str]):
+        """登记已入库的文档（同一文档ID覆盖旧版本）
+
+        file_hash 唯一：相同内容已由其他文档登记时抛出 DocumentHashConflictError，
+        不能用 INSERT OR REPLACE，否则会静默删除另一文档的登记，使其文档块成为孤儿。
+        """
+        try:
+            self._connect().execute(
+                "INSERT INTO documents"
+                "(document_id, file_hash, filename, file_size, upload_time, chunk_ids, chunks_count, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(document_id) DO UPDATE SET file_hash = excluded.file_hash, "
+                "filename = excluded.filename, file_size = excluded.file_size, "
+                "upload_time = excluded.upload_time, chunk_ids = excluded.chunk_ids, "
+                "chunks_count = excluded.chunks_count, status = excluded.status",
+                (document_id, file_hash, filename, file_size, datetime.now().isoformat(),
+                 json.dumps(chunk_ids), len(chunk_ids), DOCUMENT_STATUS_INDEXED)
+            )
+        except sqlite3.IntegrityError as e:
+            if "file_hash" not in str(e):
+                raise
+            existing = self.find_by_hash(file_hash)
+            logger.error(f"登记文档 {filename} 失败，相同内容已登记为 {existing['document_id'] if existing else '未知文档'}")
+            raise DocumentHashConflictError(f"相同内容的文件已入库: {existing['filename'] if existing else file_hash}")
+        logger.info(f"已登记文档 {filename}: {document_id}")
+
+    def count(self) -> int:
+        """已入库文档（文件）数量"""
+        return self._connect().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def list_documents(self, offset: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """按上传时间倒序分页列出文档，不读取文档块ID列表"""
+        rows = self._connect().execute(
+            "SELECT document_id, file_hash, filename, file_size, upload_time, chunks_count, status "
+            "FROM documents ORDER BY upload_time DESC, document_id LIMIT ? OFFSET ?",
+            (limit, offset)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def delete(self, document_id: str) -> bool:
+        """删除文档登记，返回是否存在"""
+        cursor = self._connect().execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+        return cursor.rowcount > 0
+
+    def clear(self):
+        """清空登记表"""
+        self._connect().execute("DELETE FROM documents")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        document = dict(row)
+        document['chunk_ids'] = json.loads(document['chunk_ids'])
+        return document
@@ -0,0 +1,124 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Any, Tuple
+
+from langchain.schema.embeddings import Embeddings
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 批大小直方图的桶上界
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class EmbeddingBatcher:
+    """查询向量的动态微批调度器
+
+    并发请求提交的文本在一个短时间窗口内（或达到最大批大小时）被合并，
+    通过一次 embed_documents 批量前向计算完成，再把各自的向量返回给调用方。
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 window_ms: float = settings.EMBEDDING_BATCH_WINDOW_MS,
+                 max_batch_size: int = settings.EMBEDDING_BATCH_MAX_SIZE):
+        self.embeddings = embeddings
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+
+        self._queue: "queue.Queue[Tuple[str, Future, float]]" = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batch_histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+        self._batches = 0
+        self._items = 0
+        self._wait_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0 and self.max_batch_size > 1
+
+    def embed(self, text: str) -> List[float]:
+        """计算单条文本的向量（阻塞直到所在批次完成）"""
+        if not self.enabled:
+            return self.embeddings.embed_query(text)
+
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future.result()
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._start_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.window
+
+            # 在时间窗口内继续收集，直到达到最大批大小
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._process(batch)
+
+    def _process(self, batch: List[Tuple[str, Future, float]]):
+        # 同一批次中的重复文本只计算一次
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        started = time.perf_counter()
+        try:
+            vectors = dict(zip(texts, self.embeddings.embed_documents(texts)))
+        except Exception as e:
+            logger.error(f"批量计算查询向量失败: {str(e)}")
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for text, future, _ in batch:
+            future.set_result(vectors[text])
+        self._record(len(batch), sum(started - enqueued for _, _, enqueued in batch))
+
+    def _record(self, batch_size: int, wait_seconds: float):
+        with self._stats_lock:
+            for i, bound in enumerate(BATCH_SIZE_BUCKETS):
+                if batch_size <= bound:
+                    self._batch_histogram[i] += 1
+                    break
+            else:
+                self._batch_histogram[-1] += 1
+            self._batches += 1
+            self._items += batch_size
+            self._wait_seconds += wait_seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            labels = [str(bound) for bound in BATCH_SIZE_BUCKETS] + ["+Inf"]
+            return {
+                'enabled': self.enabled,
+                'window_ms': self.window * 1000,
+                'max_batch_size': self.max_batch_size,
+                'batches': self._batches,
+                'items': self._items,
+                'avg_batch_size': round(self._items / self._batches, 2) if self._batches else 0.0,
+                'avg_wait_ms': round(self._wait_seconds / self._items * 1000, 3) if self._items else 0.0,
+                'batch_size_histogram': dict(zip(labels, self._batch_histogram))
+            }
@@ -0,0 +1,174 @@
+"""
+嵌入模型引擎：sentence-transformers（PyTorch）或导出为ONNX的同一模型（ONNX Runtime CPU推理）
+
+EMBEDDING_MODEL 以 "onnx:" 开头时使用ONNX引擎，其后为导出目录，例如 onnx:./models/minilm-onnx。
+导出（仅导出时需要 torch / transformers / onnx）：
+
+    python -m app.services.embedding_engine export \\
+        --model sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2 --output ./models/minilm-onnx
+"""
+
+import os
+import logging
+import argparse
+from typing import List, Optional
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ONNX_PREFIX = "onnx:"
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+
+
+class OnnxEmbeddings(Embeddings):
+    """ONNX Runtime 句向量引擎，池化方式与 sentence-transformers 一致（按注意力掩码取均值）
+
+    批量输入先按token长度排序再分批，每批只填充到批内最长序列，减少无效计算。
+    """
+
+    def __init__(self,
+                 model_dir: str,
+                 quantized: bool = settings.EMBEDDING_ONNX_QUANTIZED,
+                 intra_op_threads: int = settings.EMBEDDING_ONNX_THREADS,
+                 batch_size: int = settings.EMBEDDING_ONNX_BATCH_SIZE,
+                 max_seq_length: int = settings.EMBEDDING_MAX_SEQ_LENGTH):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_dir = model_dir
+        self.batch_size = batch_size
+        model_path = os.path.join(model_dir, ONNX_QUANTIZED_MODEL_FILE)
+        if not quantized or not os.path.exists(model_path):
+            model_path = os.path.join(model_dir, ONNX_MODEL_FILE)
+        self.model_path = model_path
+
+        try:
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if intra_op_threads > 0:
+                options.intra_op_num_threads = intra_op_threads
+            options.inter_op_num_threads = 1
+            self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+            self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+            self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+            self.tokenizer.enable_truncation(max_seq_length)
+            self.tokenizer.no_padding()
+            logger.info(f"ONNX嵌入模型加载完成: {model_path}")
+
+        except Exception as e:
+            logger.error(f"ONNX嵌入模型加载失败: {str(e)}")
+            raise
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        order = np.argsort([len(encoding.ids) for encoding in encodings], kind="stable")
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            length = max(len(encodings[i].ids) for i in batch)
+            input_ids = np.zeros((len(batch), length), dtype=np.int64)
+            attention_mask = np.zeros((len(batch), length), dtype=np.int64)
+            token_type_ids = np.zeros((len(batch), length), dtype=np.int64)
+            for row, i in enumerate(batch):
+                encoding = encodings[i]
+                input_ids[row, :len(encoding.ids)] = encoding.ids
+                attention_mask[row, :len(encoding.ids)] = 1
+                token_type_ids[row, :len(encoding.ids)] = encoding.type_ids
+
+            feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = token_type_ids
+            hidden = self.session.run(None, feeds)[0]
+
+            mask = attention_mask[:, :, None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            for row, i in enumerate(batch):
+                vectors[i] = pooled[row]
+
+        return np.stack(vectors)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._embed([text.replace("\n", " ") for text in texts]).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def create_embeddings(model_name: str = settings.EMBEDDING_MODEL) -> Embeddings:
+    """根据模型名称创建嵌入引擎："onnx:<目录>" 使用ONNX Runtime，否则使用 sentence-transformers"""
+    if model_name.startswith(ONNX_PREFIX):
+        return OnnxEmbeddings(model_name[len(ONNX_PREFIX):])
+
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def embedding_cache_key(model_name: str, embeddings: Embeddings) -> str:
+    """文档向量缓存的模型键：ONNX引擎附加实际加载的模型文件，int8量化与fp32模型的向量互不混用"""
+    model_path = getattr(embeddings, "model_path", None)
+    if model_path:
+        return f"{model_name}#{os.path.basename(model_path)}"
+    return model_name
+
+
+def export_onnx(model_name: str, output_dir: str, quantize: bool = True, opset: int = 14):
+    """把 sentence-transformers 模型的Transformer部分导出为ONNX，并可选生成动态int8量化版本"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    sample = tokenizer(["导出示例 export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + ["last_hidden_state"]}
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    # 保存快速分词器（tokenizer.json），推理时只依赖 tokenizers
+    tokenizer.save_pretrained(output_dir)
+    logger.info(f"ONNX模型已导出: {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantized_path = os.path.join(output_dir, ONNX_QUANTIZED_MODEL_FILE)
+        quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        logger.info(f"int8量化模型已生成: {quantized_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入模型ONNX导出")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="导出ONNX模型并生成int8量化版本")
+    export.add_argument("--model", default="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    export.add_argument("--output", required=True)
+    export.add_argument("--no-quantize", action="store_true")
+    export.add_argument("--opset", type=int, default=14)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    export_onnx(args.model, args.output, quantize=not args.no_quantize, opset=args.opset)
+    print(f"已导出到 {args.output}，设置 EMBEDDING_MODEL=onnx:{args.output} 启用")
+
+
+if __name__ == "__main__":
+    main()
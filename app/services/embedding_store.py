@@ -0,0 +1,194 @@
+"""
+文档块向量的持久化缓存
+
+以 (嵌入模型名, 文本哈希) 为键保存向量，重建索引或迁移向量库时相同文本无需重新计算。
+
+压缩命令: python -m app.services.embedding_store compact [--max-entries N]
+"""
+
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+from langchain.schema.embeddings import Embeddings
+
+from app.config import settings
+from app.utils.helpers import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class PersistentEmbeddingCache:
+    """基于SQLite的向量缓存，超出条数上限时按最近使用时间淘汰"""
+
+    def __init__(self,
+                 db_path: str = settings.EMBEDDING_CACHE_PATH,
+                 max_entries: int = settings.EMBEDDING_CACHE_MAX_ENTRIES):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _connect(self):
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_sqlite(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """批量读取缓存向量，返回命中部分"""
+        if not hashes:
+            return {}
+        conn = self._connect()
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        # SQLite 单条语句的参数数量有限，分批查询
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *batch]
+            ).fetchall()
+            for hash_value, blob in rows:
+                found[hash_value] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        if found:
+            now = time.time()
+            conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(now, model, hash_value) for hash_value in found]
+            )
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        """批量写入向量"""
+        if not items:
+            return
+        conn = self._connect()
+        now = time.time()
+        with self._write_lock:
+            before = conn.total_changes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO embeddings(model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                    [(model, hash_value, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                     for hash_value, vector in items.items()]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._count += conn.total_changes - before
+
+            # 超出上限时一次淘汰到上限的90%，避免每次写入都触发淘汰
+            if self.max_entries > 0 and self._count > self.max_entries:
+                self._evict(conn, int(self.max_entries * 0.9))
+
+    def compact(self, max_entries: Optional[int] = None) -> Dict[str, Any]:
+        """淘汰超出上限的条目并回收数据库文件空间"""
+        conn = self._connect()
+        limit = self.max_entries if max_entries is None else max_entries
+        with self._write_lock:
+            before = self._count
+            if limit > 0 and self._count > limit:
+                self._evict(conn, limit)
+            conn.execute("VACUUM")
+        logger.info(f"向量缓存压缩完成: {before} -> {self._count} 条")
+        return {'entries_before': before, 'entries_after': self._count}
+
+    def _evict(self, conn, target: int):
+        """按最近使用时间淘汰，直到条目数不超过target"""
+        overflow = self._count - target
+        conn.execute(
+            "DELETE FROM embeddings WHERE (model, text_hash) IN "
+            "(SELECT model, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+            (overflow,)
+        )
+        self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"向量缓存淘汰 {overflow} 条最久未使用的条目")
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'db_path': self.db_path,
+            'entries': self._count,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """为文档向量化加一层持久化缓存，只对未命中的文本调用模型"""
+
+    def __init__(self, embeddings: Embeddings, cache: PersistentEmbeddingCache, model_name: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model_name = model_name
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes = [text_hash(text) for text in texts]
+        cached = self.cache.get_many(self.model_name, hashes)
+
+        missing = {}
+        for hash_value, text in zip(hashes, texts):
+            if hash_value not in cached and hash_value not in missing:
+                missing[hash_value] = text
+
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model_name, computed)
+            cached.update(computed)
+
+        logger.info(f"文档向量化: {len(texts)} 条，缓存命中 {len(texts) - len(missing)} 条")
+        return [cached[hash_value] for hash_value in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="文档块向量缓存维护")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact_parser = subparsers.add_parser("compact", help="按上限淘汰最久未使用的条目并回收磁盘空间")
+    compact_parser.add_argument("--max-entries", type=int, default=None)
+    subparsers.add_parser("stats", help="查看缓存条目数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    cache = PersistentEmbeddingCache()
+    if args.command == "compact":
+        print(cache.compact(args.max_entries))
+    else:
+        print(cache.get_stats())
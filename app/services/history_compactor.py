@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+from langchain.schema.messages import BaseMessage, HumanMessage
+
+from app.config import settings
+from app.services.memory_store import BaseMemoryStore
+from app.utils.helpers import count_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+EMPTY_HISTORY = "无对话历史"
+
+SUMMARY_PROMPT = """请把新的对话内容并入已有的对话摘要，输出更新后的摘要。
+要求：保留用户关心的问题、文档中的关键事实与结论、尚未解决的问题；省略寒暄与重复内容；使用中文，不超过{max_tokens}个字。
+
+已有摘要：
+{summary}
+
+新的对话：
+{turns}
+
+更新后的摘要："""
+
+
+def _format_message(message: BaseMessage) -> str:
+    role = "用户" if isinstance(message, HumanMessage) else "助手"
+    return f"{role}: {message.content}"
+
+
+class HistoryCompactor:
+    """对话历史压缩：最近一轮原文保留，更早的轮次并入滚动摘要
+
+    构建提示词时只读取摘要与未并入摘要的消息，并限制在 max_tokens 以内；
+    摘要由 schedule 在回答返回后于后台增量更新，不占用查询的关键路径。
+    """
+
+    def __init__(self,
+                 memory_store: BaseMemoryStore,
+                 max_tokens: int = settings.HISTORY_MAX_TOKENS,
+                 summary_max_tokens: int = settings.HISTORY_SUMMARY_MAX_TOKENS,
+                 enabled: bool = settings.HISTORY_SUMMARY_ENABLED):
+        self.memory_store = memory_store
+        self.max_tokens = max_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.enabled = enabled
+
+        # 每个会话同时只运行一个摘要任务，运行期间的新请求合并为一次重跑
+        self._running: Set[str] = set()
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self._tasks: Set[asyncio.Task] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.summaries_made = 0
+        self.summary_failures = 0
+
+    def build(self, session_id: Optional[str]) -> Dict[str, Any]:
+        """构建提示词中的对话历史，返回 {"text", "tokens", "has_history"}
+
+        先放入摘要（不超过 summary_max_tokens），剩余预算给最近一轮（超长时截断），
+        再按从新到旧放入尚未并入摘要的轮次。
+        """
+        summary, records = self.memory_store.get_history(session_id)
+        messages = [message for _, message in records]
+        if not summary and not messages:
+            return {"text": EMPTY_HISTORY, "tokens": count_tokens(EMPTY_HISTORY), "has_history": False}
+
+        remaining = self.max_tokens
+        summary_line = ""
+        if summary:
+            summary_line = truncate_to_tokens(f"对话摘要: {summary}", min(self.summary_max_tokens, remaining))
+            remaining -= count_tokens(summary_line)
+
+        recent: List[str] = []
+        for message in messages[-2:]:
+            line = truncate_to_tokens(_format_message(message), remaining)
+            remaining -= count_tokens(line)
+            if line:
+                recent.append(line)
+
+        # 摘要任务尚未完成时，较早的轮次以原文补充
+        pending: List[str] = []
+        for message in reversed(messages[:-2]):
+            line = _format_message(message)
+            tokens = count_tokens(line)
+            if tokens > remaining:
+                break
+            pending.append(line)
+            remaining -= tokens
+        pending.reverse()
+
+        text = "\n".join(([summary_line] if summary_line else []) + pending + recent)
+        return {"text": text, "tokens": count_tokens(text), "has_history": True}
+
+    def schedule(self, session_id: Optional[str], llm):
+        """在后台把最近一轮之前的消息并入摘要（有事件循环时作为任务运行，否则使用后台线程）"""
+        if not self.enabled:
+            return
+        key = session_id or ""
+        with self._lock:
+            if key in self._running:
+                self._dirty.add(key)
+                return
+            self._running.add(key)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is not None:
+            task = loop.create_task(self._arun(session_id, key, llm))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="history-summary")
+            self._executor.submit(self._run, session_id, key, llm)
+
+    async def _arun(self, session_id: Optional[str], key: str, llm):
+        # 记忆存储的读写可能是SQLite阻塞调用，放到线程池，事件循环上只等待LLM
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = await loop.run_in_executor(None, self._pending, session_id)
+            if pending is not None:
+                summary, turns, upto_id = pending
+                try:
+                    response = await llm.ainvoke([HumanMessage(content=self._summary_prompt(summary, turns))])
+                    await loop.run_in_executor(None, self._store, session_id, response.content, upto_id)
+                except Exception as e:
+                    self._fail(session_id, e)
+            if not self._finish(key):
+                return
+
+    def _run(self, session_id: Optional[str], key: str, llm):
+        while True:
+            pending = self._pending(session_id)
+            if pending is not None:
+                summary, turns, upto_id = pending
+                try:
+                    response = llm.invoke([HumanMessage(content=self._summary_prompt(summary, turns))])
+                    self._store(session_id, response.content, upto_id)
+                except Exception as e:
+                    self._fail(session_id, e)
+            if not self._finish(key):
+                return
+
+    def _pending(self, session_id: Optional[str]) -> Optional[Tuple[str, List[BaseMessage], int]]:
+        """返回 (已有摘要, 待并入的消息, 最后一条待并入消息的ID)，没有需要并入的消息时返回None"""
+        summary, records = self.memory_store.get_history(session_id)
+        older = records[:-2]
+        if not older:
+            return None
+        return summary, [message for _, message in older], older[-1][0]
+
+    def _summary_prompt(self, summary: str, turns: List[BaseMessage]) -> str:
+        return SUMMARY_PROMPT.format(
+            max_tokens=self.summary_max_tokens,
+            summary=summary or "无",
+            turns="\n".join(_format_message(message) for message in turns)
+        )
+
+    def _store(self, session_id: Optional[str], summary: str, upto_id: int):
+        summary = truncate_to_tokens(summary.strip(), self.summary_max_tokens)
+        self.memory_store.set_summary(session_id, summary, upto_id)
+        self.summaries_made += 1
+        logger.info(f"对话摘要已更新: {session_id}，{count_tokens(summary)} tokens")
+
+    def _fail(self, session_id: Optional[str], error: Exception):
+        # 摘要失败时保留原始消息，构建历史时仍按token上限截取
+        self.summary_failures += 1
+        logger.warning(f"生成对话摘要失败: {session_id}: {str(error)}")
+
+    def _finish(self, key: str) -> bool:
+        """结束一次摘要，运行期间有新的请求时返回True以再执行一次"""
+        with self._lock:
+            if key in self._dirty:
+                self._dirty.discard(key)
+                return True
+            self._running.discard(key)
+            return False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'history_summary_enabled': self.enabled,
+            'history_max_tokens': self.max_tokens,
+            'summaries_made': self.summaries_made,
+            'summary_failures': self.summary_failures,
+            'summaries_running': len(self._running)
+        }
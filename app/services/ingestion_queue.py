@@ -0,0 +1,267 @@
+import os
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Iterator
+
+from app.config import settings
+from app.services.document_processor import DocumentProcessor
+from app.services.vector_store import VectorStoreService
+from app.services.document_registry import DocumentRegistry, DocumentHashConflictError
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class IngestionQueueFullError(Exception):
+    """待处理的入库任务过多"""
+
+
+class IngestionJobQueue:
+    """后台文档入库任务队列
+
+    上传接口只负责落盘并提交任务，解析、分块、向量化与写入在有界线程池中执行，
+    调用方通过任务ID查询进度与结果。
+    """
+
+    def __init__(self,
+                 document_processor: DocumentProcessor,
+                 vector_store_service: VectorStoreService,
+                 document_registry: DocumentRegistry,
+                 max_workers: int = settings.INGEST_MAX_WORKERS,
+                 max_pending: int = settings.INGEST_MAX_PENDING_JOBS,
+                 history_size: int = settings.INGEST_JOB_HISTORY):
+        self.document_processor = document_processor
+        self.vector_store_service = vector_store_service
+        self.document_registry = document_registry
+        self.max_pending = max_pending
+        self.history_size = history_size
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 按键的写入锁：[锁, 引用数]，无人使用时删除
+        self._key_locks: Dict[str, List[Any]] = {}
+
+    def submit(self, file_path: str, filename: str, file_size: int, file_hash: str) -> Dict[str, Any]:
+        """提交入库任务，任务完成后删除file_path"""
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job['status'] in (JOB_QUEUED, JOB_RUNNING))
+            if pending >= self.max_pending:
+                raise IngestionQueueFullError(f"待处理任务过多: {pending}")
+
+            job_id = str(uuid.uuid4())
+            job = {
+                'job_id': job_id,
+                'filename': filename,
+                'file_size': file_size,
+                'file_hash': file_hash,
+                'status': JOB_QUEUED,
+                'created_at': datetime.now().isoformat(),
+                'started_at': None,
+                'finished_at': None,
+                'progress': {
+                    'pages_parsed': 0,
+                    'chunks_total': 0,
+                    'chunks_embedded': 0,
+                    'chunks_written': 0
+                },
+                'result': None,
+                'error': None
+            }
+            self._jobs[job_id] = job
+            self._trim_history()
+
+        self._executor.submit(self._run, job_id, file_path, filename, file_size, file_hash)
+        logger.info(f"已提交入库任务 {job_id}: {filename}")
+        return self.get_job(job_id)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            jobs = list(self._jobs.values())[-limit:]
+            return [self._snapshot(job) for job in reversed(jobs)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """各状态的任务数"""
+        with self._lock:
+            counts = {status: 0 for status in (JOB_QUEUED, JOB_RUNNING, JOB_COMPLETED, JOB_FAILED)}
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+            return {'jobs': counts, 'max_pending': self.max_pending}
+
+    def delete_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """删除文档的全部文档块与登记，返回被删除的文档（不存在时返回None）
+
+        与入库任务持有同一文档锁：否则删除可能读到旧版本的块ID，却删掉并发重新入库写入的登记，
+        新版本的块成为无法删除的孤儿。
+        """
+        with self._locked(f"document:{document_id}"):
+            document = self.document_registry.get(document_id)
+            if document is None:
+                return None
+            if document['chunk_ids'] and not self.vector_store_service.delete_documents(document['chunk_ids']):
+                raise RuntimeError("删除文档块失败")
+            self.document_registry.delete(document_id)
+        logger.info(f"已删除文档 {document['filename']}: {document_id}，共 {len(document['chunk_ids'])} 个文档块")
+        return document
+
+    def _run(self, job_id: str, file_path: str, filename: str, file_size: int, file_hash: str):
+        self._update(job_id, status=JOB_RUNNING, started_at=datetime.now().isoformat())
+        try:
+            # 排队期间可能已有相同内容的文件入库
+            if self._skip_duplicate(job_id, filename, file_hash):
+                return
+
+            document_id = self.document_processor.make_document_id(filename)
+            documents = self.document_processor.process_file(
+                file_path, filename,
+                progress_callback=lambda **progress: self._update_progress(job_id, **progress),
+                document_id=document_id
+            )
+            for doc in documents:
+                doc.metadata['file_hash'] = file_hash
+            self._update_progress(job_id, chunks_total=len(documents))
+
+            # 同一文档的比对、写入与登记必须串行，否则并发任务会基于同一旧版本比对，
+            # 后登记的任务覆盖先登记的块ID，先写入的块成为无法删除的孤儿；
+            # 同时按内容哈希加锁，相同内容、不同文件名的并发任务只有一个入库
+            with self._locked(f"document:{document_id}", f"file_hash:{file_hash}"):
+                if self._skip_duplicate(job_id, filename, file_hash):
+                    return
+
+                # 与同名文档的上一版本按块ID比对，只处理发生变化的块
+                previous = self.document_registry.get(document_id)
+                old_ids = set(previous['chunk_ids']) if previous else set()
+                new_ids = [doc.metadata['chunk_id'] for doc in documents]
+                added = [doc for doc in documents if doc.metadata['chunk_id'] not in old_ids]
+                kept = [doc for doc in documents if doc.metadata['chunk_id'] in old_ids]
+                removed = list(old_ids - set(new_ids))
+
+                # 先写入新块再删除旧块，避免更新期间出现内容缺失
+                self.vector_store_service.add_documents(
+                    added,
+                    progress_callback=lambda **progress: self._update_progress(job_id, **progress)
+                )
+                if kept and not self.vector_store_service.update_metadatas(kept):
+                    raise RuntimeError("更新未变化文档块的元数据失败")
+                if removed and not self.vector_store_service.delete_documents(removed):
+                    raise RuntimeError("删除旧版本文档块失败")
+                try:
+                    self.document_registry.register(document_id, file_hash, filename, file_size, new_ids)
+                except DocumentHashConflictError:
+                    # 其他进程的队列已登记相同内容：撤销本次新增的块，避免无法删除的孤儿
+                    if added:
+                        self.vector_store_service.delete_documents([doc.metadata['chunk_id'] for doc in added])
+                    raise
+
+            self._update(
+                job_id,
+                status=JOB_COMPLETED,
+                finished_at=datetime.now().isoformat(),
+                result={
+                    'document_id': document_id,
+                    'filename': filename,
+                    'chunks_count': len(documents),
+                    'document_ids': new_ids,
+                    'chunks_added': len(added),
+                    'chunks_kept': len(kept),
+                    'chunks_removed': len(removed),
+                    'duplicate': False
+                }
+            )
+            logger.info(
+                f"入库任务 {job_id} 完成: {filename}，共 {len(documents)} 个文档块"
+                f"（新增 {len(added)}，保留 {len(kept)}，删除 {len(removed)}）"
+            )
+
+        except Exception as e:
+            logger.error(f"入库任务 {job_id} 失败: {str(e)}")
+            self._update(job_id, status=JOB_FAILED, finished_at=datetime.now().isoformat(), error=str(e))
+
+        finally:
+            if os.path.exists(file_path):
+                os.unlink(file_path)
+
+    def _skip_duplicate(self, job_id: str, filename: str, file_hash: str) -> bool:
+        """相同内容的文件已入库时以重复结果结束任务"""
+        existing = self.document_registry.find_by_hash(file_hash)
+        if not existing:
+            return False
+        self._update(
+            job_id,
+            status=JOB_COMPLETED,
+            finished_at=datetime.now().isoformat(),
+            result=self.duplicate_result(existing)
+        )
+        logger.info(f"入库任务 {job_id} 跳过重复文件: {filename}")
+        return True
+
+    @contextmanager
+    def _locked(self, *keys: str) -> Iterator[None]:
+        """持有多个键的写入锁（按固定顺序获取，避免死锁）"""
+        keys = sorted(set(keys))
+        with self._lock:
+            entries = [self._key_locks.setdefault(key, [threading.Lock(), 0]) for key in keys]
+            for entry in entries:
+                entry[1] += 1
+        try:
+            with ExitStack() as stack:
+                for entry in entries:
+                    stack.enter_context(entry[0])
+                yield
+        finally:
+            with self._lock:
+                for key, entry in zip(keys, entries):
+                    entry[1] -= 1
+                    if not entry[1]:
+                        del self._key_locks[key]
+
+    @staticmethod
+    def duplicate_result(existing: Dict[str, Any]) -> Dict[str, Any]:
+        """相同内容文件已入库时的任务结果"""
+        return {
+            'document_id': existing['document_id'],
+            'filename': existing['filename'],
+            'chunks_count': len(existing['chunk_ids']),
+            'document_ids': existing['chunk_ids'],
+            'chunks_added': 0,
+            'chunks_kept': len(existing['chunk_ids']),
+            'chunks_removed': 0,
+            'duplicate': True
+        }
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(fields)
+
+    def _update_progress(self, job_id: str, **progress):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job['progress'].update(progress)
+
+    def _trim_history(self):
+        """只保留最近的已结束任务"""
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job['status'] in (JOB_COMPLETED, JOB_FAILED)]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_size)]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+        return {**job, 'progress': dict(job['progress'])}
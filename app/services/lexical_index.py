@@ -0,0 +1,256 @@
+"""
+文档块的BM25词法倒排索引
+
+与向量存储并行维护，弥补稠密向量对编号、型号、短中文关键词等精确匹配的不足。
+基于SQLite FTS5：文本先按中日韩字符二元组与字母数字词切分，再交给FTS5建立倒排与BM25打分。
+
+重建命令: python -m app.services.lexical_index rebuild
+"""
+
+import re
+import logging
+import argparse
+import threading
+import unicodedata
+from collections import Counter
+from typing import List, Tuple, Iterable
+
+from app.config import settings
+from app.utils.helpers import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+# 中日韩文字（假名、汉字、谚文）连续片段
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+")
+# 字母数字词，允许 - _ . / 连接的编号（如 AB-1234、v2.1、x86_64）
+_WORD = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)*")
+_WORD_SEPARATOR = re.compile(r"[-_./]")
+# 与 _WORD 的连接符保持一致，使编号在FTS5中作为单个词项
+_FTS_TOKENIZE = "unicode61 remove_diacritics 0 tokenchars '-_./'"
+
+
+def tokenize(text: str) -> List[str]:
+    """中日韩文字切为相邻二元组（单字片段保留单字），其余按字母数字词切分
+
+    带连接符的编号同时输出整体与各组成部分，整体匹配时得分更高。
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    tokens: List[str] = []
+    position = 0
+    for match in _CJK_RUN.finditer(text):
+        tokens.extend(_word_tokens(text[position:match.start()]))
+        run = match.group()
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        position = match.end()
+    tokens.extend(_word_tokens(text[position:]))
+    return tokens
+
+
+def _word_tokens(text: str) -> Iterable[str]:
+    for match in _WORD.finditer(text):
+        word = match.group()
+        yield word
+        if _WORD_SEPARATOR.search(word):
+            yield from (part for part in _WORD_SEPARATOR.split(word) if part)
+
+
+class LexicalIndex:
+    """文档块ID -> 词项 的BM25倒排索引"""
+
+    def __init__(self,
+                 db_path: str = settings.LEXICAL_INDEX_PATH,
+                 max_query_terms: int = settings.LEXICAL_MAX_QUERY_TERMS,
+                 max_postings: int = settings.LEXICAL_MAX_POSTINGS):
+        self.db_path = db_path
+        self.max_query_terms = max_query_terms
+        self.max_postings = max_postings
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS lexical_chunks (
+                rowid INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE
+            )
+        """)
+        conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS lexical_fts USING fts5(tokens, tokenize=\"{_FTS_TOKENIZE}\")"
+        )
+        # 词项文档频率单独维护：fts5vocab 需要遍历倒排表计数，高频词查询一次就要数毫秒
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS lexical_terms (
+                term TEXT PRIMARY KEY,
+                doc_freq INTEGER NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._count = conn.execute("SELECT COUNT(*) FROM lexical_chunks").fetchone()[0]
+
+    def _connect(self):
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_sqlite(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, chunk_ids: List[str], texts: List[str]):
+        """写入文档块，已存在的块ID会被替换"""
+        if not chunk_ids:
+            return
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_rows(conn, chunk_ids)
+                doc_freq = Counter()
+                for chunk_id, text in zip(chunk_ids, texts):
+                    tokens = tokenize(text)
+                    doc_freq.update(set(tokens))
+                    cursor = conn.execute("INSERT INTO lexical_chunks(chunk_id) VALUES (?)", (chunk_id,))
+                    conn.execute(
+                        "INSERT INTO lexical_fts(rowid, tokens) VALUES (?, ?)",
+                        (cursor.lastrowid, " ".join(tokens))
+                    )
+                conn.executemany(
+                    "INSERT INTO lexical_terms(term, doc_freq) VALUES (?, ?) "
+                    "ON CONFLICT(term) DO UPDATE SET doc_freq = doc_freq + excluded.doc_freq",
+                    doc_freq.items()
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._count = conn.execute("SELECT COUNT(*) FROM lexical_chunks").fetchone()[0]
+
+    def delete(self, chunk_ids: List[str]):
+        """删除文档块"""
+        if not chunk_ids:
+            return
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._delete_rows(conn, chunk_ids)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._count = conn.execute("SELECT COUNT(*) FROM lexical_chunks").fetchone()[0]
+
+    @staticmethod
+    def _delete_rows(conn, chunk_ids: List[str]):
+        # SQLite 单条语句的参数数量有限，分批删除
+        for start in range(0, len(chunk_ids), 500):
+            batch = chunk_ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT c.rowid, f.tokens FROM lexical_chunks c JOIN lexical_fts f ON f.rowid = c.rowid "
+                f"WHERE c.chunk_id IN ({placeholders})", batch
+            ).fetchall()
+            if not rows:
+                continue
+            doc_freq = Counter()
+            for _, tokens in rows:
+                doc_freq.update(set(tokens.split()))
+            conn.executemany(
+                "UPDATE lexical_terms SET doc_freq = doc_freq - ? WHERE term = ?",
+                [(count, term) for term, count in doc_freq.items()]
+            )
+            conn.executemany(
+                "DELETE FROM lexical_terms WHERE term = ? AND doc_freq <= 0",
+                [(term,) for term in doc_freq]
+            )
+            conn.executemany("DELETE FROM lexical_fts WHERE rowid = ?", [(rowid,) for rowid, _ in rows])
+            conn.executemany("DELETE FROM lexical_chunks WHERE rowid = ?", [(rowid,) for rowid, _ in rows])
+
+    def clear(self):
+        """清空索引"""
+        conn = self._connect()
+        with self._write_lock:
+            conn.execute("DELETE FROM lexical_chunks")
+            conn.execute("DELETE FROM lexical_fts")
+            conn.execute("DELETE FROM lexical_terms")
+            self._count = 0
+
+    def search(self, query: str, k: int = 20) -> List[Tuple[str, float]]:
+        """BM25检索，返回按相关度降序的 (块ID, BM25分数)"""
+        terms = self._select_terms(query)
+        if not terms:
+            return []
+        match = " OR ".join(f'"{term}"' for term in terms)
+        # 先在FTS5内取top-k再关联块ID，避免对每个匹配行都查一次 lexical_chunks
+        rows = self._connect().execute(
+            "SELECT c.chunk_id, top.score FROM ("
+            "  SELECT rowid, bm25(lexical_fts) AS score FROM lexical_fts "
+            "  WHERE lexical_fts MATCH ? ORDER BY score LIMIT ?"
+            ") AS top JOIN lexical_chunks c ON c.rowid = top.rowid ORDER BY top.score",
+            (match, k)
+        ).fetchall()
+        # FTS5 的 bm25() 越小越相关，取反后越大越相关
+        return [(chunk_id, -score) for chunk_id, score in rows]
+
+    def _select_terms(self, query: str) -> List[str]:
+        """挑选查询词项：去重后按文档频率从低到高选取，直到倒排表总长度达到上限
+
+        BM25打分需要遍历所选词项的全部倒排表，耗时与其总长度成正比。高频词（如常见二元组“的是”）
+        的IDF很低、几乎不影响排序，优先保留编号、型号等低频词，使检索耗时不随语料规模增长。
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or self._count == 0:
+            return []
+        placeholders = ",".join("?" * len(terms))
+        doc_freq = dict(self._connect().execute(
+            f"SELECT term, doc_freq FROM lexical_terms WHERE term IN ({placeholders})", terms
+        ).fetchall())
+        present = sorted((term for term in terms if term in doc_freq), key=lambda term: doc_freq[term])
+        if not present:
+            return []
+
+        selected = present[:1]
+        postings = doc_freq[present[0]]
+        for term in present[1:self.max_query_terms]:
+            postings += doc_freq[term]
+            if postings > self.max_postings:
+                break
+            selected.append(term)
+        return selected
+
+    def rebuild(self, backend, page_size: int = 1000) -> int:
+        """从向量存储后端分页读取全部文档块重建索引，返回写入的块数"""
+        self.clear()
+        total = 0
+        for ids, texts in backend.iter_texts(page_size):
+            self.add(ids, texts)
+            total += len(ids)
+            logger.info(f"词法索引重建进度: {total} 个文档块")
+        return total
+
+    def get_stats(self):
+        return {
+            'db_path': self.db_path,
+            'chunks': self._count,
+            'max_query_terms': self.max_query_terms,
+            'max_postings': self.max_postings
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="BM25词法索引维护")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild", help="从向量存储中的全部文档块重建词法索引")
+    subparsers.add_parser("stats", help="查看索引文档块数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "rebuild":
+        from app.services.vector_backend import create_vector_backend
+        print({'chunks_indexed': LexicalIndex().rebuild(create_vector_backend())})
+    else:
+        print(LexicalIndex().get_stats())
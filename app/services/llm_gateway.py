@@ -0,0 +1,386 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Dict, List, Any, Optional, AsyncIterator
+
+from langchain_openai import ChatOpenAI
+from langchain.schema.messages import BaseMessage, AIMessage, AIMessageChunk
+from tenacity import Retrying, AsyncRetrying, RetryCallState, retry_if_exception, stop_after_attempt
+
+from app.config import settings
+from app.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRY_REASONS = ("rate_limit", "server_error", "timeout", "connection")
+
+
+class LLMTimeoutError(asyncio.TimeoutError):
+    """LLM请求超过 LLM_TIMEOUT 未返回（流式调用为首个token之前）"""
+
+
+def _retry_reason(error: BaseException) -> Optional[str]:
+    """可重试的错误返回原因，否则返回None（4xx参数错误、鉴权失败等不重试）"""
+    import openai
+
+    if isinstance(error, openai.RateLimitError):
+        return "rate_limit"
+    if isinstance(error, openai.APIStatusError):
+        return "server_error" if error.status_code >= 500 else None
+    if isinstance(error, (openai.APITimeoutError, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection"
+    return None
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """读取429/503响应的 Retry-After 头（秒）"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMGateway:
+    """LLM调用网关，提供与 ChatOpenAI 相同的 invoke / ainvoke / astream 接口
+
+    - 同步与异步调用各共享一个长连接池（httpx），连接数有上限
+    - 每次调用有超时（非流式为整个请求，流式为首个token之前）
+    - 429、5xx、超时与连接错误按全抖动指数退避重试，429优先遵循 Retry-After；流式调用只在输出首个token前重试
+    - 并发调用数超过上限时排队，排队人数与等待时间计入统计
+    - 可选对冲请求（仅 ainvoke）：首个请求超过 hedge_delay 仍未返回且没有排队时再发一个，取先返回的结果
+    """
+
+    def __init__(self,
+                 model: str = settings.DEEPSEEK_MODEL,
+                 api_key: Optional[str] = settings.DEEPSEEK_API_KEY,
+                 base_url: str = settings.DEEPSEEK_BASE_URL,
+                 temperature: float = 0.1,
+                 max_tokens: int = 1000,
+                 timeout: float = settings.LLM_TIMEOUT,
+                 connect_timeout: float = settings.LLM_CONNECT_TIMEOUT,
+                 max_retries: int = settings.LLM_MAX_RETRIES,
+                 retry_backoff: float = settings.LLM_RETRY_BACKOFF,
+                 retry_max_backoff: float = settings.LLM_RETRY_MAX_BACKOFF,
+                 max_concurrency: int = settings.LLM_MAX_CONCURRENCY,
+                 max_connections: int = settings.LLM_MAX_CONNECTIONS,
+                 hedge_delay: float = settings.LLM_HEDGE_DELAY,
+                 hedge_max_ratio: float = settings.LLM_HEDGE_MAX_RATIO):
+        import httpx
+
+        self.model = model
+        self.api_key = api_key
+        self.base_url = base_url
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_max_backoff = retry_max_backoff
+        self.max_concurrency = max_concurrency
+        self.hedge_delay = hedge_delay
+        self.hedge_max_ratio = hedge_max_ratio
+
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY
+        )
+        self._http_timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._http_client = httpx.Client(limits=self._limits, timeout=self._http_timeout)
+        self._async_http_client = httpx.AsyncClient(limits=self._limits, timeout=self._http_timeout)
+        self._chat = self._build_chat(self._async_http_client)
+
+        # 异步连接池与信号量绑定事件循环，循环变化时重建
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+        self._sync_semaphore = threading.Semaphore(max_concurrency)
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.retries: Dict[str, int] = {reason: 0 for reason in RETRY_REASONS}
+        self.hedges_issued = 0
+        self.hedges_won = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.queued_calls = 0
+        self.queue_wait_seconds = 0.0
+
+    def _build_chat(self, async_http_client) -> ChatOpenAI:
+        import openai
+
+        # 重试由网关负责，关闭 openai 客户端自带的重试
+        client_options = {
+            "api_key": self.api_key,
+            "base_url": self.base_url,
+            "timeout": self._http_timeout,
+            "max_retries": 0
+        }
+        return ChatOpenAI(
+            model=self.model,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            api_key=self.api_key,
+            base_url=self.base_url,
+            max_retries=0,
+            client=openai.OpenAI(http_client=self._http_client, **client_options).chat.completions,
+            async_client=openai.AsyncOpenAI(http_client=async_http_client, **client_options).chat.completions
+        )
+
+    def _bind_loop(self) -> ChatOpenAI:
+        """获取当前事件循环可用的客户端与信号量"""
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._loop is not None:
+                self._async_http_client = httpx.AsyncClient(limits=self._limits, timeout=self._http_timeout)
+                self._chat = self._build_chat(self._async_http_client)
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._chat
+
+    # ---- 并发限制 ----
+
+    def _enter_queue(self):
+        with self._lock:
+            self.waiting += 1
+
+    def _leave_queue(self, wait_seconds: float, acquired: bool):
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+                self.queued_calls += 1
+                self.queue_wait_seconds += wait_seconds
+        if acquired:
+            metrics.observe_llm_queue_wait(wait_seconds)
+
+    def _acquire(self):
+        self._enter_queue()
+        start = time.perf_counter()
+        acquired = False
+        try:
+            self._sync_semaphore.acquire()
+            acquired = True
+        finally:
+            self._leave_queue(time.perf_counter() - start, acquired)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._sync_semaphore.release()
+
+    async def _aacquire(self):
+        self._enter_queue()
+        start = time.perf_counter()
+        acquired = False
+        try:
+            await self._async_semaphore.acquire()
+            acquired = True
+        finally:
+            self._leave_queue(time.perf_counter() - start, acquired)
+
+    def _arelease(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._async_semaphore.release()
+
+    # ---- 重试 ----
+
+    def _retry_options(self) -> Dict[str, Any]:
+        return {
+            "stop": stop_after_attempt(self.max_retries + 1),
+            "retry": retry_if_exception(lambda error: _retry_reason(error) is not None),
+            "wait": self._wait,
+            "before_sleep": self._before_retry,
+            "reraise": True
+        }
+
+    def _wait(self, retry_state: RetryCallState) -> float:
+        # 全抖动：在 [0, min(上限, 基数 × 2^(n-1))] 内均匀取值，避免限流后所有请求同时重试
+        ceiling = min(self.retry_max_backoff, self.retry_backoff * 2 ** (retry_state.attempt_number - 1))
+        backoff = random.uniform(0, ceiling)
+        retry_after = _retry_after(retry_state.outcome.exception())
+        if retry_after is not None:
+            return max(backoff, min(retry_after, self.retry_max_backoff))
+        return backoff
+
+    def _before_retry(self, retry_state: RetryCallState):
+        error = retry_state.outcome.exception()
+        reason = _retry_reason(error)
+        with self._lock:
+            self.retries[reason] += 1
+        logger.warning(f"LLM调用失败（{reason}），{retry_state.next_action.sleep:.2f}秒后重试"
+                       f"（第 {retry_state.attempt_number} 次）: {str(error)}")
+
+    def _record(self, mode: str, start: float, error: Optional[BaseException] = None):
+        with self._lock:
+            self.requests += 1
+            if error is not None:
+                self.failures += 1
+        metrics.observe_llm_call(mode, "error" if error is not None else "success", time.perf_counter() - start)
+
+    # ---- 调用接口 ----
+
+    def invoke(self, messages: List[BaseMessage], **kwargs) -> AIMessage:
+        start = time.perf_counter()
+        try:
+            for attempt in Retrying(**self._retry_options()):
+                with attempt:
+                    self._acquire()
+                    try:
+                        response = self._chat.invoke(messages, **kwargs)
+                    finally:
+                        self._release()
+            self._record("invoke", start)
+            return response
+
+        except Exception as e:
+            self._record("invoke", start, e)
+            logger.error(f"LLM调用失败: {str(e)}")
+            raise
+
+    async def ainvoke(self, messages: List[BaseMessage], **kwargs) -> AIMessage:
+        start = time.perf_counter()
+        chat = self._bind_loop()
+        try:
+            async for attempt in AsyncRetrying(**self._retry_options()):
+                with attempt:
+                    response = await self._hedged_call(chat, messages, kwargs)
+            self._record("ainvoke", start)
+            return response
+
+        except Exception as e:
+            self._record("ainvoke", start, e)
+            logger.error(f"LLM调用失败: {str(e)}")
+            raise
+
+    async def astream(self, messages: List[BaseMessage], **kwargs) -> AsyncIterator[AIMessageChunk]:
+        start = time.perf_counter()
+        chat = self._bind_loop()
+        stream = None
+        first = None
+        try:
+            # 只在收到首个token之前重试，之后的错误直接抛出（已输出的内容无法撤回）
+            async for attempt in AsyncRetrying(**self._retry_options()):
+                with attempt:
+                    await self._aacquire()
+                    try:
+                        stream = chat.astream(messages, **kwargs).__aiter__()
+                        first = await self._with_timeout(self._first_chunk(stream))
+                    except BaseException:
+                        self._arelease()
+                        if stream is not None:
+                            await stream.aclose()
+                        raise
+
+        except Exception as e:
+            self._record("astream", start, e)
+            logger.error(f"LLM调用失败: {str(e)}")
+            raise
+
+        try:
+            if first is not None:
+                yield first
+                async for chunk in stream:
+                    yield chunk
+            self._record("astream", start)
+
+        except Exception as e:
+            self._record("astream", start, e)
+            logger.error(f"LLM流式输出中断: {str(e)}")
+            raise
+
+        finally:
+            self._arelease()
+            await stream.aclose()
+
+    @staticmethod
+    async def _first_chunk(stream) -> Optional[AIMessageChunk]:
+        try:
+            return await stream.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    async def _call(self, chat: ChatOpenAI, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> AIMessage:
+        """占用一个并发名额执行一次请求（排队时间不计入超时）"""
+        await self._aacquire()
+        try:
+            return await self._with_timeout(chat.ainvoke(messages, **kwargs))
+        finally:
+            self._arelease()
+
+    async def _with_timeout(self, awaitable):
+        try:
+            return await asyncio.wait_for(awaitable, self.timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeoutError(f"LLM请求超时（{self.timeout}秒）")
+
+    def _hedge_allowed(self) -> bool:
+        """有空闲并发名额、没有排队且对冲次数未超过请求数的 hedge_max_ratio 时才对冲"""
+        with self._lock:
+            return (self.waiting == 0
+                    and self.in_flight < self.max_concurrency
+                    and self.hedges_issued < self.hedge_max_ratio * (self.requests + 1))
+
+    async def _hedged_call(self, chat: ChatOpenAI, messages: List[BaseMessage], kwargs: Dict[str, Any]) -> AIMessage:
+        if self.hedge_delay <= 0:
+            return await self._call(chat, messages, kwargs)
+
+        primary = asyncio.ensure_future(self._call(chat, messages, kwargs))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_delay)
+            if done or not self._hedge_allowed():
+                return await primary
+
+            with self._lock:
+                self.hedges_issued += 1
+            backup = asyncio.ensure_future(self._call(chat, messages, kwargs))
+            pending.add(backup)
+
+            # 取先成功的结果；先完成的请求失败时继续等待另一个
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            with self._lock:
+                                self.hedges_won += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def aclose(self):
+        """关闭连接池"""
+        self._http_client.close()
+        await self._async_http_client.aclose()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'model': self.model,
+                'requests': self.requests,
+                'failures': self.failures,
+                'retries': dict(self.retries),
+                'hedges_issued': self.hedges_issued,
+                'hedges_won': self.hedges_won,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'max_concurrency': self.max_concurrency,
+                'avg_queue_wait_ms': round(self.queue_wait_seconds / self.queued_calls * 1000, 3)
+                if self.queued_calls else 0.0
+            }
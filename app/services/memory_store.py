@@ -0,0 +1,447 @@
+import sys
+import time
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Dict, List, Any, Optional, Tuple
+
+from langchain.schema.messages import BaseMessage, HumanMessage, AIMessage
+
+from app.config import settings
+from app.utils.helpers import count_tokens, connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+HUMAN_ROLE = "human"
+AI_ROLE = "ai"
+
+
+def _to_message(role: str, content: str) -> BaseMessage:
+    return HumanMessage(content=content) if role == HUMAN_ROLE else AIMessage(content=content)
+
+
+def _preview(content: str) -> str:
+    return content[:100] + "..." if len(content) > 100 else content
+
+
+class BaseMemoryStore(ABC):
+    """按会话隔离的对话记忆存储
+
+    未提供session_id的请求是无状态的：不读取也不记录历史，避免不同调用方共用同一段对话。
+    """
+
+    def __init__(self,
+                 window: int = settings.MEMORY_WINDOW,
+                 max_sessions: int = settings.MEMORY_MAX_SESSIONS,
+                 session_ttl: int = settings.MEMORY_SESSION_TTL,
+                 max_tokens_per_session: int = settings.MEMORY_MAX_TOKENS_PER_SESSION):
+        self.window = window
+        self.max_sessions = max_sessions
+        self.session_ttl = session_ttl
+        self.max_tokens_per_session = max_tokens_per_session
+
+    @abstractmethod
+    def get_messages(self, session_id: Optional[str]) -> List[BaseMessage]:
+        """获取会话的历史消息（按时间顺序）"""
+
+    @abstractmethod
+    def get_history(self, session_id: Optional[str]) -> Tuple[str, List[Tuple[int, BaseMessage]]]:
+        """获取会话的滚动摘要与尚未并入摘要的消息（消息ID递增，按时间顺序）"""
+
+    @abstractmethod
+    def set_summary(self, session_id: Optional[str], summary: str, upto_id: int):
+        """更新会话摘要，并删除已并入摘要的消息（ID不大于 upto_id）"""
+
+    @abstractmethod
+    def add_turn(self, session_id: Optional[str], user_message: str, ai_message: str):
+        """追加一轮对话"""
+
+    @abstractmethod
+    def clear(self, session_id: Optional[str] = None):
+        """清空指定会话，未指定时清空全部会话"""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, Any]:
+        """获取存储整体统计信息"""
+
+    def has_history(self, session_id: Optional[str]) -> bool:
+        """会话是否有摘要或历史消息"""
+        summary, records = self.get_history(session_id)
+        return bool(summary or records)
+
+    def get_info(self, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """获取记忆信息，指定会话时返回该会话的详情"""
+        info = {
+            'memory_window': self.window,
+            'max_sessions': self.max_sessions,
+            'session_ttl': self.session_ttl,
+            'max_tokens_per_session': self.max_tokens_per_session,
+            **self.get_stats()
+        }
+        if session_id is None:
+            return info
+
+        summary, records = self.get_history(session_id)
+        messages = [message for _, message in records]
+        info.update({
+            'session_id': session_id,
+            'summary': summary,
+            'total_messages': len(messages),
+            'total_tokens': count_tokens(summary) + sum(count_tokens(msg.content) for msg in messages),
+            'recent_messages': [
+                {'type': type(msg).__name__, 'content': _preview(msg.content)}
+                for msg in messages[-4:]
+            ]
+        })
+        return info
+
+    def _trim_to_budget(self, messages: List[Tuple[str, str, int]]) -> int:
+        """从最早的消息开始丢弃，直到满足token预算（至少保留最近一轮），返回丢弃条数"""
+        total = sum(message[2] for message in messages)
+        dropped = 0
+        while total > self.max_tokens_per_session and len(messages) - dropped > 2:
+            total -= messages[dropped][2]
+            dropped += 1
+        return dropped
+
+
+class _Session:
+    __slots__ = ("messages", "tokens", "last_access", "summary", "next_id")
+
+    def __init__(self, window: int):
+        self.messages = deque(maxlen=window * 2)  # (role, content, tokens, id)
+        self.tokens = 0
+        self.last_access = time.monotonic()
+        self.summary = ""
+        self.next_id = 1
+
+
+class InMemorySessionStore(BaseMemoryStore):
+    """进程内会话记忆：会话数上限 + LRU淘汰 + 空闲TTL + 单会话token预算"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._evicted = 0
+        self._expired = 0
+
+    def get_messages(self, session_id: Optional[str]) -> List[BaseMessage]:
+        if not session_id:
+            return []
+        with self._lock:
+            self._expire(time.monotonic())
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            self._touch(session_id, session)
+            return [_to_message(role, content) for role, content, _, _ in session.messages]
+
+    def get_history(self, session_id: Optional[str]) -> Tuple[str, List[Tuple[int, BaseMessage]]]:
+        if not session_id:
+            return "", []
+        with self._lock:
+            self._expire(time.monotonic())
+            session = self._sessions.get(session_id)
+            if session is None:
+                return "", []
+            self._touch(session_id, session)
+            return session.summary, [
+                (message_id, _to_message(role, content)) for role, content, _, message_id in session.messages
+            ]
+
+    def set_summary(self, session_id: Optional[str], summary: str, upto_id: int):
+        if not session_id:
+            return
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return
+            session.tokens += count_tokens(summary) - count_tokens(session.summary)
+            session.summary = summary
+            while session.messages and session.messages[0][3] <= upto_id:
+                session.tokens -= session.messages.popleft()[2]
+
+    def add_turn(self, session_id: Optional[str], user_message: str, ai_message: str):
+        if not session_id:
+            return
+        tokens = [count_tokens(user_message), count_tokens(ai_message)]
+
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = _Session(self.window)
+                self._sessions[session_id] = session
+                self._evict_overflow()
+
+            entries = [
+                (HUMAN_ROLE, user_message, tokens[0], session.next_id),
+                (AI_ROLE, ai_message, tokens[1], session.next_id + 1)
+            ]
+            session.next_id += 2
+            for entry in entries:
+                if len(session.messages) == session.messages.maxlen:
+                    session.tokens -= session.messages[0][2]
+                session.messages.append(entry)
+                session.tokens += entry[2]
+
+            for _ in range(self._trim_to_budget(list(session.messages))):
+                session.tokens -= session.messages.popleft()[2]
+
+            self._touch(session_id, session)
+
+    def clear(self, session_id: Optional[str] = None):
+        with self._lock:
+            if session_id is None:
+                self._sessions.clear()
+            else:
+                self._sessions.pop(session_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(time.monotonic())
+            total_messages = 0
+            total_tokens = 0
+            approx_bytes = sys.getsizeof(self._sessions)
+            for session_id, session in self._sessions.items():
+                total_messages += len(session.messages)
+                total_tokens += session.tokens
+                approx_bytes += (sys.getsizeof(session_id) + sys.getsizeof(session)
+                                 + sys.getsizeof(session.messages) + sys.getsizeof(session.summary))
+                for entry in session.messages:
+                    approx_bytes += sys.getsizeof(entry) + sys.getsizeof(entry[1])
+
+            return {
+                'backend': 'memory',
+                'active_sessions': len(self._sessions),
+                'total_messages': total_messages,
+                'total_tokens': total_tokens,
+                'approx_bytes': approx_bytes,
+                'evicted_sessions': self._evicted,
+                'expired_sessions': self._expired
+            }
+
+    def _touch(self, session_id: str, session: _Session):
+        session.last_access = time.monotonic()
+        self._sessions.move_to_end(session_id)
+
+    def _expire(self, now: float):
+        """淘汰空闲超时的会话（按访问顺序排列，只需检查头部）"""
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_access <= self.session_ttl:
+                break
+            self._sessions.popitem(last=False)
+            self._expired += 1
+
+    def _evict_overflow(self):
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self._evicted += 1
+
+
+class SQLiteSessionStore(BaseMemoryStore):
+    """基于SQLite的会话记忆：重启后保留，可被多个uvicorn worker共享"""
+
+    def __init__(self, db_path: str = settings.MEMORY_SQLITE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_sqlite(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_last_access ON sessions(last_access);
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                tokens INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, id);
+            CREATE TABLE IF NOT EXISTS summaries (
+                session_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                tokens INTEGER NOT NULL
+            );
+        """)
+
+    def _touch_session(self, conn: sqlite3.Connection, session_id: str) -> bool:
+        """刷新会话访问时间，会话不存在或已过期时返回False"""
+        now = time.time()
+        row = conn.execute(
+            "SELECT last_access FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return False
+        if now - row[0] > self.session_ttl:
+            self._delete_sessions(conn, [session_id])
+            return False
+        conn.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (now, session_id))
+        return True
+
+    def get_messages(self, session_id: Optional[str]) -> List[BaseMessage]:
+        return [message for _, message in self.get_history(session_id)[1]]
+
+    def get_history(self, session_id: Optional[str]) -> Tuple[str, List[Tuple[int, BaseMessage]]]:
+        if not session_id:
+            return "", []
+        conn = self._connect()
+        if not self._touch_session(conn, session_id):
+            return "", []
+        summary = conn.execute("SELECT summary FROM summaries WHERE session_id = ?", (session_id,)).fetchone()
+        rows = conn.execute(
+            "SELECT id, role, content FROM messages WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+        return (summary[0] if summary else ""), [
+            (message_id, _to_message(role, content)) for message_id, role, content in rows
+        ]
+
+    def set_summary(self, session_id: Optional[str], summary: str, upto_id: int):
+        if not session_id:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # 会话在摘要生成期间被清空或淘汰时放弃本次摘要
+            if conn.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone():
+                conn.execute(
+                    "INSERT OR REPLACE INTO summaries(session_id, summary, tokens) VALUES (?, ?, ?)",
+                    (session_id, summary, count_tokens(summary))
+                )
+                conn.execute("DELETE FROM messages WHERE session_id = ? AND id <= ?", (session_id, upto_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def add_turn(self, session_id: Optional[str], user_message: str, ai_message: str):
+        if not session_id:
+            return
+        conn = self._connect()
+        now = time.time()
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT INTO sessions(session_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access",
+                (session_id, now)
+            )
+            conn.executemany(
+                "INSERT INTO messages(session_id, role, content, tokens) VALUES (?, ?, ?, ?)",
+                [
+                    (session_id, HUMAN_ROLE, user_message, count_tokens(user_message)),
+                    (session_id, AI_ROLE, ai_message, count_tokens(ai_message))
+                ]
+            )
+
+            # 按窗口与token预算裁剪该会话
+            rows = conn.execute(
+                "SELECT id, role, content, tokens FROM messages WHERE session_id = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, self.window * 2)
+            ).fetchall()
+            rows.reverse()
+            keep = rows[self._trim_to_budget([(r[1], r[2], r[3]) for r in rows]):]
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id < ?",
+                (session_id, keep[0][0])
+            )
+
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self, session_id: Optional[str] = None):
+        conn = self._connect()
+        if session_id is None:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM messages")
+                conn.execute("DELETE FROM summaries")
+                conn.execute("DELETE FROM sessions")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        else:
+            self._delete_sessions(conn, [session_id])
+
+    def get_stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        active_sessions = conn.execute(
+            "SELECT COUNT(*) FROM sessions WHERE last_access >= ?",
+            (time.time() - self.session_ttl,)
+        ).fetchone()[0]
+        total_messages, total_tokens, content_bytes = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(tokens), 0), COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) "
+            "FROM messages"
+        ).fetchone()
+        summary_tokens, summary_bytes = conn.execute(
+            "SELECT COALESCE(SUM(tokens), 0), COALESCE(SUM(LENGTH(CAST(summary AS BLOB))), 0) FROM summaries"
+        ).fetchone()
+        total_tokens += summary_tokens
+        content_bytes += summary_bytes
+        return {
+            'backend': 'sqlite',
+            'db_path': self.db_path,
+            'active_sessions': active_sessions,
+            'total_messages': total_messages,
+            'total_tokens': total_tokens,
+            'approx_bytes': content_bytes
+        }
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """删除空闲超时的会话以及超出上限的最久未访问会话"""
+        expired = [r[0] for r in conn.execute(
+            "SELECT session_id FROM sessions WHERE last_access < ?", (now - self.session_ttl,)
+        ).fetchall()]
+
+        overflow = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - len(expired) - self.max_sessions
+        if overflow > 0:
+            expired += [r[0] for r in conn.execute(
+                "SELECT session_id FROM sessions WHERE last_access >= ? ORDER BY last_access LIMIT ?",
+                (now - self.session_ttl, overflow)
+            ).fetchall()]
+
+        if expired:
+            self._delete_sessions(conn, expired)
+
+    @staticmethod
+    def _delete_sessions(conn: sqlite3.Connection, session_ids: List[str]):
+        conn.executemany("DELETE FROM messages WHERE session_id = ?", [(s,) for s in session_ids])
+        conn.executemany("DELETE FROM summaries WHERE session_id = ?", [(s,) for s in session_ids])
+        conn.executemany("DELETE FROM sessions WHERE session_id = ?", [(s,) for s in session_ids])
+
+
+def create_memory_store() -> BaseMemoryStore:
+    """根据配置创建会话记忆存储"""
+    if settings.MEMORY_BACKEND == "sqlite":
+        logger.info(f"使用SQLite会话记忆存储: {settings.MEMORY_SQLITE_PATH}")
+        return SQLiteSessionStore()
+    if settings.MEMORY_BACKEND != "memory":
+        raise ValueError(f"不支持的记忆存储类型: {settings.MEMORY_BACKEND}")
+    return InMemorySessionStore()
@@ -0,0 +1,181 @@
+"""
+文档块向量的压缩编码（用于NumPy向量索引的第一轮近似检索）
+
+- int8: 每个向量按自身最大绝对值缩放到 [-127, 127]，每维1字节 + 每向量4字节缩放系数
+- pq:   乘积量化，向量切分为 m 个子空间，每个子空间用256个中心的码本编码为1字节
+"""
+
+import os
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class BaseQuantizer(ABC):
+    """向量编码器：编码已归一化的向量，并用编码近似计算与查询向量的内积"""
+
+    name = "base"
+    code_dtype = np.uint8
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @property
+    @abstractmethod
+    def code_size(self) -> int:
+        """每个向量的编码长度（列数）"""
+
+    @property
+    def has_scales(self) -> bool:
+        """编码是否附带每向量的缩放系数"""
+        return False
+
+    @property
+    def trained(self) -> bool:
+        return True
+
+    def train(self, vectors: np.ndarray):
+        """用样本向量训练编码器（无需训练的编码器忽略）"""
+
+    @abstractmethod
+    def encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """返回 (编码, 缩放系数或None)"""
+
+    @abstractmethod
+    def scores(self, queries: np.ndarray, codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+        """近似内积，形状为 (查询数, 编码行数)"""
+
+    def save(self, directory: str):
+        """保存训练结果"""
+
+    def load(self, directory: str) -> bool:
+        """加载训练结果，返回是否成功"""
+        return True
+
+    def bytes_per_vector(self) -> int:
+        return self.code_size * np.dtype(self.code_dtype).itemsize + (4 if self.has_scales else 0)
+
+
+class ScalarInt8Quantizer(BaseQuantizer):
+    """int8 标量量化，内存约为float32的1/4"""
+
+    name = "int8"
+    code_dtype = np.int8
+
+    @property
+    def code_size(self) -> int:
+        return self.dim
+
+    @property
+    def has_scales(self) -> bool:
+        return True
+
+    def encode(self, vectors):
+        max_abs = np.maximum(np.abs(vectors).max(axis=1), 1e-12)
+        codes = np.round(vectors * (127.0 / max_abs)[:, None]).astype(np.int8)
+        return codes, (max_abs / 127.0).astype(np.float32)
+
+    def scores(self, queries, codes, scales):
+        return (queries @ codes.astype(np.float32).T) * scales
+
+
+class ProductQuantizer(BaseQuantizer):
+    """乘积量化：m 个子空间各256个中心，每向量 m 字节
+
+    码本需要用已有向量训练；查询时先算出每个子空间查询与各中心的内积表，
+    再按编码查表求和（ADC），无需解码向量。
+    """
+
+    name = "pq"
+    code_dtype = np.uint8
+    ksub = 256
+
+    def __init__(self, dim: int, subvectors: int = 48, train_iterations: int = 20, seed: int = 42):
+        super().__init__(dim)
+        # 子空间数需整除维度
+        subvectors = max(1, min(subvectors, dim))
+        while dim % subvectors:
+            subvectors -= 1
+        self.subvectors = subvectors
+        self.subdim = dim // subvectors
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self.codebook: Optional[np.ndarray] = None  # (m, 256, subdim)
+
+    @property
+    def code_size(self) -> int:
+        return self.subvectors
+
+    @property
+    def trained(self) -> bool:
+        return self.codebook is not None
+
+    def train(self, vectors):
+        rng = np.random.default_rng(self.seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        ksub = min(self.ksub, len(vectors))
+        codebook = np.zeros((self.subvectors, self.ksub, self.subdim), dtype=np.float32)
+        for m in range(self.subvectors):
+            sub = vectors[:, m * self.subdim:(m + 1) * self.subdim]
+            centroids = sub[rng.choice(len(sub), ksub, replace=False)].copy()
+            for _ in range(self.train_iterations):
+                assign = self._nearest(sub, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, sub)
+                counts = np.bincount(assign, minlength=ksub)
+                empty = counts == 0
+                centroids[~empty] = sums[~empty] / counts[~empty, None]
+                # 空簇用随机样本重新初始化
+                if empty.any():
+                    centroids[empty] = sub[rng.choice(len(sub), int(empty.sum()))]
+            codebook[m, :ksub] = centroids
+        self.codebook = codebook
+        logger.info(f"PQ码本训练完成: {len(vectors)} 个样本，{self.subvectors} 个子空间")
+
+    @staticmethod
+    def _nearest(sub: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (centroids ** 2).sum(axis=1)[None, :] - 2 * sub @ centroids.T
+        return distances.argmin(axis=1)
+
+    def encode(self, vectors):
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for m in range(self.subvectors):
+            sub = vectors[:, m * self.subdim:(m + 1) * self.subdim]
+            codes[:, m] = self._nearest(sub, self.codebook[m])
+        return codes, None
+
+    def scores(self, queries, codes, scales):
+        # 查询与各子空间中心的内积表: (查询数, m, 256)
+        tables = np.einsum("bms,mks->bmk", queries.reshape(len(queries), self.subvectors, self.subdim), self.codebook)
+        scores = np.zeros((len(queries), len(codes)), dtype=np.float32)
+        for m in range(self.subvectors):
+            scores += tables[:, m, codes[:, m]]
+        return scores
+
+    def save(self, directory):
+        np.save(os.path.join(directory, "pq_codebook.npy"), self.codebook)
+
+    def load(self, directory):
+        path = os.path.join(directory, "pq_codebook.npy")
+        if not os.path.exists(path):
+            return False
+        codebook = np.load(path)
+        if codebook.shape != (self.subvectors, self.ksub, self.subdim):
+            return False
+        self.codebook = codebook
+        return True
+
+
+def create_quantizer(kind: str, dim: int, pq_subvectors: int = 48) -> Optional[BaseQuantizer]:
+    """按类型创建向量编码器，none 时返回None"""
+    if kind == "none":
+        return None
+    if kind == "int8":
+        return ScalarInt8Quantizer(dim)
+    if kind == "pq":
+        return ProductQuantizer(dim, subvectors=pq_subvectors)
+    raise ValueError(f"不支持的向量量化类型: {kind}")
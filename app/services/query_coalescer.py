@@ -0,0 +1,152 @@
+import re
+import asyncio
+import logging
+import unicodedata
+from typing import Dict, List, Any, Optional, Tuple, Callable, Awaitable, AsyncIterator
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 问题末尾不影响语义的标点
+_TRAILING_PUNCTUATION = "?？!！。.，,；;～~ "
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """合并键使用的问题文本：NFKC归一（全角转半角）、忽略大小写、压缩空白并去掉末尾标点"""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    return _WHITESPACE.sub(" ", text).strip().rstrip(_TRAILING_PUNCTUATION)
+
+
+class InFlightQuery:
+    """一次进行中的查询计算：已产出的流事件（sources/token）与最终结果
+
+    计算在独立任务中运行，发起者与后加入的请求都只是订阅者：任何一个客户端断开都不会中断其他请求，
+    所有订阅者都离开后计算才会被取消。
+    """
+
+    def __init__(self, key: Tuple[str, int, int]):
+        self.key = key
+        self.events: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.finished = False
+        self.subscribers = 0
+        self.joined = 0
+        self.task: Optional[asyncio.Task] = None
+        self._updated = asyncio.Event()
+
+    def publish(self, event: Dict[str, Any]):
+        self.events.append(event)
+        self._notify()
+
+    def _notify(self):
+        # 唤醒当前所有等待者，之后的等待使用新的事件对象
+        self._updated.set()
+        self._updated = asyncio.Event()
+
+    async def replay(self) -> AsyncIterator[Dict[str, Any]]:
+        """从头回放已产出的流事件，并继续产出新的事件直到计算结束"""
+        index = 0
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.finished:
+                return
+            await self._updated.wait()
+
+    async def wait_result(self) -> Optional[Dict[str, Any]]:
+        while not self.finished:
+            await self._updated.wait()
+        return self.result
+
+
+class QueryCoalescer:
+    """相同查询的单飞合并
+
+    键为 规范化问题 + max_results + 语料版本；同一键同时只有一个计算在进行，期间到达的相同查询
+    加入该计算并共享结果或流。只用于没有对话历史的查询（提示词与会话无关）。
+    计算结束即移出，之后的相同查询由语义答案缓存负责。
+    """
+
+    def __init__(self, enabled: bool = settings.QUERY_COALESCING_ENABLED):
+        self.enabled = enabled
+        self._flights: Dict[Tuple[str, int, int], InFlightQuery] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.flights = 0
+        self.joined = 0
+        self.llm_calls_saved = 0
+        self.llm_tokens_saved = 0
+        self.cancelled = 0
+
+    @staticmethod
+    def make_key(question: str, max_results: int, corpus_version: int) -> Tuple[str, int, int]:
+        return normalize_question(question), max_results, corpus_version
+
+    def attach(self,
+               key: Tuple[str, int, int],
+               start: Callable[[InFlightQuery], Awaitable[None]]) -> Tuple[InFlightQuery, bool]:
+        """加入进行中的相同查询，没有时在新任务中运行 start(flight)；返回 (flight, 是否为加入者)
+
+        调用方结束（包括客户端断开）时必须调用 detach。
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._flights = {}
+            self._loop = loop
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            flight.subscribers += 1
+            flight.joined += 1
+            self.joined += 1
+            return flight, True
+
+        flight = InFlightQuery(key)
+        flight.subscribers = 1
+        self._flights[key] = flight
+        self.flights += 1
+        flight.task = loop.create_task(self._run(flight, start))
+        return flight, False
+
+    async def _run(self, flight: InFlightQuery, start: Callable[[InFlightQuery], Awaitable[None]]):
+        try:
+            await start(flight)
+        except Exception as e:
+            logger.error(f"合并查询计算失败: {str(e)}")
+        finally:
+            flight.finished = True
+            self._remove(flight)
+            flight._notify()
+
+    def detach(self, flight: InFlightQuery):
+        """订阅者离开；所有订阅者都离开且计算尚未结束时取消计算，避免为无人接收的回答继续调用LLM"""
+        flight.subscribers -= 1
+        if flight.subscribers == 0 and not flight.finished:
+            self._remove(flight)
+            flight.task.cancel()
+            self.cancelled += 1
+
+    def _remove(self, flight: InFlightQuery):
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+
+    def record_joined(self, result: Dict[str, Any], llm_called: bool):
+        """记录加入者节省的LLM调用与token数（提示词 + 生成）"""
+        if llm_called:
+            self.llm_calls_saved += 1
+            self.llm_tokens_saved += (result.get("prompt_tokens") or 0) + (result.get("completion_tokens") or 0)
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.flights + self.joined
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "flights": self.flights,
+            "joined": self.joined,
+            "join_ratio": round(self.joined / total, 4) if total else 0.0,
+            "llm_calls_saved": self.llm_calls_saved,
+            "llm_tokens_saved": self.llm_tokens_saved,
+            "cancelled": self.cancelled
+        }
@@ -1,36 +1,66 @@
 import time
+import asyncio
+import textwrap
 import logging
-from typing import Dict, List, Any, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple, AsyncIterator
 
-from langchain_openai import ChatOpenAI
-from langchain.memory import ConversationBufferWindowMemory
 from langchain.prompts import PromptTemplate
 from langchain.schema import Document
-from langchain.schema.messages import HumanMessage, AIMessage
+from langchain.schema.messages import HumanMessage
 
 from app.config import settings
 from app.services.vector_store import VectorStoreService
+from app.services.memory_store import BaseMemoryStore, create_memory_store
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.reranker import RerankStage, create_rerank_stage
+from app.services.context_packer import ContextPacker
+from app.services.history_compactor import HistoryCompactor
+from app.services.llm_gateway import LLMGateway
+from app.services.query_coalescer import QueryCoalescer, InFlightQuery
 from app.models.schemas import SourceInfo
+from app.utils.helpers import count_tokens
+from app.utils import metrics
 
 logger = logging.getLogger(__name__)
 
 
 class RAGAgent:
-    def __init__(self, vector_store_service: VectorStoreService):
-        self.llm = ChatOpenAI(
-            model=settings.DEEPSEEK_MODEL,
-            temperature=0.1,
-            max_tokens=1000,
-            api_key=settings.DEEPSEEK_API_KEY,
-            base_url=settings.DEEPSEEK_BASE_URL
-        )
+    def __init__(self,
+                 vector_store_service: VectorStoreService,
+                 memory_store: Optional[BaseMemoryStore] = None,
+                 rerank_stage: Optional[RerankStage] = None,
+                 context_packer: Optional[ContextPacker] = None,
+                 history_compactor: Optional[HistoryCompactor] = None):
+        # 连接池、超时、重试、对冲与并发限制由网关负责；回答生成与对话摘要共用同一网关
+        self.llm_gateway = LLMGateway()
+        self.llm = self.llm_gateway
 
         self.vector_store_service = vector_store_service
-        self.memory = ConversationBufferWindowMemory(
-            k=5,  # 保留最近5轮对话
-            memory_key="chat_history",
-            return_messages=True
+        # 按会话隔离的对话记忆
+        self.memory_store = memory_store or create_memory_store()
+        # 对话历史压缩：最近一轮原文 + 滚动摘要
+        self.history_compactor = history_compactor or HistoryCompactor(self.memory_store)
+
+        # 语义答案缓存
+        self.answer_cache = SemanticAnswerCache()
+
+        # 进行中的相同查询合并（单飞）
+        self.query_coalescer = QueryCoalescer()
+
+        # 可选的重排序阶段
+        self.rerank_stage = rerank_stage or create_rerank_stage()
+
+        # 按token预算打包检索上下文
+        self.context_packer = context_packer or ContextPacker()
+
+        # 检索线程池与查询并发限制（异步路径使用）
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.RETRIEVAL_MAX_WORKERS,
+            thread_name_prefix="retrieval"
         )
+        self._query_semaphore: Optional[asyncio.Semaphore] = None
+        self._semaphore_loop: Optional[asyncio.AbstractEventLoop] = None
 
         self._setup_prompt_template()
 
@@ -57,8 +87,9 @@ class RAGAgent:
             回答：
         """
 
+        # 去掉模板缩进，避免每次请求都把空白发送给LLM
         self.prompt_template = PromptTemplate(
-            template=template,
+            template=textwrap.dedent(template).strip() + "\n",
             input_variables=["context", "chat_history", "question"]
         )
 
@@ -70,114 +101,490 @@ class RAGAgent:
         start_time = time.time()
 
         try:
-            # 1. 检索相关文档
-            retrieved_docs = self.vector_store_service.similarity_search_with_score(
-                query=query,
-                k=max_results
-            )
+            # 1. 查缓存、检索过滤文档并构建提示词
+            state = self._prepare_query(query, session_id, max_results, start_time)
+            if state["result"] is not None:
+                result = state["result"]
+            else:
+                # 2. 生成回答
+                response = self.llm.invoke([HumanMessage(content=state["prompt"])])
+                answer = response.content
+
+                self._remember_turn(session_id, query, answer)
+                result = self._finalize_result(query, answer, state, start_time, session_id)
 
-            # 2. 过滤低相似度文档
-            filtered_docs = [
-                (doc, score) for doc, score in retrieved_docs
-                if score < settings.SIMILARITY_THRESHOLD
-            ]
-
-            if not filtered_docs:
-                return {
-                    "answer": "抱歉，我在文档中没有找到相关信息来回答您的问题。请尝试换个方式提问，或者上传更多相关文档。",
-                    "sources": [],
-                    "confidence": 0.0,
-                    "retrieved_count": 0,
-                    "processing_time": time.time() - start_time,
-                    "session_id": session_id
-                }
+        except Exception as e:
+            result = self._build_error_result(e, start_time, session_id)
 
-            # 3. 构建上下文
-            context = self._build_context(filtered_docs)
+        metrics.observe_query("sync", result)
+        return result
+
+    async def aprocess_query(self,
+                             query: str,
+                             session_id: Optional[str] = None,
+                             max_results: int = 5) -> Dict[str, Any]:
+        """异步处理用户查询，检索在线程池中执行，LLM使用异步客户端
+
+        没有对话历史的查询与进行中的相同查询合并，共享同一次检索与生成。
+        """
+        start_time = time.time()
 
-            # 4. 获取对话历史
-            chat_history = self._get_chat_history()
+        try:
+            flight, joined = await self._join_flight(query, session_id, max_results, start_time, stream=False)
+            if flight is None:
+                result = await self._aprocess(query, session_id, max_results, start_time)
+            else:
+                try:
+                    result = await self._flight_result(
+                        await flight.wait_result(), joined, query, session_id, start_time
+                    )
+                finally:
+                    self.query_coalescer.detach(flight)
 
-            # 5. 构建完整提示词
-            prompt = self.prompt_template.format(
-                context=context,
-                chat_history=chat_history,
-                question=query
+        except Exception as e:
+            result = self._build_error_result(e, start_time, session_id)
+
+        metrics.observe_query("async", result)
+        return result
+
+    async def _aprocess(self,
+                        query: str,
+                        session_id: Optional[str],
+                        max_results: int,
+                        start_time: float) -> Dict[str, Any]:
+        async with self._get_query_semaphore():
+            # 1. 查缓存、检索过滤文档并构建提示词（CPU密集，放到线程池避免阻塞事件循环）
+            loop = asyncio.get_running_loop()
+            state = await loop.run_in_executor(
+                self._executor, self._prepare_query, query, session_id, max_results, start_time
             )
+            if state["result"] is not None:
+                return state["result"]
 
-            # 6. 生成回答
-            response = self.llm.invoke([HumanMessage(content=prompt)])
+            # 2. 生成回答
+            response = await self.llm.ainvoke([HumanMessage(content=state["prompt"])])
             answer = response.content
 
-            # 7. 更新对话记忆
-            self.memory.chat_memory.add_user_message(query)
-            self.memory.chat_memory.add_ai_message(answer)
+        await self._aremember_turn(session_id, query, answer)
+        return self._finalize_result(query, answer, state, start_time, session_id)
 
-            # 8. 计算置信度
-            confidence = self._calculate_confidence(filtered_docs)
+    async def astream_query(self,
+                            query: str,
+                            session_id: Optional[str] = None,
+                            max_results: int = 5) -> AsyncIterator[Dict[str, Any]]:
+        """流式处理用户查询
 
-            # 9. 构建源信息
-            sources = self._build_sources(filtered_docs)
+        依次产出事件：sources（检索完成后立即发送来源与置信度）、
+        token（LLM逐段输出）、done（计时信息）；出错时产出 error。
+        没有对话历史的查询与进行中的相同查询合并，后加入的请求先回放已输出的token。
+        """
+        start_time = time.time()
 
-            processing_time = time.time() - start_time
+        try:
+            flight, joined = await self._join_flight(query, session_id, max_results, start_time, stream=True)
+        except Exception as e:
+            flight, joined = None, False
+            events = self._error_events(e, start_time, session_id)
+        else:
+            if flight is None:
+                events = self._stream_events(query, session_id, max_results, start_time)
+            else:
+                events = self._replay_flight(flight, joined, query, session_id, start_time)
 
-            result = {
-                "answer": answer,
-                "sources": sources,
-                "confidence": confidence,
-                "retrieved_count": len(filtered_docs),
-                "processing_time": processing_time,
-                "session_id": session_id
-            }
+        try:
+            async for event in events:
+                if event["event"] != "result":
+                    yield event
+                    continue
+                result = event["data"]
+                metrics.observe_query("stream", result)
+                if result.get("error"):
+                    yield {"event": "error", "data": {"error": result["error"], **self._timing_payload(result)}}
+                else:
+                    yield {"event": "done", "data": self._timing_payload(result)}
+        finally:
+            # 客户端断开时立即释放查询名额与LLM连接（或离开合并的计算）
+            await events.aclose()
+            if flight is not None:
+                self.query_coalescer.detach(flight)
+
+    async def _stream_events(self,
+                             query: str,
+                             session_id: Optional[str],
+                             max_results: int,
+                             start_time: float) -> AsyncIterator[Dict[str, Any]]:
+        """产出 sources 与 token 事件，最后产出 result 事件（完整的查询结果，出错时为错误结果）"""
+        try:
+            async with self._get_query_semaphore():
+                # 1. 查缓存、检索过滤文档并构建提示词
+                loop = asyncio.get_running_loop()
+                state = await loop.run_in_executor(
+                    self._executor, self._prepare_query, query, session_id, max_results, start_time
+                )
+
+                if state["result"] is not None:
+                    result = state["result"]
+                    yield {"event": "sources", "data": self._sources_payload(result)}
+                    yield {"event": "token", "data": {"content": result["answer"]}}
+                    yield {"event": "result", "data": result}
+                    return
+
+                # 2. 检索完成即发送来源与置信度
+                filtered_docs = state["filtered_docs"]
+                yield {
+                    "event": "sources",
+                    "data": {
+                        "sources": [s.model_dump() for s in self._build_sources(filtered_docs)],
+                        "confidence": self._calculate_confidence(filtered_docs),
+                        "retrieved_count": len(filtered_docs),
+                        "session_id": session_id
+                    }
+                }
 
-            logger.info(f"查询处理完成，耗时: {processing_time:.2f}秒")
-            return result
+                # 3. 流式生成回答
+                answer_parts = []
+                time_to_first_token = None
+
+                async for chunk in self.llm.astream([HumanMessage(content=state["prompt"])]):
+                    if not chunk.content:
+                        continue
+                    if time_to_first_token is None:
+                        time_to_first_token = time.time() - start_time
+                    answer_parts.append(chunk.content)
+                    yield {"event": "token", "data": {"content": chunk.content}}
+
+            answer = "".join(answer_parts)
+            await self._aremember_turn(session_id, query, answer)
+            result = self._finalize_result(
+                query, answer, state, start_time, session_id,
+                time_to_first_token=time_to_first_token
+            )
+            yield {"event": "result", "data": result}
 
         except Exception as e:
-            logger.error(f"处理查询时发生错误: {str(e)}")
-            return {
-                "answer": f"处理查询时发生错误: {str(e)}",
-                "sources": [],
-                "confidence": 0.0,
-                "retrieved_count": 0,
-                "processing_time": time.time() - start_time,
-                "session_id": session_id,
-                "error": str(e)
-            }
-
-    def _build_context(self, docs_with_scores: List[Tuple[Document, float]]) -> str:
-        """构建上下文"""
-        context_parts = []
-
-        for i, (doc, score) in enumerate(docs_with_scores):
-            content = doc.page_content
-            source = doc.metadata.get('source', 'Unknown')
-
-            context_part = f"""
-                文档片段 {i + 1}:
-                内容: {content}
-                来源: {source}
-                相似度: {(1- score/2):.3f}
-                ---
-            """
-            context_parts.append(context_part)
-
-        return "\n".join(context_parts)
-
-    def _get_chat_history(self) -> str:
-        """获取对话历史"""
-        messages = self.memory.chat_memory.messages
-        if not messages:
-            return "无对话历史"
-
-        history_parts = []
-        for message in messages[-6:]:  # 最近3轮对话
-            if isinstance(message, HumanMessage):
-                history_parts.append(f"用户: {message.content}")
-            elif isinstance(message, AIMessage):
-                history_parts.append(f"助手: {message.content}")
-
-        return "\n".join(history_parts)
+            async for event in self._error_events(e, start_time, session_id):
+                yield event
+
+    async def _error_events(self,
+                            error: Exception,
+                            start_time: float,
+                            session_id: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+        yield {"event": "result", "data": self._build_error_result(error, start_time, session_id)}
+
+    # ---- 相同查询合并 ----
+
+    async def _join_flight(self,
+                           query: str,
+                           session_id: Optional[str],
+                           max_results: int,
+                           start_time: float,
+                           stream: bool) -> Tuple[Optional[InFlightQuery], bool]:
+        """没有对话历史的查询加入进行中的相同查询（没有时发起新的计算），返回 (flight, 是否为加入者)
+
+        有对话历史的查询提示词与会话相关，不参与合并，返回 (None, False)。
+        """
+        if not self.query_coalescer.enabled:
+            return None, False
+        loop = asyncio.get_running_loop()
+        if await loop.run_in_executor(self._executor, self.memory_store.has_history, session_id):
+            return None, False
+
+        key = self.query_coalescer.make_key(query, max_results, self.vector_store_service.corpus_version)
+
+        # 计算以发起者的会话运行（该会话没有历史），结果写入发起者的对话记忆
+        async def run_stream(flight: InFlightQuery):
+            async for event in self._stream_events(query, session_id, max_results, start_time):
+                if event["event"] == "result":
+                    flight.result = event["data"]
+                else:
+                    flight.publish(event)
+
+        async def run(flight: InFlightQuery):
+            try:
+                flight.result = await self._aprocess(query, session_id, max_results, start_time)
+            except Exception as e:
+                flight.result = self._build_error_result(e, start_time, session_id)
+
+        return self.query_coalescer.attach(key, run_stream if stream else run)
+
+    async def _replay_flight(self,
+                             flight: InFlightQuery,
+                             joined: bool,
+                             query: str,
+                             session_id: Optional[str],
+                             start_time: float) -> AsyncIterator[Dict[str, Any]]:
+        """以流式事件输出合并计算的结果：回放已产出的事件并跟随后续事件，最后产出 result 事件"""
+        try:
+            time_to_first_token = None
+            async for event in flight.replay():
+                if event["event"] == "sources":
+                    event = {"event": "sources", "data": {**event["data"], "session_id": session_id}}
+                elif time_to_first_token is None:
+                    time_to_first_token = time.time() - start_time
+                yield event
+
+            result = flight.result
+            if result is None:
+                raise RuntimeError("合并的查询计算未产生结果")
+            # 非流式计算（或检索阶段就出错）没有流事件，按结果补发来源与完整回答
+            if not flight.events and not result.get("error"):
+                yield {"event": "sources", "data": {**self._sources_payload(result), "session_id": session_id}}
+                yield {"event": "token", "data": {"content": result["answer"]}}
+                time_to_first_token = time.time() - start_time
+
+            result = await self._flight_result(result, joined, query, session_id, start_time)
+            if joined:
+                result["time_to_first_token"] = time_to_first_token
+            yield {"event": "result", "data": result}
+
+        except Exception as e:
+            async for event in self._error_events(e, start_time, session_id):
+                yield event
+
+    async def _flight_result(self,
+                             result: Optional[Dict[str, Any]],
+                             joined: bool,
+                             query: str,
+                             session_id: Optional[str],
+                             start_time: float) -> Dict[str, Any]:
+        """发起者直接使用计算结果；加入者换成自己的会话与耗时，并把这一轮写入自己的对话记忆"""
+        if result is None:
+            raise RuntimeError("合并的查询计算未产生结果")
+        if not joined:
+            return result
+
+        answered = not result.get("error") and (result.get("cached") or result.get("retrieved_count"))
+        if answered:
+            await self._aremember_turn(session_id, query, result["answer"])
+        self.query_coalescer.record_joined(result, llm_called=bool(answered) and not result.get("cached"))
+        return {
+            **result,
+            "processing_time": time.time() - start_time,
+            "session_id": session_id,
+            "coalesced": True
+        }
+
+    @staticmethod
+    def _sources_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+        """提取结果中的来源相关字段"""
+        return {
+            "sources": [s.model_dump() for s in result["sources"]],
+            "confidence": result["confidence"],
+            "retrieved_count": result["retrieved_count"],
+            "session_id": result["session_id"]
+        }
+
+    @staticmethod
+    def _timing_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+        """提取结果中的计时字段"""
+        return {
+            "retrieval_time": result.get("retrieval_time"),
+            "time_to_first_token": result.get("time_to_first_token"),
+            "stage_timings": result.get("stage_timings"),
+            "context_tokens": result.get("context_tokens"),
+            "context_tokens_saved": result.get("context_tokens_saved"),
+            "history_tokens": result.get("history_tokens"),
+            "prompt_tokens": result.get("prompt_tokens"),
+            "completion_tokens": result.get("completion_tokens"),
+            "processing_time": result["processing_time"],
+            "cached": result.get("cached", False),
+            "coalesced": result.get("coalesced", False),
+            "session_id": result["session_id"]
+        }
+
+    def _get_query_semaphore(self) -> asyncio.Semaphore:
+        """获取查询并发信号量（按事件循环惰性创建）"""
+        loop = asyncio.get_running_loop()
+        if self._query_semaphore is None or self._semaphore_loop is not loop:
+            self._query_semaphore = asyncio.Semaphore(settings.QUERY_MAX_CONCURRENCY)
+            self._semaphore_loop = loop
+        return self._query_semaphore
+
+    def _prepare_query(self,
+                       query: str,
+                       session_id: Optional[str],
+                       max_results: int,
+                       start_time: float) -> Dict[str, Any]:
+        """LLM调用之前的全部同步步骤：查语义缓存、检索过滤文档、构建提示词
+
+        返回的state中 result 不为空时（命中缓存或没有相关文档）可直接返回给用户。
+        """
+        timings: Dict[str, float] = {}
+        stage_start = time.time()
+        history = self.history_compactor.build(session_id)
+        embedding = self.vector_store_service.embed_query(query)
+        corpus_version = self.vector_store_service.corpus_version
+        timings["embedding"] = time.time() - stage_start
+
+        state = {
+            "result": None,
+            "embedding": embedding,
+            "max_results": max_results,
+            "corpus_version": corpus_version,
+            "timings": timings,
+            # 依赖对话历史的回答不参与缓存
+            "cacheable": settings.ANSWER_CACHE_ENABLED and not history["has_history"]
+        }
+
+        # 1. 语义答案缓存
+        if state["cacheable"]:
+            stage_start = time.time()
+            cached = self.answer_cache.lookup(embedding, max_results, corpus_version)
+            timings["cache_lookup"] = time.time() - stage_start
+            if cached is not None:
+                result = {
+                    **cached,
+                    "processing_time": time.time() - start_time,
+                    "retrieval_time": time.time() - start_time,
+                    "time_to_first_token": None,
+                    "stage_timings": timings,
+                    "session_id": session_id,
+                    "cached": True
+                }
+                self._remember_turn(session_id, query, result["answer"])
+                logger.info("命中语义答案缓存")
+                state["result"] = result
+                return state
+
+        # 2. 检索并过滤相关文档（启用重排序时过量召回后重排）
+        stage_start = time.time()
+        filtered_docs = self._retrieve(query, embedding, max_results)
+        timings["retrieval"] = time.time() - stage_start
+        if self.rerank_stage is not None and filtered_docs:
+            stage_start = time.time()
+            filtered_docs = self.rerank_stage.rerank(query, filtered_docs, max_results)
+            timings["rerank"] = time.time() - stage_start
+        state["retrieval_time"] = time.time() - start_time
+        if not filtered_docs:
+            result = self._build_empty_result(start_time, session_id, state["retrieval_time"])
+            result["stage_timings"] = timings
+            state["result"] = result
+            return state
+
+        # 3. 构建完整提示词
+        stage_start = time.time()
+        state["filtered_docs"] = filtered_docs
+        packed = self.context_packer.pack(filtered_docs)
+        state["context_tokens"] = packed["context_tokens"]
+        state["context_tokens_saved"] = packed["tokens_saved"]
+        state["prompt"] = self.prompt_template.format(
+            context=packed["context"],
+            chat_history=history["text"],
+            question=query
+        )
+        state["history_tokens"] = history["tokens"]
+        state["prompt_tokens"] = count_tokens(state["prompt"])
+        timings["prompt"] = time.time() - stage_start
+        state["prepared_at"] = time.time()
+        return state
+
+    def _retrieve(self, query: str, embedding: List[float], max_results: int) -> List[Tuple[Document, float]]:
+        """混合检索相关文档（相似度阈值只过滤稠密检索结果，词法命中的块不受影响）"""
+        k = max_results
+        if self.rerank_stage is not None:
+            k = max_results * settings.RERANK_CANDIDATE_MULTIPLIER
+        return self.vector_store_service.hybrid_search_by_vector_with_score(
+            query=query,
+            embedding=embedding,
+            k=k,
+            score_threshold=settings.SIMILARITY_THRESHOLD
+        )
+
+    def _finalize_result(self,
+                         query: str,
+                         answer: str,
+                         state: Dict[str, Any],
+                         start_time: float,
+                         session_id: Optional[str],
+                         time_to_first_token: Optional[float] = None) -> Dict[str, Any]:
+        """写入答案缓存并构建查询结果（对话记忆由调用方更新）"""
+        filtered_docs = state["filtered_docs"]
+        timings = {**state["timings"], "generation": time.time() - state["prepared_at"]}
+
+        sources = self._build_sources(filtered_docs)
+        confidence = self._calculate_confidence(filtered_docs)
+
+        # 写入语义答案缓存
+        if state["cacheable"]:
+            self.answer_cache.put(
+                state["embedding"],
+                state["max_results"],
+                state["corpus_version"],
+                {
+                    "answer": answer,
+                    "sources": sources,
+                    "confidence": confidence,
+                    "retrieved_count": len(filtered_docs)
+                }
+            )
+
+        processing_time = time.time() - start_time
+
+        result = {
+            "answer": answer,
+            "sources": sources,
+            "confidence": confidence,
+            "retrieved_count": len(filtered_docs),
+            "processing_time": processing_time,
+            "retrieval_time": state["retrieval_time"],
+            "time_to_first_token": time_to_first_token,
+            "stage_timings": timings,
+            "context_tokens": state["context_tokens"],
+            "context_tokens_saved": state["context_tokens_saved"],
+            "history_tokens": state["history_tokens"],
+            "prompt_tokens": state["prompt_tokens"],
+            "completion_tokens": count_tokens(answer),
+            "session_id": session_id
+        }
+
+        logger.info(f"查询处理完成，耗时: {processing_time:.2f}秒，提示词 {state['prompt_tokens']} tokens")
+        return result
+
+    def _build_empty_result(self,
+                            start_time: float,
+                            session_id: Optional[str],
+                            retrieval_time: Optional[float] = None) -> Dict[str, Any]:
+        """构建未检索到相关文档时的结果"""
+        return {
+            "answer": "抱歉，我在文档中没有找到相关信息来回答您的问题。请尝试换个方式提问，或者上传更多相关文档。",
+            "sources": [],
+            "confidence": 0.0,
+            "retrieved_count": 0,
+            "processing_time": time.time() - start_time,
+            "retrieval_time": retrieval_time,
+            "session_id": session_id
+        }
+
+    def _build_error_result(self,
+                            error: Exception,
+                            start_time: float,
+                            session_id: Optional[str]) -> Dict[str, Any]:
+        """构建查询出错时的结果"""
+        logger.error(f"处理查询时发生错误: {str(error)}")
+        return {
+            "answer": f"处理查询时发生错误: {str(error)}",
+            "sources": [],
+            "confidence": 0.0,
+            "retrieved_count": 0,
+            "processing_time": time.time() - start_time,
+            "session_id": session_id,
+            "error": str(error)
+        }
+
+    def _remember_turn(self, session_id: Optional[str], query: str, answer: str):
+        """记录一轮对话，并在后台把更早的轮次并入摘要（未提供session_id时不记录）"""
+        if not session_id:
+            return
+        self.memory_store.add_turn(session_id, query, answer)
+        self.history_compactor.schedule(session_id, self.llm)
+
+    async def _aremember_turn(self, session_id: Optional[str], query: str, answer: str):
+        """异步路径记录一轮对话：记忆存储的读写（SQLite）放到线程池，避免阻塞事件循环"""
+        if not session_id:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.memory_store.add_turn, session_id, query, answer)
+        self.history_compactor.schedule(session_id, self.llm)
 
     def _calculate_confidence(self, docs_with_scores: List[Tuple[Document, float]]) -> float:
         """计算回答的置信度"""
@@ -223,22 +630,18 @@ class RAGAgent:
 
         return sources
 
-    def clear_memory(self):
-        """清空对话记忆"""
-        self.memory.clear()
-        logger.info("对话记忆已清空")
+    def clear_memory(self, session_id: str):
+        """清空指定会话的对话记忆"""
+        if not session_id:
+            raise ValueError("清空对话记忆需要指定session_id")
+        self.memory_store.clear(session_id)
+        logger.info(f"对话记忆已清空: {session_id}")
+
+    def clear_all_memory(self):
+        """清空全部会话的对话记忆"""
+        self.memory_store.clear()
+        logger.info("对话记忆已清空: 全部会话")
 
-    def get_memory_info(self) -> Dict[str, Any]:
+    def get_memory_info(self, session_id: Optional[str] = None) -> Dict[str, Any]:
         """获取记忆信息"""
-        messages = self.memory.chat_memory.messages
-        return {
-            'total_messages': len(messages),
-            'memory_window': self.memory.k,
-            'recent_messages': [
-                {
-                    'type': type(msg).__name__,
-                    'content': msg.content[:100] + "..." if len(msg.content) > 100 else msg.content
-                }
-                for msg in messages[-4:]
-            ]
-        }
\ No newline at end of file
+        return {**self.memory_store.get_info(session_id), **self.history_compactor.get_stats()}
@@ -0,0 +1,160 @@
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import List, Optional, Tuple, Callable
+
+from langchain.schema import Document
+
+from app.config import settings
+from app.services.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+
+class BaseReranker(ABC):
+    """检索结果重排序打分器：对一组候选文档块一次性批量打分，分数越大越相关"""
+
+    name = "base"
+
+    @abstractmethod
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        """批量计算查询与每个候选文本的相关度"""
+
+
+class LexicalOverlapReranker(BaseReranker):
+    """按查询词项在候选文本中的覆盖率打分，无需模型，耗时可忽略"""
+
+    name = "lexical"
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return [0.0] * len(texts)
+        return [len(query_terms & set(tokenize(text))) / len(query_terms) for text in texts]
+
+
+class CrossEncoderReranker(BaseReranker):
+    """基于 sentence-transformers CrossEncoder 的重排序（CPU可用），模型在首次打分时加载"""
+
+    name = "cross-encoder"
+
+    def __init__(self,
+                 model_name: str = settings.RERANK_MODEL,
+                 batch_size: int = settings.RERANK_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _get_model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name)
+                    logger.info(f"重排序模型加载完成: {self.model_name}")
+        return self._model
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        scores = self._get_model().predict(
+            [(query, text) for text in texts],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        return [float(score) for score in scores]
+
+
+class StubReranker(BaseReranker):
+    """测试用打分器：默认按候选原有顺序给出递减分数，也可传入自定义打分函数"""
+
+    name = "stub"
+
+    def __init__(self, score_fn: Optional[Callable[[str, str], float]] = None):
+        self.score_fn = score_fn
+        self.calls = 0
+
+    def score(self, query: str, texts: List[str]) -> List[float]:
+        self.calls += 1
+        if self.score_fn is not None:
+            return [self.score_fn(query, text) for text in texts]
+        return [float(len(texts) - i) for i in range(len(texts))]
+
+
+class RerankStage:
+    """检索与构建提示词之间的重排序阶段
+
+    对过量召回的候选一次性批量打分并只保留前N个。打分耗时按单个候选的平均耗时估算，
+    候选过多时按检索顺序截断到预算内可处理的数量；打分在独立线程池中执行，
+    超出时间预算或出错时不再等待，直接退回检索顺序（超时的打分在后台完成后只用于更新耗时估算）。
+    """
+
+    def __init__(self,
+                 reranker: BaseReranker,
+                 time_budget_ms: float = settings.RERANK_TIME_BUDGET_MS,
+                 max_workers: int = settings.RERANK_MAX_WORKERS):
+        self.reranker = reranker
+        self.time_budget = time_budget_ms / 1000
+        self._per_item_cost: Optional[float] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rerank")
+
+    def rerank(self,
+               query: str,
+               docs_with_scores: List[Tuple[Document, float]],
+               top_n: int) -> List[Tuple[Document, float]]:
+        """返回重排序后的前top_n个 (文档, 余弦距离)"""
+        if len(docs_with_scores) <= 1:
+            return docs_with_scores[:top_n]
+
+        candidates = docs_with_scores[:self._max_candidates(top_n)]
+        start = time.perf_counter()
+        future = self._executor.submit(self.reranker.score, query, [doc.page_content for doc, _ in candidates])
+        try:
+            scores = future.result(timeout=self.time_budget)
+        except FutureTimeoutError:
+            future.add_done_callback(lambda done: self._record_late(done, start, len(candidates)))
+            logger.warning(f"重排序超出预算 {self.time_budget * 1000:.0f}ms，使用检索顺序")
+            return docs_with_scores[:top_n]
+        except Exception as e:
+            logger.error(f"重排序失败，使用检索顺序: {str(e)}")
+            return docs_with_scores[:top_n]
+
+        self._record_cost(time.perf_counter() - start, len(candidates))
+        order = sorted(range(len(candidates)), key=lambda i: scores[i], reverse=True)
+        return [candidates[i] for i in order[:top_n]]
+
+    def _max_candidates(self, top_n: int) -> int:
+        """按历史单个候选打分耗时估算预算内最多可处理的候选数"""
+        with self._lock:
+            per_item_cost = self._per_item_cost
+        if not per_item_cost:
+            return max(top_n, 1) * settings.RERANK_CANDIDATE_MULTIPLIER
+        return max(top_n, int(self.time_budget / per_item_cost))
+
+    def _record_late(self, future: Future, start: float, count: int):
+        """超时的打分完成后仍记录耗时，使之后的候选数收缩到预算内"""
+        if not future.cancelled() and future.exception() is None:
+            self._record_cost(time.perf_counter() - start, count)
+
+    def _record_cost(self, elapsed: float, count: int):
+        with self._lock:
+            cost = elapsed / max(count, 1)
+            # 指数移动平均，平滑单次抖动
+            self._per_item_cost = cost if self._per_item_cost is None else 0.8 * self._per_item_cost + 0.2 * cost
+
+
+def create_rerank_stage() -> Optional[RerankStage]:
+    """根据配置创建重排序阶段，未启用时返回None"""
+    if settings.RERANKER == "none":
+        return None
+    rerankers = {
+        "lexical": LexicalOverlapReranker,
+        "cross-encoder": CrossEncoderReranker,
+        "stub": StubReranker
+    }
+    if settings.RERANKER not in rerankers:
+        raise ValueError(f"不支持的重排序类型: {settings.RERANKER}")
+    logger.info(f"启用重排序: {settings.RERANKER}")
+    return RerankStage(rerankers[settings.RERANKER]())
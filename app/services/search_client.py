@@ -0,0 +1,221 @@
+"""
+检索服务进程的客户端（多进程部署时由API工作进程使用）
+
+RemoteVectorStoreService 与 RemoteIngestionQueue 提供与 VectorStoreService、IngestionJobQueue 相同的接口，
+调用经本地套接字（multiprocessing.connection）转发到检索服务进程执行（见 search_server）。
+每个响应都带回检索服务当前的语料版本，答案缓存与查询合并据此失效。
+"""
+
+import queue
+import logging
+import threading
+from multiprocessing.connection import Client, Connection
+from typing import Dict, List, Any, Optional, Tuple, Callable
+
+from langchain.schema import Document
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+# 认证密钥的最小长度；早期版本的固定默认密钥是公开的，不再接受
+MIN_AUTHKEY_LENGTH = 16
+INSECURE_AUTHKEYS = {"rag-search-server"}
+
+
+class SearchServerError(Exception):
+    """无法连接检索服务进程或连接中断"""
+
+
+def resolve_authkey(authkey: Optional[str]) -> bytes:
+    """校验套接字认证密钥
+
+    multiprocessing.connection 会反序列化收到的数据，知道密钥即可在对端执行任意代码，
+    因此密钥必须显式配置且不能是公开的默认值。
+    """
+    if not authkey or len(authkey) < MIN_AUTHKEY_LENGTH or authkey in INSECURE_AUTHKEYS:
+        raise ValueError(
+            f"SEARCH_SERVER_AUTHKEY 未设置或不安全：需要至少 {MIN_AUTHKEY_LENGTH} 个字符的随机密钥"
+            "（使用 python -m app.serve 启动时会自动生成）"
+        )
+    return authkey.encode("utf-8")
+
+
+class SearchClient:
+    """到检索服务进程的连接池，每个连接同时只承载一个调用"""
+
+    def __init__(self,
+                 address: Optional[str] = settings.SEARCH_SERVER_SOCKET,
+                 authkey: Optional[str] = settings.SEARCH_SERVER_AUTHKEY,
+                 pool_size: int = settings.SEARCH_CLIENT_POOL_SIZE):
+        self.address = address
+        self.authkey = resolve_authkey(authkey)
+        self.pool_size = pool_size
+        self._idle: "queue.LifoQueue[Connection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self.corpus_version = 0
+        self.calls = 0
+        self.reconnects = 0
+
+    def call(self, target: str, method: str, *args, **kwargs) -> Any:
+        """在检索服务进程中调用 target.method，远端抛出的异常原样在本地抛出"""
+        with self._slots:
+            for attempt in range(2):
+                conn, reused = self._checkout()
+                completed = False
+                try:
+                    conn.send((target, method, args, kwargs))
+                    ok, value, corpus_version = conn.recv()
+                    completed = True
+                except (EOFError, OSError) as e:
+                    # 闲置连接可能因检索服务重启而失效，换新连接重试一次
+                    if reused and attempt == 0:
+                        self.reconnects += 1
+                        continue
+                    logger.error(f"检索服务调用失败 {target}.{method}: {str(e)}")
+                    raise SearchServerError(f"检索服务连接中断: {str(e)}")
+                finally:
+                    # 只有完整收发一次的连接才放回连接池，中途出错（含响应无法反序列化）的连接状态未知，直接关闭
+                    if completed:
+                        self._idle.put(conn)
+                    else:
+                        conn.close()
+
+                self.calls += 1
+                self.corpus_version = corpus_version
+                if not ok:
+                    raise value
+                return value
+
+    def _checkout(self) -> Tuple[Connection, bool]:
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            pass
+        try:
+            return Client(self.address, authkey=self.authkey), False
+        except (OSError, EOFError) as e:
+            raise SearchServerError(f"无法连接检索服务 {self.address}: {str(e)}")
+
+    def ping(self):
+        self.call("server", "ping")
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "address": self.address,
+            "pool_size": self.pool_size,
+            "idle_connections": self._idle.qsize(),
+            "calls": self.calls,
+            "reconnects": self.reconnects
+        }
+
+
+class RemoteVectorStoreService:
+    """VectorStoreService 的远程代理：嵌入模型、向量库与词法索引都在检索服务进程中"""
+
+    def __init__(self, client: SearchClient):
+        self.client = client
+
+    @property
+    def corpus_version(self) -> int:
+        """最近一次调用时检索服务的语料版本"""
+        return self.client.corpus_version
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        return self.client.call("vector_store", method, *args, **kwargs)
+
+    def add_documents(self,
+                      documents: List[Document],
+                      progress_callback: Optional[Callable[..., None]] = None) -> List[str]:
+        """添加文档到向量存储（进度回调不能跨进程传递，写入完成后回调一次）"""
+        doc_ids = self._call("add_documents", documents)
+        if progress_callback:
+            progress_callback(chunks_embedded=len(documents), chunks_written=len(documents))
+        return doc_ids
+
+    def similarity_search(self,
+                          query: str,
+                          k: int = 5,
+                          filter_dict: Optional[Dict] = None) -> List[Document]:
+        return self._call("similarity_search", query, k=k, filter_dict=filter_dict)
+
+    def embed_query(self, query: str) -> List[float]:
+        return self._call("embed_query", query)
+
+    def similarity_search_with_score(self,
+                                     query: str,
+                                     k: int = 5,
+                                     filter_dict: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        return self._call("similarity_search_with_score", query, k=k, filter_dict=filter_dict)
+
+    def similarity_search_by_vector_with_score(self,
+                                               embedding: List[float],
+                                               k: int = 5,
+                                               filter_dict: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        return self._call("similarity_search_by_vector_with_score", embedding, k=k, filter_dict=filter_dict)
+
+    def hybrid_search_by_vector_with_score(self,
+                                           query: str,
+                                           embedding: List[float],
+                                           k: int = 5,
+                                           score_threshold: Optional[float] = None) -> List[Tuple[Document, float]]:
+        return self._call("hybrid_search_by_vector_with_score", query=query, embedding=embedding, k=k,
+                          score_threshold=score_threshold)
+
+    def update_metadatas(self, documents: List[Document]) -> bool:
+        return self._call("update_metadatas", documents)
+
+    def delete_documents(self, doc_ids: List[str]) -> bool:
+        return self._call("delete_documents", doc_ids)
+
+    def count(self) -> int:
+        return self._call("count")
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        return self._call("get_cache_stats")
+
+    def warm_up(self, passes: int):
+        """检索服务启动时已预热模型与索引，这里只建立连接"""
+        self.client.ping()
+
+    def get_collection_info(self) -> Dict[str, Any]:
+        return self._call("get_collection_info")
+
+    def reset_collection(self) -> bool:
+        return self._call("reset_collection")
+
+
+class RemoteIngestionQueue:
+    """IngestionJobQueue 的远程代理：入库任务在检索服务进程中执行，任一API进程都能查询任务状态
+
+    上传文件由API进程写入本机临时目录，检索服务进程按路径读取并在入库后删除。
+    """
+
+    def __init__(self, client: SearchClient):
+        self.client = client
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        return self.client.call("ingestion_queue", method, *args, **kwargs)
+
+    def submit(self, file_path: str, filename: str, file_size: int, file_hash: str) -> Dict[str, Any]:
+        return self._call("submit", file_path, filename, file_size, file_hash)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._call("get_job", job_id)
+
+    def list_jobs(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return self._call("list_jobs", limit)
+
+    def delete_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        return self._call("delete_document", document_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return self._call("get_stats")
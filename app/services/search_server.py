@@ -0,0 +1,143 @@
+"""
+嵌入/检索服务进程
+
+多进程部署时由 app.serve 启动：嵌入模型、向量库、词法索引、文档向量缓存与入库队列只在本进程中加载一份，
+API工作进程经本地套接字（multiprocessing.connection）调用（见 search_client）。
+每个连接由一个线程处理，来自不同工作进程的查询向量化仍在同一个微批中合并。
+
+运行: python -m app.services.search_server --socket /tmp/rag-search.sock
+"""
+
+import os
+import sys
+import signal
+import logging
+import argparse
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Connection
+from typing import Dict, Any, Optional, Tuple
+
+from app.config import settings
+from app.services.container import ServiceContainer
+from app.services.search_client import resolve_authkey
+
+logger = logging.getLogger(__name__)
+
+# 允许远程调用的方法（其余属性与方法不对外暴露）
+EXPOSED_METHODS = {
+    "vector_store": {
+        "add_documents", "similarity_search", "embed_query", "similarity_search_with_score",
+        "similarity_search_by_vector_with_score", "hybrid_search_by_vector_with_score",
+        "update_metadatas", "delete_documents", "count", "get_cache_stats", "get_collection_info",
+        "reset_collection"
+    },
+    "ingestion_queue": {"submit", "get_job", "list_jobs", "delete_document", "get_stats"},
+}
+
+
+class SearchServer:
+    """检索服务：在本地套接字上接受API进程的调用，调用结果与当前语料版本一起返回"""
+
+    def __init__(self,
+                 address: str,
+                 authkey: Optional[str] = settings.SEARCH_SERVER_AUTHKEY,
+                 services: Optional[ServiceContainer] = None):
+        self.address = address
+        self.authkey = resolve_authkey(authkey)
+        # 本进程直接持有模型与向量库
+        self.services = services or ServiceContainer(search_server=None)
+        self._listener: Optional[Listener] = None
+        self._closed = False
+        self.connections = 0
+
+    def start(self):
+        """构建服务并预热后开始监听，监听开始即表示检索服务可用"""
+        self.services.vector_store_service
+        self.services.ingestion_queue
+        self.services.warm_up()
+
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        self._listener = Listener(self.address, authkey=self.authkey)
+        logger.info(f"检索服务已就绪: {self.address}")
+
+    def serve_forever(self):
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except AuthenticationError as e:
+                logger.warning(f"拒绝认证失败的连接: {str(e)}")
+                continue
+            except OSError:
+                if self._closed:
+                    return
+                raise
+            self.connections += 1
+            threading.Thread(target=self._handle, args=(conn,), name="search-conn", daemon=True).start()
+
+    def _handle(self, conn: Connection):
+        with conn:
+            while True:
+                try:
+                    target, method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                response = self._dispatch(target, method, args, kwargs)
+                try:
+                    conn.send(response)
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    # 返回值或异常无法序列化
+                    conn.send((False, RuntimeError(f"检索服务返回结果无法序列化: {str(e)}"), response[2]))
+
+    def _dispatch(self, target: str, method: str, args: Tuple, kwargs: Dict[str, Any]) -> Tuple[bool, Any, int]:
+        vector_store_service = self.services.vector_store_service
+        try:
+            if target == "server" and method == "ping":
+                value = "pong"
+            elif method in EXPOSED_METHODS.get(target, ()):
+                service = vector_store_service if target == "vector_store" else self.services.ingestion_queue
+                value = getattr(service, method)(*args, **kwargs)
+            else:
+                raise AttributeError(f"不支持的远程调用: {target}.{method}")
+            return True, value, vector_store_service.corpus_version
+
+        except Exception as e:
+            return False, e, vector_store_service.corpus_version
+
+    def close(self):
+        self._closed = True
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入/检索服务进程")
+    parser.add_argument("--socket", default=settings.SEARCH_SERVER_SOCKET, help="监听的本地套接字路径")
+    args = parser.parse_args()
+    if not args.socket:
+        parser.error("需要 --socket 或 SEARCH_SERVER_SOCKET")
+
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    # 启动器以 SIGTERM 结束本进程
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    try:
+        server = SearchServer(args.socket)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        server.start()
+        server.serve_forever()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,615 @@
+import os
+import json
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+
+import numpy as np
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+
+from app.config import settings
+from app.services.quantization import BaseQuantizer, create_quantizer
+from app.utils.helpers import connect_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+class BaseVectorBackend(ABC):
+    """文档块向量存储后端
+
+    距离统一为余弦距离（1 - 余弦相似度，越小越相似），与上层的 SIMILARITY_THRESHOLD 保持一致。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def upsert(self,
+               ids: List[str],
+               embeddings: List[List[float]],
+               texts: List[str],
+               metadatas: List[Dict[str, Any]]):
+        """写入文档块，已存在的ID会被覆盖"""
+
+    @abstractmethod
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        """只更新已存在文档块的元数据"""
+
+    @abstractmethod
+    def delete(self, ids: List[str]):
+        """按ID删除文档块"""
+
+    @abstractmethod
+    def get(self, ids: List[str]) -> List[Tuple[str, Document, List[float]]]:
+        """按ID读取文档块及其向量，不存在的ID被忽略"""
+
+    @abstractmethod
+    def search(self,
+               embeddings: List[List[float]],
+               k: int = 5,
+               filter_dict: Optional[Dict[str, Any]] = None) -> List[List[Tuple[Document, float]]]:
+        """批量top-k检索：每个查询向量返回按余弦距离升序的 (文档, 距离)"""
+
+    @abstractmethod
+    def count(self) -> int:
+        """文档块数量（O(1)）"""
+
+    @abstractmethod
+    def reset(self):
+        """清空全部数据"""
+
+    @abstractmethod
+    def iter_texts(self, page_size: int = 1000) -> Iterator[Tuple[List[str], List[str]]]:
+        """分页遍历全部文档块的 (ID列表, 文本列表)，用于重建派生索引"""
+
+    @abstractmethod
+    def get_info(self) -> Dict[str, Any]:
+        """集合名称与存储位置"""
+
+
+class ChromaBackend(BaseVectorBackend):
+    """基于Chroma（HNSW）的向量存储"""
+
+    name = "chroma"
+
+    def __init__(self,
+                 embedding_function: Optional[Embeddings] = None,
+                 persist_directory: str = settings.CHROMA_DB_PATH):
+        self.embedding_function = embedding_function
+        self.persist_directory = persist_directory
+        self.vector_store = None
+        self._initialize_store()
+
+    def _initialize_store(self):
+        """初始化向量存储"""
+        import chromadb
+        from langchain_community.vectorstores import Chroma
+
+        try:
+            client_settings = chromadb.config.Settings(
+                is_persistent=True,
+                persist_directory=self.persist_directory,
+                anonymized_telemetry=False,
+                chroma_product_telemetry_impl="app.services.chroma_telemetry.NoopProductTelemetry"
+            )
+            self.vector_store = Chroma(
+                persist_directory=self.persist_directory,
+                embedding_function=self.embedding_function,
+                collection_metadata={"hnsw:space": "cosine"},
+                client_settings=client_settings
+            )
+            logger.info(f"向量存储初始化成功: {self.persist_directory}")
+
+        except Exception as e:
+            logger.error(f"向量存储初始化失败: {str(e)}")
+            raise
+
+    def upsert(self, ids, embeddings, texts, metadatas):
+        self.vector_store._collection.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=texts)
+
+    def update_metadatas(self, ids, metadatas):
+        self.vector_store._collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids):
+        self.vector_store.delete(ids=ids)
+
+    def get(self, ids):
+        stored = self.vector_store._collection.get(ids=ids, include=["documents", "metadatas", "embeddings"])
+        return [
+            (chunk_id, Document(page_content=text, metadata=metadata or {}), embedding)
+            for chunk_id, text, metadata, embedding in zip(
+                stored["ids"], stored["documents"], stored["metadatas"], stored["embeddings"]
+            )
+        ]
+
+    def search(self, embeddings, k=5, filter_dict=None):
+        if self.count() == 0:
+            return [[] for _ in embeddings]
+        results = self.vector_store._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            where=filter_dict,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [
+                (Document(page_content=text, metadata=metadata or {}), distance)
+                for text, metadata, distance in zip(texts, metadatas, distances)
+            ]
+            for texts, metadatas, distances in zip(
+                results["documents"], results["metadatas"], results["distances"]
+            )
+        ]
+
+    def count(self):
+        return self.vector_store._collection.count()
+
+    def reset(self):
+        # 直接删除并重建集合，无需先读取全部文档ID
+        self.vector_store.delete_collection()
+        self._initialize_store()
+
+    def iter_texts(self, page_size=1000):
+        offset = 0
+        while True:
+            page = self.vector_store._collection.get(limit=page_size, offset=offset, include=["documents"])
+            if not page["ids"]:
+                return
+            yield page["ids"], page["documents"]
+            offset += len(page["ids"])
+
+    def get_info(self):
+        return {
+            'collection_name': getattr(self.vector_store, '_collection_name', 'langchain'),
+            'persist_directory': self.persist_directory
+        }
+
+
+class NumpyBackend(BaseVectorBackend):
+    """内存映射的向量矩阵（默认float16）+ SQLite元数据表，精确暴力检索
+
+    向量写入前归一化，余弦相似度即矩阵乘法；按块计算相似度并用 argpartition 取top-k，
+    结果精确，批量查询时一次遍历矩阵即可服务整批请求。
+    float16 使内存与磁盘占用减半，但检索时需逐块转换为float32；对延迟敏感时可使用float32。
+    删除的行只在存活掩码中标记，之后写入的新文档块会复用这些行。
+
+    启用量化（int8/pq）时另存一份压缩编码：第一轮只扫描编码取 top-k × rescore_factor 个候选，
+    再用原始向量对候选精排，常驻内存的主要是编码。PQ码本需在文档块达到 pq_train_size 后训练，
+    此前使用精确检索；量化方式变化时会从原始向量重新编码。
+    """
+
+    name = "numpy"
+
+    def __init__(self,
+                 directory: str = settings.NUMPY_INDEX_PATH,
+                 block_size: int = settings.NUMPY_SEARCH_BLOCK_SIZE,
+                 dtype: str = settings.NUMPY_INDEX_DTYPE,
+                 initial_capacity: int = 1024,
+                 quantization: str = settings.NUMPY_QUANTIZATION,
+                 rescore_factor: int = settings.NUMPY_RESCORE_FACTOR,
+                 pq_subvectors: int = settings.NUMPY_PQ_SUBVECTORS,
+                 pq_train_size: int = settings.NUMPY_PQ_TRAIN_SIZE):
+        self.directory = directory
+        self.block_size = block_size
+        self.default_dtype = dtype
+        self.initial_capacity = initial_capacity
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self.pq_subvectors = pq_subvectors
+        self.pq_train_size = pq_train_size
+        self.vectors_path = os.path.join(directory, "vectors.bin")
+        self.codes_path = os.path.join(directory, "codes.bin")
+        self.scales_path = os.path.join(directory, "scales.bin")
+        self.db_path = os.path.join(directory, "metadata.db")
+
+        self._local = threading.local()
+        self._lock = threading.RLock()
+        self._load()
+
+    def _connect(self) -> sqlite3.Connection:
+        """每个线程使用独立连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = connect_sqlite(self.db_path)
+            self._local.conn = conn
+        return conn
+
+    def _load(self):
+        """加载元数据表并映射向量文件"""
+        os.makedirs(self.directory, exist_ok=True)
+        conn = self._connect()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS chunks (
+                row INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                document TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        self.dim: Optional[int] = int(meta['dim']) if 'dim' in meta else None
+        # 已有索引沿用建立时的精度
+        self.dtype = np.dtype(meta.get('dtype', self.default_dtype))
+        if self.dtype not in (np.float16, np.float32):
+            raise ValueError(f"不支持的向量精度: {self.dtype}")
+        # 已使用的行数（含已删除的行）
+        self._rows = int(meta.get('rows', 0))
+        self._matrix: Optional[np.memmap] = None
+        self._capacity = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self.quantizer: Optional[BaseQuantizer] = None
+        self._codes: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+
+        if self.dim is not None:
+            self._open_matrix(max(self._rows, self.initial_capacity))
+            self._alive = np.zeros(self._capacity, dtype=bool)
+            rows = [row for (row,) in conn.execute("SELECT row FROM chunks")]
+            self._alive[rows] = True
+        self._count = int(self._alive.sum())
+        self._free_rows = [int(row) for row in np.flatnonzero(~self._alive[:self._rows])]
+        if self.dim is not None:
+            self._setup_quantizer(meta.get('quantization', 'none'))
+        logger.info(f"NumPy向量索引加载完成: {self._count} 个文档块，维度 {self.dim}，量化 {self.quantization}")
+
+    @staticmethod
+    def _map_file(path: str, dtype: np.dtype, shape: Tuple[int, ...]) -> np.memmap:
+        """按形状映射文件（文件不足时扩展）"""
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        with open(path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+    def _open_matrix(self, capacity: int):
+        """按容量映射向量文件及压缩编码文件"""
+        if self._matrix is not None:
+            self._matrix.flush()
+        self._matrix = self._map_file(self.vectors_path, self.dtype, (capacity, self.dim))
+        self._capacity = capacity
+        if self.quantizer is not None:
+            self._open_codes()
+
+    def _open_codes(self):
+        if self._codes is not None:
+            self._codes.flush()
+        self._codes = self._map_file(
+            self.codes_path, self.quantizer.code_dtype, (self._capacity, self.quantizer.code_size)
+        )
+        if self.quantizer.has_scales:
+            if self._scales is not None:
+                self._scales.flush()
+            self._scales = self._map_file(self.scales_path, np.float32, (self._capacity,))
+
+    def _setup_quantizer(self, stored: str):
+        """创建编码器并映射编码文件；量化方式变化或码本缺失时从原始向量重新编码"""
+        self.quantizer = create_quantizer(self.quantization, self.dim, self.pq_subvectors)
+        if self.quantizer is None:
+            if stored != 'none':
+                self._set_meta('quantization', 'none')
+            return
+        self._open_codes()
+        loaded = self.quantizer.load(self.directory)
+        if stored != self.quantization or not loaded:
+            self._requantize()
+
+    def _set_meta(self, key: str, value: str):
+        self._connect().execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, value))
+
+    def _requantize(self):
+        """（训练码本并）用原始向量重新编码全部行"""
+        if not self.quantizer.trained:
+            if self._count < self.pq_train_size:
+                return
+            alive_rows = np.flatnonzero(self._alive[:self._rows])
+            sample = np.random.default_rng(0).choice(
+                alive_rows, min(len(alive_rows), self.pq_train_size), replace=False
+            )
+            self.quantizer.train(np.asarray(self._matrix[np.sort(sample)], dtype=np.float32))
+            self.quantizer.save(self.directory)
+
+        logger.info(f"开始重新编码向量: {self._rows} 行，量化 {self.quantization}")
+        for start in range(0, self._rows, 65536):
+            end = min(start + 65536, self._rows)
+            self._write_codes(np.arange(start, end), np.asarray(self._matrix[start:end], dtype=np.float32))
+        self._codes.flush()
+        if self._scales is not None:
+            self._scales.flush()
+        self._set_meta('quantization', self.quantization)
+
+    def _write_codes(self, rows, vectors: np.ndarray):
+        codes, scales = self.quantizer.encode(vectors)
+        self._codes[rows] = codes
+        if scales is not None:
+            self._scales[rows] = scales
+
+    def _quantized_ready(self) -> bool:
+        return self.quantizer is not None and self.quantizer.trained
+
+    def _ensure_capacity(self, rows: int):
+        if rows <= self._capacity:
+            return
+        capacity = max(self._capacity * 2, rows, self.initial_capacity)
+        self._open_matrix(capacity)
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self._alive)] = self._alive
+        self._alive = alive
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def _rows_for(self, conn: sqlite3.Connection, ids: List[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        # SQLite 单条语句的参数数量有限，分批查询
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(conn.execute(
+                f"SELECT chunk_id, row FROM chunks WHERE chunk_id IN ({placeholders})", batch
+            ).fetchall())
+        return found
+
+    def upsert(self, ids, embeddings, texts, metadatas):
+        if not ids:
+            return
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32))
+        conn = self._connect()
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                conn.executemany(
+                    "INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)",
+                    [('dim', str(self.dim)), ('dtype', self.dtype.name)]
+                )
+                self._ensure_capacity(self.initial_capacity)
+                self._setup_quantizer('none')
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"向量维度不一致: {vectors.shape[1]} != {self.dim}")
+
+            existing = self._rows_for(conn, ids)
+            rows = []
+            for chunk_id in ids:
+                if chunk_id in existing:
+                    rows.append(existing[chunk_id])
+                elif self._free_rows:
+                    rows.append(self._free_rows.pop())
+                else:
+                    rows.append(self._rows)
+                    self._rows += 1
+                # 同一批次内重复的ID写入同一行
+                existing.setdefault(chunk_id, rows[-1])
+
+            self._ensure_capacity(self._rows)
+            # 先写向量再提交元数据：中途失败时这些行不会被视为存活
+            self._matrix[rows] = vectors.astype(self.dtype)
+            self._matrix.flush()
+            if self._quantized_ready():
+                self._write_codes(rows, vectors)
+                self._codes.flush()
+                if self._scales is not None:
+                    self._scales.flush()
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO chunks(row, chunk_id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [(row, chunk_id, text, json.dumps(metadata or {}, ensure_ascii=False))
+                     for row, chunk_id, text, metadata in zip(rows, ids, texts, metadatas)]
+                )
+                conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('rows', ?)", (str(self._rows),))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._alive[rows] = True
+            self._count = int(self._alive.sum())
+            # PQ码本在文档块数量足够后首次训练
+            if self.quantizer is not None and not self.quantizer.trained:
+                self._requantize()
+
+    def update_metadatas(self, ids, metadatas):
+        self._connect().executemany(
+            "UPDATE chunks SET metadata = ? WHERE chunk_id = ?",
+            [(json.dumps(metadata or {}, ensure_ascii=False), chunk_id) for chunk_id, metadata in zip(ids, metadatas)]
+        )
+
+    def delete(self, ids):
+        if not ids:
+            return
+        conn = self._connect()
+        with self._lock:
+            rows = list(self._rows_for(conn, ids).values())
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("DELETE FROM chunks WHERE row = ?", [(row,) for row in rows])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._alive[rows] = False
+            self._free_rows.extend(rows)
+            self._count = int(self._alive.sum())
+
+    def _load_rows(self, rows: List[int]) -> Dict[int, Tuple[str, Document]]:
+        conn = self._connect()
+        loaded: Dict[int, Tuple[str, Document]] = {}
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            for row, chunk_id, text, metadata in conn.execute(
+                f"SELECT row, chunk_id, document, metadata FROM chunks WHERE row IN ({placeholders})", batch
+            ):
+                loaded[row] = (chunk_id, Document(page_content=text, metadata=json.loads(metadata)))
+        return loaded
+
+    def get(self, ids):
+        with self._lock:
+            rows = self._rows_for(self._connect(), ids)
+            loaded = self._load_rows(list(rows.values()))
+            return [
+                (chunk_id, loaded[row][1], self._matrix[row].astype(np.float32).tolist())
+                for chunk_id, row in rows.items() if row in loaded
+            ]
+
+    def _filter_mask(self, filter_dict: Dict[str, Any], rows: int) -> np.ndarray:
+        """按元数据过滤条件计算允许的行（支持等值、$eq、$in，多个字段为且关系）"""
+        clauses, params = [], []
+        for key, condition in filter_dict.items():
+            path = f'$."{key}"'
+            if isinstance(condition, dict):
+                (operator, value), = condition.items()
+                if operator == "$eq":
+                    clauses.append("json_extract(metadata, ?) = ?")
+                    params.extend([path, value])
+                elif operator == "$in":
+                    clauses.append(f"json_extract(metadata, ?) IN ({','.join('?' * len(value))})")
+                    params.extend([path, *value])
+                else:
+                    raise ValueError(f"不支持的过滤条件: {operator}")
+            else:
+                clauses.append("json_extract(metadata, ?) = ?")
+                params.extend([path, condition])
+
+        mask = np.zeros(rows, dtype=bool)
+        allowed = [row for (row,) in self._connect().execute(
+            f"SELECT row FROM chunks WHERE {' AND '.join(clauses)}", params
+        ) if row < rows]
+        mask[allowed] = True
+        return mask
+
+    def _scan(self, score_block, alive: np.ndarray, queries: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """按块计算相似度并保留每个查询的top-k，返回按相似度降序的 (分数, 行号)"""
+        rows = len(alive)
+        best_scores = np.full((queries, 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((queries, 0), dtype=np.int64)
+        for start in range(0, rows, self.block_size):
+            end = min(start + self.block_size, rows)
+            block_alive = alive[start:end]
+            if not block_alive.any():
+                continue
+            scores = score_block(start, end)
+            scores[:, ~block_alive] = -np.inf
+
+            # 每个块只保留top-k，再与之前的候选合并
+            if scores.shape[1] > k:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, top, axis=1)
+            else:
+                top = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_rows, order, axis=1)
+
+    @staticmethod
+    def _rescore(matrix: np.ndarray, queries: np.ndarray, candidate_scores: np.ndarray,
+                 candidate_rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """用原始向量对压缩编码检索出的候选精排"""
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), k), dtype=np.int64)
+        for i, query in enumerate(queries):
+            rows = candidate_rows[i][np.isfinite(candidate_scores[i])]
+            if not len(rows):
+                continue
+            scores = matrix[rows].astype(np.float32) @ query
+            top = np.argsort(-scores)[:k]
+            best_scores[i, :len(top)] = scores[top]
+            best_rows[i, :len(top)] = rows[top]
+        return best_scores, best_rows
+
+    def search(self, embeddings, k=5, filter_dict=None):
+        queries = self._normalize(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+        with self._lock:
+            matrix, alive, rows = self._matrix, self._alive[:self._rows].copy(), self._rows
+            quantized = self._quantized_ready()
+            quantizer, codes, scales = self.quantizer, self._codes, self._scales
+        if matrix is None or rows == 0 or k <= 0:
+            return [[] for _ in range(len(queries))]
+        # 以普通ndarray视图切片，避免每个块都构造memmap子类对象
+        matrix = np.asarray(matrix)
+        if filter_dict:
+            alive &= self._filter_mask(filter_dict, rows)
+
+        if quantized:
+            codes = np.asarray(codes)
+            scales = np.asarray(scales) if scales is not None else None
+            candidate_scores, candidate_rows = self._scan(
+                lambda start, end: quantizer.scores(
+                    queries, codes[start:end], scales[start:end] if scales is not None else None
+                ).astype(np.float32, copy=False),
+                alive, len(queries), k * self.rescore_factor
+            )
+            best_scores, best_rows = self._rescore(matrix, queries, candidate_scores, candidate_rows, k)
+        else:
+            best_scores, best_rows = self._scan(
+                lambda start, end: queries @ matrix[start:end].astype(np.float32, copy=False).T,
+                alive, len(queries), k
+            )
+
+        valid = np.isfinite(best_scores)
+        loaded = self._load_rows(sorted({int(row) for row in best_rows[valid]}))
+        results = []
+        for query_scores, query_rows, query_valid in zip(best_scores, best_rows, valid):
+            results.append([
+                (loaded[int(row)][1], float(max(0.0, 1.0 - score)))
+                for score, row, ok in zip(query_scores, query_rows, query_valid)
+                if ok and int(row) in loaded
+            ])
+        return results
+
+    def count(self):
+        return self._count
+
+    def reset(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM chunks")
+            conn.execute("DELETE FROM meta")
+            self._matrix = self._codes = self._scales = None
+            for path in (self.vectors_path, self.codes_path, self.scales_path,
+                         os.path.join(self.directory, "pq_codebook.npy")):
+                if os.path.exists(path):
+                    os.unlink(path)
+            self._load()
+
+    def iter_texts(self, page_size=1000):
+        last_row = -1
+        while True:
+            page = self._connect().execute(
+                "SELECT row, chunk_id, document FROM chunks WHERE row > ? ORDER BY row LIMIT ?",
+                (last_row, page_size)
+            ).fetchall()
+            if not page:
+                return
+            yield [chunk_id for _, chunk_id, _ in page], [text for _, _, text in page]
+            last_row = page[-1][0]
+
+    def get_info(self):
+        return {
+            'collection_name': 'numpy',
+            'persist_directory': self.directory,
+            'quantization': self.quantization if self._quantized_ready() else 'none'
+        }
+
+
+def create_vector_backend(embedding_function: Optional[Embeddings] = None) -> BaseVectorBackend:
+    """根据配置创建向量存储后端"""
+    if settings.VECTOR_BACKEND == "numpy":
+        logger.info(f"使用NumPy向量索引: {settings.NUMPY_INDEX_PATH}")
+        return NumpyBackend()
+    if settings.VECTOR_BACKEND != "chroma":
+        raise ValueError(f"不支持的向量存储类型: {settings.VECTOR_BACKEND}")
+    return ChromaBackend(embedding_function)
@@ -1,47 +1,52 @@
+import time
 import logging
 import uuid
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Callable
 
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import numpy as np
 from langchain.schema import Document
 
 from app.config import settings
+from app.services.embedding_cache import QueryEmbeddingCache, normalize_query
+from app.services.embedding_batcher import EmbeddingBatcher
+from app.services.embedding_store import PersistentEmbeddingCache, CachedEmbeddings
+from app.services.embedding_engine import create_embeddings, embedding_cache_key
+from app.services.lexical_index import LexicalIndex
+from app.services.corpus_version import CorpusVersion
+from app.services.vector_backend import BaseVectorBackend, create_vector_backend
+from app.utils import metrics
 
 logger = logging.getLogger(__name__)
 
 
 class VectorStoreService:
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+        self.embeddings = create_embeddings(settings.EMBEDDING_MODEL)
+        # 文档向量缓存的键：不同引擎、量化与否的向量互不混用
+        self.model_name = embedding_cache_key(settings.EMBEDDING_MODEL, self.embeddings)
+        # 文档向量化优先读取持久化缓存
+        self.embedding_cache = PersistentEmbeddingCache() if settings.EMBEDDING_CACHE_ENABLED else None
+        self.document_embeddings = (
+            CachedEmbeddings(self.embeddings, self.embedding_cache, self.model_name)
+            if self.embedding_cache else self.embeddings
         )
-        self.persist_directory = settings.CHROMA_DB_PATH
-        self.vector_store = None
-        self._initialize_store()
+        self.query_embedding_cache = QueryEmbeddingCache()
+        self.embedding_batcher = EmbeddingBatcher(self.embeddings)
+        # 语料版本：每次增删文档后递增，用于使依赖语料的缓存失效（保存在SQLite中，多进程共享）
+        self._corpus_version = CorpusVersion()
+        self.backend: BaseVectorBackend = create_vector_backend(self.embeddings)
+        self.lexical_index = LexicalIndex() if settings.HYBRID_SEARCH_ENABLED else None
+        if self.lexical_index is not None and len(self.lexical_index) == 0 and self.count() > 0:
+            logger.warning("词法索引为空但向量库中已有文档，请运行 python -m app.services.lexical_index rebuild")
 
-    def _initialize_store(self):
-        """初始化向量存储"""
-        try:
-            # 初始化向量存储 - 使用简化的方式
-            self.vector_store = Chroma(
-                persist_directory=self.persist_directory,
-                embedding_function=self.embeddings,
-                collection_metadata = {"hnsw:space": "cosine"}
-            )
-
-            logger.info(f"向量存储初始化成功: {self.persist_directory}")
-
-        except Exception as e:
-            logger.error(f"向量存储初始化失败: {str(e)}")
-            raise
+    @property
+    def corpus_version(self) -> int:
+        return self._corpus_version.get()
 
-    def debug_chunks(self, chunks: List[Document]):
-        for i, chunk in enumerate(chunks):
-            print(f"\n=== Chunk {i} ===\n{chunk.page_content}\n")
-
-    def add_documents(self, documents: List[Document]) -> List[str]:
-        """添加文档到向量存储"""
+    def add_documents(self,
+                      documents: List[Document],
+                      progress_callback: Optional[Callable[..., None]] = None) -> List[str]:
+        """添加文档到向量存储（分批向量化并写入）"""
         try:
             if not documents:
                 return []
@@ -50,28 +55,45 @@ class VectorStoreService:
             doc_ids = [doc.metadata.get('chunk_id', str(uuid.uuid4()))
                        for doc in documents]
 
-            self.debug_chunks(documents)
-
             # 移除手动截断，让模型自行处理
             # for doc in documents:
             #     doc.page_content = doc.page_content[:350]
 
-            # 添加文档
-            self.vector_store.add_documents(
-                documents=documents,
-                ids=doc_ids
-            )
+            # 分批处理，便于上报进度，也避免长时间独占CPU
+            embedded = 0
+            written = 0
+            batch_size = settings.INGEST_BATCH_SIZE
+            for start in range(0, len(documents), batch_size):
+                batch = documents[start:start + batch_size]
+                batch_ids = doc_ids[start:start + batch_size]
+                texts = [doc.page_content for doc in batch]
 
-            logger.info(f"成功添加 {len(documents)} 个文档到向量存储")
+                stage_start = time.time()
+                embeddings = self.document_embeddings.embed_documents(texts)
+                metrics.observe_ingest_stage("embed", time.time() - stage_start)
+                embedded += len(batch)
+                if progress_callback:
+                    progress_callback(chunks_embedded=embedded)
+
+                stage_start = time.time()
+                self.backend.upsert(batch_ids, embeddings, texts, [doc.metadata for doc in batch])
+                if self.lexical_index is not None:
+                    self.lexical_index.add(batch_ids, texts)
+                metrics.observe_ingest_stage("write", time.time() - stage_start)
+                metrics.observe_ingested_chunks(len(batch))
+                written += len(batch)
+                if progress_callback:
+                    progress_callback(chunks_written=written)
 
-            docs = self.vector_store.get()
-            for doc in docs["documents"]:
-                print("Chroma 内实际存储内容：\n", doc)  # 检查是否被截断
+            self._corpus_version.bump()
+            logger.info(f"成功添加 {len(documents)} 个文档到向量存储")
 
             return doc_ids
 
         except Exception as e:
             logger.error(f"添加文档到向量存储失败: {str(e)}")
+            # 部分批次可能已经写入
+            self._corpus_version.bump()
             raise
 
     def similarity_search(self,
@@ -80,11 +102,11 @@ class VectorStoreService:
                           filter_dict: Optional[Dict] = None) -> List[Document]:
         """相似度搜索"""
         try:
-            results = self.vector_store.similarity_search(
-                query=query,
+            results = [doc for doc, _ in self.similarity_search_by_vector_with_score(
+                embedding=self.embed_query(query),
                 k=k,
-                filter=filter_dict
-            )
+                filter_dict=filter_dict
+            )]
 
             logger.info(f"相似度搜索完成，返回 {len(results)} 个结果")
             return results
@@ -93,38 +115,138 @@ class VectorStoreService:
             logger.error(f"相似度搜索失败: {str(e)}")
             raise
 
+    def embed_query(self, query: str) -> List[float]:
+        """计算查询向量，命中缓存时跳过模型计算"""
+        key = normalize_query(query)
+        embedding = self.query_embedding_cache.get(key)
+        if embedding is None:
+            embedding = self.embedding_batcher.embed(key)
+            self.query_embedding_cache.put(key, embedding)
+        return embedding
+
     def similarity_search_with_score(self,
                                      query: str,
                                      k: int = 5,
                                      filter_dict: Optional[Dict] = None) -> List[Tuple[Document, float]]:
         """带相似度分数的搜索"""
         try:
-            results = self.vector_store.similarity_search_with_score(
-                query=query,
+            embedding = self.embed_query(query)
+            results = self.similarity_search_by_vector_with_score(
+                embedding=embedding,
                 k=k,
-                filter=filter_dict
+                filter_dict=filter_dict
             )
 
-            import json
-            
             # 调试信息
-            print(f"\n=== 搜索查询: {query} ===")
+            logger.debug(f"搜索查询: {query}")
             for i, (doc, score) in enumerate(results):
-                print(f"文档 {i+1}:")
-                print(f"  内容: {doc.page_content[:50]}...")
-                print(f"  余弦距离: {score}")
-                print(f"  相似度分数: {max(0, 1 - score/2):.3f}")
-                print("---")
+                logger.debug(
+                    f"文档 {i + 1}: 内容: {doc.page_content[:50]}... "
+                    f"余弦距离: {score} 相似度分数: {max(0, 1 - score / 2):.3f}"
+                )
             return results
 
         except Exception as e:
             logger.error(f"带分数的相似度搜索失败: {str(e)}")
             raise
 
+    def similarity_search_by_vector_with_score(self,
+                                               embedding: List[float],
+                                               k: int = 5,
+                                               filter_dict: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        """使用查询向量进行带相似度分数（余弦距离）的搜索"""
+        return self.backend.search([embedding], k=k, filter_dict=filter_dict)[0]
+
+    def hybrid_search_by_vector_with_score(self,
+                                           query: str,
+                                           embedding: List[float],
+                                           k: int = 5,
+                                           score_threshold: Optional[float] = None) -> List[Tuple[Document, float]]:
+        """稠密检索与BM25词法检索按倒数排名融合（RRF）
+
+        两路各召回 k * HYBRID_CANDIDATE_MULTIPLIER 个候选，融合后取前k个；
+        返回的分数仍为查询向量与文档块向量的余弦距离。
+        score_threshold 只在融合前过滤稠密候选：词法命中的块（如型号、错误码）向量距离往往较大，不按阈值丢弃。
+        """
+        if self.lexical_index is None:
+            dense = self.similarity_search_by_vector_with_score(embedding=embedding, k=k)
+            return self._within_threshold(dense, score_threshold)
+
+        candidates = k * settings.HYBRID_CANDIDATE_MULTIPLIER
+        dense = self._within_threshold(
+            self.similarity_search_by_vector_with_score(embedding=embedding, k=candidates), score_threshold
+        )
+        lexical = self.lexical_index.search(query, k=candidates)
+
+        fused: Dict[str, float] = {}
+        dense_by_id: Dict[str, Tuple[Document, float]] = {}
+        for rank, (doc, score) in enumerate(dense):
+            chunk_id = doc.metadata.get('chunk_id') or f"dense-{rank}"
+            dense_by_id[chunk_id] = (doc, score)
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (settings.HYBRID_RRF_K + rank + 1)
+        for rank, (chunk_id, _) in enumerate(lexical):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (settings.HYBRID_RRF_K + rank + 1)
+
+        top_ids = sorted(fused, key=fused.get, reverse=True)[:k]
+        lexical_only = self._load_with_distance(
+            [chunk_id for chunk_id in top_ids if chunk_id not in dense_by_id], embedding
+        )
+        results = [dense_by_id.get(chunk_id) or lexical_only.get(chunk_id) for chunk_id in top_ids]
+        results = [result for result in results if result is not None]
+
+        logger.debug(f"混合检索: 稠密 {len(dense)} 个，词法 {len(lexical)} 个，"
+                     f"融合后 {len(results)} 个（仅词法命中 {len(lexical_only)} 个）")
+        return results
+
+    @staticmethod
+    def _within_threshold(results: List[Tuple[Document, float]],
+                          score_threshold: Optional[float]) -> List[Tuple[Document, float]]:
+        """丢弃余弦距离不小于阈值的稠密检索结果"""
+        if score_threshold is None:
+            return results
+        return [(doc, score) for doc, score in results if score < score_threshold]
+
+    def _load_with_distance(self,
+                            chunk_ids: List[str],
+                            embedding: List[float]) -> Dict[str, Tuple[Document, float]]:
+        """按ID读取仅由词法检索命中的文档块，并用已存储的向量计算与查询的余弦距离"""
+        if not chunk_ids:
+            return {}
+        stored = self.backend.get(chunk_ids)
+        if not stored:
+            return {}
+
+        query = np.asarray(embedding, dtype=np.float32)
+        vectors = np.asarray([vector for _, _, vector in stored], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+        distances = 1.0 - (vectors @ query) / np.maximum(norms, 1e-12)
+        return {
+            chunk_id: (doc, float(distance))
+            for (chunk_id, doc, _), distance in zip(stored, distances)
+        }
+
+    def update_metadatas(self, documents: List[Document]) -> bool:
+        """只更新已存在文档块的元数据（如块序号），不重新计算向量"""
+        try:
+            if not documents:
+                return True
+            self.backend.update_metadatas(
+                [doc.metadata['chunk_id'] for doc in documents],
+                [doc.metadata for doc in documents]
+            )
+            return True
+
+        except Exception as e:
+            logger.error(f"更新文档元数据失败: {str(e)}")
+            return False
+
     def delete_documents(self, doc_ids: List[str]) -> bool:
         """删除文档"""
         try:
-            self.vector_store.delete(ids=doc_ids)
+            self.backend.delete(doc_ids)
+            if self.lexical_index is not None:
+                self.lexical_index.delete(doc_ids)
+            self._corpus_version.bump()
             logger.info(f"成功删除 {len(doc_ids)} 个文档")
             return True
 
@@ -132,20 +254,35 @@ class VectorStoreService:
             logger.error(f"删除文档失败: {str(e)}")
             return False
 
+    def count(self) -> int:
+        """集合中的文档块数量（由存储后端直接计数，不读取数据）"""
+        return self.backend.count()
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """查询向量缓存、查询向量微批与文档向量缓存的统计"""
+        return {
+            "query_embedding_cache": self.query_embedding_cache.get_stats(),
+            "embedding_batcher": self.embedding_batcher.get_stats(),
+            "document_embedding_cache": self.embedding_cache.get_stats() if self.embedding_cache else None
+        }
+
+    def warm_up(self, passes: int):
+        """执行若干次查询向量化与混合检索，使模型推理路径与索引页面在首个请求前就绪
+
+        直接调用嵌入模型，不写入查询向量缓存。
+        """
+        for i in range(passes):
+            query = f"{settings.WARMUP_QUERY} {i}"
+            embedding = self.embeddings.embed_query(query)
+            self.hybrid_search_by_vector_with_score(query=query, embedding=embedding, k=1)
+
     def get_collection_info(self) -> Dict[str, Any]:
         """获取集合信息"""
         try:
-            # Use public get() method instead of accessing _collection
-            result = self.vector_store.get()
-            count = len(result["ids"])
-            
-            # Use default collection name for Chroma
-            collection_name = getattr(self.vector_store, '_collection_name', 'langchain')
-
             return {
-                'total_documents': count,
-                'collection_name': collection_name,
-                'persist_directory': self.persist_directory
+                'total_documents': self.count(),
+                'vector_backend': self.backend.name,
+                **self.backend.get_info()
             }
 
         except Exception as e:
@@ -155,12 +292,11 @@ class VectorStoreService:
     def reset_collection(self) -> bool:
         """重置集合（清空所有数据）"""
         try:
-            # Get all document IDs first
-            all_docs = self.vector_store.get()
-            if all_docs["ids"]:
-                # Use the public delete method
-                self.vector_store.delete(ids=all_docs["ids"])
-            
+            self.backend.reset()
+            if self.lexical_index is not None:
+                self.lexical_index.clear()
+            self._corpus_version.bump()
+
             logger.info("成功重置向量存储集合")
             return True
 
@@ -1,5 +1,8 @@
 import os
+import json
+import sqlite3
 import hashlib
+from functools import lru_cache
 from typing import Dict, Any, List
 from datetime import datetime
 import logging
@@ -7,13 +10,67 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def calculate_file_hash(file_path: str) -> str:
-    """计算文件的MD5哈希值"""
-    hash_md5 = hashlib.md5()
-    with open(file_path, "rb", encoding='utf-8') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+@lru_cache(maxsize=1)
+def _get_token_encoding():
+    """加载tiktoken编码（离线环境下可能失败，失败时返回None）"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"加载tiktoken编码失败，使用字符数估算token: {str(e)}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """统计文本的token数"""
+    if not text:
+        return 0
+    encoding = _get_token_encoding()
+    if encoding is None:
+        # 粗略估算：中文约每字1个token，英文约每4个字符1个token
+        ascii_count = sum(1 for c in text if ord(c) < 128)
+        return (len(text) - ascii_count) + (ascii_count + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """截断文本使其不超过指定token数"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_token_encoding()
+    if encoding is None:
+        # 与 count_tokens 的估算方式一致，逐字累加
+        used = 0
+        for i, c in enumerate(text):
+            used += 1 if ord(c) >= 128 else 0.25
+            if used > max_tokens:
+                return text[:i]
+        return text
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    # 截断处可能切开多字节字符，解码时忽略残缺部分
+    return encoding.decode_bytes(tokens[:max_tokens]).decode("utf-8", errors="ignore")
+
+
+def calculate_file_hash(file_path: str, algorithm: str = "sha256") -> str:
+    """计算文件的哈希值（默认SHA-256）"""
+    file_hash = hashlib.new(algorithm)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def connect_sqlite(db_path: str) -> sqlite3.Connection:
+    """打开SQLite连接：自动提交、WAL模式，适合多线程/多进程并发读写"""
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
 
 
 def format_file_size(size_bytes: int) -> str:
@@ -59,4 +116,9 @@ def create_success_response(data: Any, message: str = "操作成功") -> Dict[st
         "message": message,
         "data": data,
         "timestamp": datetime.now().isoformat()
-    }
\ No newline at end of file
+    }
+
+
+def format_sse(event: str, data: Any) -> str:
+    """格式化Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
@@ -0,0 +1,264 @@
+"""
+Prometheus 指标：查询与入库各阶段耗时、LLM token计数、缓存命中率与在途请求数
+
+请求路径上只做直方图 observe 与计数器/仪表 inc（微秒级）；缓存命中、入库队列等服务自身已有的统计
+在 /metrics 被抓取时由 ServiceStatsCollector 读取，不增加请求开销。METRICS_ENABLED=false 时全部跳过。
+
+多进程部署（app.serve 设置 PROMETHEUS_MULTIPROC_DIR）时，各工作进程的直方图与计数器写入共享目录，
+抓取时汇总全部工作进程；服务统计只导出检索服务进程中的共享部分（查询/文档向量缓存、入库任务），
+答案缓存、LLM网关等进程内统计见各工作进程的 /stats。
+"""
+
+import os
+import time
+from typing import Dict, Any, Optional
+
+from prometheus_client import (
+    Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from app.config import settings
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# 查询耗时从毫秒级（命中缓存）到数十秒（LLM生成）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+QUERY_DURATION = Histogram(
+    "rag_query_duration_seconds", "查询端到端耗时",
+    ["mode", "outcome"], buckets=LATENCY_BUCKETS
+)
+QUERY_STAGE_DURATION = Histogram(
+    "rag_query_stage_duration_seconds", "查询各阶段耗时（embedding/cache_lookup/retrieval/rerank/prompt/generation）",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+QUERY_TIME_TO_FIRST_TOKEN = Histogram(
+    "rag_query_time_to_first_token_seconds", "流式查询首个token的耗时", buckets=LATENCY_BUCKETS
+)
+LLM_TOKENS = Counter("rag_llm_tokens_total", "LLM提示词与生成token数（本地分词器计数）", ["kind"])
+LLM_CALL_DURATION = Histogram(
+    "rag_llm_call_duration_seconds", "LLM调用耗时（含排队与重试，流式调用计到输出结束）",
+    ["mode", "outcome"], buckets=LATENCY_BUCKETS
+)
+LLM_QUEUE_WAIT = Histogram(
+    "rag_llm_queue_wait_seconds", "LLM调用等待并发名额的时间", buckets=(0.0, *LATENCY_BUCKETS)
+)
+PROMPT_TOKENS = Histogram(
+    "rag_prompt_tokens", "每次LLM调用的提示词token数",
+    buckets=(250, 500, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+)
+
+INGEST_STAGE_DURATION = Histogram(
+    "rag_ingest_stage_duration_seconds", "入库各阶段耗时（load/split/embed/write）",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+INGEST_CHUNKS = Counter("rag_ingest_chunks_total", "写入向量库的文档块数")
+
+HTTP_DURATION = Histogram(
+    "rag_http_request_duration_seconds", "HTTP请求耗时（流式响应计到响应结束）",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge(
+    "rag_http_requests_in_flight", "处理中的HTTP请求数（含未结束的流式响应）", ["method"],
+    multiprocess_mode="livesum"
+)
+
+
+def observe_query(mode: str, result: Dict[str, Any]):
+    """记录一次查询的端到端耗时、各阶段耗时与token数，mode 为 sync / async / stream"""
+    if not settings.METRICS_ENABLED:
+        return
+    if result.get("error"):
+        outcome = "error"
+    elif result.get("cached"):
+        outcome = "cached"
+    elif not result.get("retrieved_count"):
+        outcome = "empty"
+    elif result.get("coalesced"):
+        outcome = "coalesced"
+    else:
+        outcome = "answered"
+    QUERY_DURATION.labels(mode, outcome).observe(result["processing_time"])
+
+    for stage, seconds in (result.get("stage_timings") or {}).items():
+        QUERY_STAGE_DURATION.labels(stage).observe(seconds)
+    if result.get("time_to_first_token") is not None:
+        QUERY_TIME_TO_FIRST_TOKEN.observe(result["time_to_first_token"])
+
+    # 命中缓存与合并到进行中查询的结果不调用LLM
+    if outcome == "answered":
+        PROMPT_TOKENS.observe(result.get("prompt_tokens") or 0)
+        LLM_TOKENS.labels("prompt").inc(result.get("prompt_tokens") or 0)
+        LLM_TOKENS.labels("completion").inc(result.get("completion_tokens") or 0)
+
+
+def observe_llm_call(mode: str, outcome: str, seconds: float):
+    if settings.METRICS_ENABLED:
+        LLM_CALL_DURATION.labels(mode, outcome).observe(seconds)
+
+
+def observe_llm_queue_wait(seconds: float):
+    if settings.METRICS_ENABLED:
+        LLM_QUEUE_WAIT.observe(seconds)
+
+
+def observe_ingest_stage(stage: str, seconds: float):
+    if settings.METRICS_ENABLED:
+        INGEST_STAGE_DURATION.labels(stage).observe(seconds)
+
+
+def observe_ingested_chunks(count: int):
+    if settings.METRICS_ENABLED:
+        INGEST_CHUNKS.inc(count)
+
+
+class ServiceStatsCollector:
+    """抓取时读取已构建服务的统计（缓存命中、入库队列、对话摘要、LLM网关、查询合并），未构建的服务不会因抓取而被构建
+
+    per_process=False 时只导出所有工作进程共享的统计。
+    """
+
+    def __init__(self, per_process: bool = True):
+        self.per_process = per_process
+        self.services = None
+
+    def bind(self, services):
+        self.services = services
+
+    def collect(self):
+        services = self.services
+        if services is None:
+            return
+
+        if self.per_process:
+            ready = GaugeMetricFamily("rag_services_ready", "服务是否已就绪（1就绪，0未就绪）")
+            ready.add_metric([], 1 if services.is_ready() else 0)
+            yield ready
+
+        requests = CounterMetricFamily("rag_cache_requests", "缓存查找次数", labels=["cache", "result"])
+        hit_ratio = GaugeMetricFamily("rag_cache_hit_ratio", "缓存累计命中率", labels=["cache"])
+        entries = GaugeMetricFamily("rag_cache_entries", "缓存条目数", labels=["cache"])
+        for name, stats in self._cache_stats(services, self.per_process).items():
+            requests.add_metric([name, "hit"], stats["hits"])
+            requests.add_metric([name, "miss"], stats["misses"])
+            hit_ratio.add_metric([name], stats["hit_ratio"])
+            entries.add_metric([name], stats.get("size", stats.get("entries", 0)))
+        yield requests
+        yield hit_ratio
+        yield entries
+
+        ingestion_queue = services.peek("ingestion_queue")
+        if ingestion_queue is not None:
+            jobs = GaugeMetricFamily("rag_ingest_jobs", "入库任务数", labels=["status"])
+            for status, count in ingestion_queue.get_stats()["jobs"].items():
+                jobs.add_metric([status], count)
+            yield jobs
+
+        rag_agent = services.peek("rag_agent")
+        if rag_agent is not None and self.per_process:
+            stats = rag_agent.history_compactor.get_stats()
+            summaries = CounterMetricFamily("rag_history_summaries", "对话摘要更新次数", labels=["result"])
+            summaries.add_metric(["success"], stats["summaries_made"])
+            summaries.add_metric(["failure"], stats["summary_failures"])
+            yield summaries
+
+            stats = rag_agent.llm_gateway.get_stats()
+            retries = CounterMetricFamily("rag_llm_retries", "LLM调用重试次数", labels=["reason"])
+            for reason, count in stats["retries"].items():
+                retries.add_metric([reason], count)
+            yield retries
+            hedges = CounterMetricFamily("rag_llm_hedges", "LLM对冲请求次数", labels=["result"])
+            hedges.add_metric(["issued"], stats["hedges_issued"])
+            hedges.add_metric(["won"], stats["hedges_won"])
+            yield hedges
+            in_flight = GaugeMetricFamily("rag_llm_in_flight", "执行中的LLM请求数")
+            in_flight.add_metric([], stats["in_flight"])
+            yield in_flight
+            waiting = GaugeMetricFamily("rag_llm_queue_waiting", "等待并发名额的LLM调用数")
+            waiting.add_metric([], stats["waiting"])
+            yield waiting
+
+            stats = rag_agent.query_coalescer.get_stats()
+            coalesced = CounterMetricFamily("rag_query_coalesced", "查询合并：发起计算与加入进行中计算的请求数", labels=["role"])
+            coalesced.add_metric(["leader"], stats["flights"])
+            coalesced.add_metric(["joined"], stats["joined"])
+            yield coalesced
+            saved_calls = CounterMetricFamily("rag_query_coalesce_llm_calls_saved", "查询合并节省的LLM调用次数")
+            saved_calls.add_metric([], stats["llm_calls_saved"])
+            yield saved_calls
+            saved_tokens = CounterMetricFamily("rag_query_coalesce_llm_tokens_saved", "查询合并节省的LLM token数（提示词 + 生成）")
+            saved_tokens.add_metric([], stats["llm_tokens_saved"])
+            yield saved_tokens
+            coalescing = GaugeMetricFamily("rag_query_coalesce_in_flight", "进行中的可合并查询计算数")
+            coalescing.add_metric([], stats["in_flight"])
+            yield coalescing
+
+    @staticmethod
+    def _cache_stats(services, per_process: bool) -> Dict[str, Dict[str, Any]]:
+        caches: Dict[str, Dict[str, Any]] = {}
+        vector_store_service = services.peek("vector_store_service")
+        if vector_store_service is not None:
+            stats = vector_store_service.get_cache_stats()
+            caches["query_embedding"] = stats["query_embedding_cache"]
+            if stats["document_embedding_cache"] is not None:
+                caches["document_embedding"] = stats["document_embedding_cache"]
+        rag_agent = services.peek("rag_agent")
+        if rag_agent is not None and per_process:
+            caches["answer"] = rag_agent.answer_cache.get_stats()
+        return caches
+
+
+service_stats_collector = ServiceStatsCollector(per_process=not MULTIPROCESS)
+REGISTRY.register(service_stats_collector)
+
+
+def render_metrics() -> bytes:
+    if not MULTIPROCESS:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(service_stats_collector)
+    return generate_latest(registry)
+
+
+def mark_process_dead():
+    """工作进程退出时调用，使在途请求数等仪表不再计入该进程"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+class MetricsMiddleware:
+    """记录HTTP请求耗时与在途请求数（ASGI中间件，按路由模板而非原始路径打标签，避免标签基数膨胀）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        # 进入应用前路由尚未匹配，在途数只按请求方法区分
+        in_flight = HTTP_IN_FLIGHT.labels(method)
+        in_flight.inc()
+        status: Optional[int] = None
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            in_flight.dec()
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_DURATION.labels(method, route_path, str(status or 500)).observe(time.perf_counter() - start)
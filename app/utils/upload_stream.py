@@ -0,0 +1,156 @@
+import os
+import hashlib
+import tempfile
+import logging
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# multipart 边界与各部分头部的额外开销上限，用于按 Content-Length 提前拒绝
+MULTIPART_OVERHEAD = 64 * 1024
+# 非文件字段的大小上限
+MAX_FIELD_SIZE = 64 * 1024
+
+
+class UploadRejectedError(ValueError):
+    """上传请求不合法（格式错误、缺少文件、扩展名不支持）"""
+
+
+class UploadTooLargeError(UploadRejectedError):
+    """上传文件超过大小限制"""
+
+
+class _UploadReceiver:
+    """multipart 流式解析回调：文件部分边接收边写入临时文件"""
+
+    def __init__(self, field_name: str, max_size: int):
+        self.field_name = field_name
+        self.max_size = max_size
+
+        self.filename: Optional[str] = None
+        self.file_path: Optional[str] = None
+        self.file_size = 0
+        self.file_hash = hashlib.sha256()  # 与 calculate_file_hash 默认算法一致
+
+        self._file = None
+        self._writing = False
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._field_size = 0
+
+    def on_part_begin(self):
+        self._disposition = b""
+        self._field_size = 0
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        if self._header_name.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        if name != self.field_name or b"filename" not in options or self.file_path is not None:
+            return
+
+        filename = options[b"filename"].decode("utf-8", errors="replace")
+        if not filename:
+            raise UploadRejectedError("文件名不能为空")
+
+        # 在读取文件内容之前检查扩展名
+        file_ext = Path(filename).suffix.lower()
+        if file_ext not in settings.ALLOWED_EXTENSIONS:
+            raise UploadRejectedError(f"不支持的文件格式: {file_ext}")
+
+        self.filename = filename
+        self._file = tempfile.NamedTemporaryFile(delete=False, suffix=file_ext)
+        self.file_path = self._file.name
+        self._writing = True
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if not self._writing:
+            self._field_size += end - start
+            if self._field_size > MAX_FIELD_SIZE:
+                raise UploadRejectedError("表单字段过大")
+            return
+
+        self.file_size += end - start
+        if self.file_size > self.max_size:
+            raise UploadTooLargeError(f"文件大小超过限制: > {self.max_size}")
+        part = data[start:end]
+        self._file.write(part)
+        self.file_hash.update(part)
+
+    def on_part_end(self):
+        if self._writing:
+            self._file.close()
+            self._writing = False
+
+    def cleanup(self):
+        """出错时关闭并删除临时文件"""
+        if self._file is not None:
+            self._file.close()
+        if self.file_path and os.path.exists(self.file_path):
+            os.unlink(self.file_path)
+
+
+async def receive_upload(request: Request,
+                         field_name: str = "file",
+                         max_size: int = settings.MAX_FILE_SIZE) -> Dict[str, Any]:
+    """将multipart上传请求中的文件流式写入临时文件
+
+    请求体按块解析并直接落盘，内存占用与文件大小无关；
+    Content-Length 或已接收字节数超过限制时立即拒绝，不再继续读取请求体。
+    返回 filename、file_path（调用方负责删除）、file_size 与接收时顺带计算的 file_hash。
+    """
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_size + MULTIPART_OVERHEAD:
+        raise UploadTooLargeError(f"文件大小超过限制: {content_length} > {max_size}")
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise UploadRejectedError("请求必须是包含文件的 multipart/form-data")
+
+    receiver = _UploadReceiver(field_name, max_size)
+    parser = MultipartParser(params[b"boundary"], {
+        "on_part_begin": receiver.on_part_begin,
+        "on_part_data": receiver.on_part_data,
+        "on_part_end": receiver.on_part_end,
+        "on_header_field": receiver.on_header_field,
+        "on_header_value": receiver.on_header_value,
+        "on_header_end": receiver.on_header_end,
+        "on_headers_finished": receiver.on_headers_finished,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    except Exception:
+        receiver.cleanup()
+        raise
+
+    if receiver.file_path is None:
+        raise UploadRejectedError("没有选择文件")
+
+    logger.info(f"已接收上传文件 {receiver.filename}，大小 {receiver.file_size} 字节")
+    return {
+        "filename": receiver.filename,
+        "file_path": receiver.file_path,
+        "file_size": receiver.file_size,
+        "file_hash": receiver.file_hash.hexdigest()
+    }
@@ -0,0 +1,67 @@
+"""
+同步 process_query 与异步 aprocess_query 并发吞吐对比
+
+运行: python -m benchmarks.bench_async_query --requests 64 --llm-latency 0.5
+"""
+
+import time
+import asyncio
+import argparse
+
+from app.services.rag_agent import RAGAgent
+from app.services.answer_cache import SemanticAnswerCache
+from benchmarks.fakes import FakeLLM, FakeVectorStoreService
+
+
+def build_agent(llm_latency: float, search_latency: float) -> RAGAgent:
+    agent = RAGAgent(FakeVectorStoreService(search_latency=search_latency))
+    agent.llm = FakeLLM(latency=llm_latency)
+    # 关闭答案缓存，确保每次请求都走完整管线
+    agent.answer_cache = SemanticAnswerCache(max_entries=0)
+    return agent
+
+
+async def run_sync(agent: RAGAgent, total: int, concurrency: int) -> float:
+    """模拟旧实现：在事件循环中直接调用同步 process_query"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            agent.process_query(f"问题 {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def run_async(agent: RAGAgent, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            await agent.aprocess_query(f"问题 {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start
+
+
+async def main(args):
+    agent = build_agent(args.llm_latency, args.search_latency)
+
+    print(f"{'并发':>6} {'同步QPS':>10} {'异步QPS':>10} {'加速比':>8}")
+    for concurrency in args.concurrency:
+        sync_elapsed = await run_sync(agent, args.requests, concurrency)
+        async_elapsed = await run_async(agent, args.requests, concurrency)
+        sync_qps = args.requests / sync_elapsed
+        async_qps = args.requests / async_elapsed
+        print(f"{concurrency:>6} {sync_qps:>10.2f} {async_qps:>10.2f} {async_qps / sync_qps:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查询管线并发吞吐基准")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--search-latency", type=float, default=0.02)
+    asyncio.run(main(parser.parse_args()))
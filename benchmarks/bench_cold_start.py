@@ -0,0 +1,89 @@
+"""
+冷启动基准：导入 app.main 的耗时、启动到就绪（/health/ready 返回200）的耗时，以及首个检索请求的延迟
+
+每种模式在独立子进程中运行，避免模型已加载的进程内状态影响结果：
+- preload: 启动后在后台构建服务并预热，就绪后再发送首个请求
+- lazy:    不预加载，首个请求触发模型加载与向量库打开
+
+--fake-embeddings 用哈希嵌入替代 sentence-transformers（离线环境），--fake-load-seconds 模拟模型加载耗时。
+
+运行: python -m benchmarks.bench_cold_start --modes preload lazy
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+
+def child(args):
+    """子进程：测量一次冷启动，以JSON输出结果"""
+    os.environ["SERVICES_PRELOAD"] = "true" if args.child == "preload" else "false"
+    os.environ["WARMUP_EMBEDDING_PASSES"] = str(args.warmup_passes)
+
+    if args.fake_embeddings:
+        import app.services.vector_store as vector_store
+        from benchmarks.fakes import HashingEmbeddings
+
+        def load_fake_model(model_name):
+            time.sleep(args.fake_load_seconds)
+            return HashingEmbeddings(per_item_latency=0.005)
+
+        vector_store.create_embeddings = load_fake_model
+
+    start = time.perf_counter()
+    from app.main import app
+    import_time = time.perf_counter() - start
+
+    from fastapi.testclient import TestClient
+
+    result = {"mode": args.child, "import": import_time}
+    start = time.perf_counter()
+    with TestClient(app) as client:
+        result["startup"] = time.perf_counter() - start
+        if args.child == "preload":
+            while client.get("/api/v1/health/ready").status_code != 200:
+                time.sleep(0.01)
+        result["ready"] = time.perf_counter() - start
+
+        # 首个请求：构建（或复用）服务并完成一次查询向量化与检索
+        t0 = time.perf_counter()
+        client.get("/api/v1/health")
+        services = app.state.services
+        embedding = services.vector_store_service.embed_query("产品的保修期是多久")
+        services.vector_store_service.hybrid_search_by_vector_with_score("产品的保修期是多久", embedding, 5)
+        result["first_request"] = time.perf_counter() - t0
+        result["timings"] = services.get_status()["timings"]
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", default=["preload", "lazy"])
+    parser.add_argument("--warmup-passes", type=int, default=2)
+    parser.add_argument("--fake-embeddings", action="store_true")
+    parser.add_argument("--fake-load-seconds", type=float, default=2.0)
+    parser.add_argument("--child", choices=["preload", "lazy"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    print(f"{'模式':<8} {'导入(s)':>8} {'启动(s)':>8} {'就绪(s)':>8} {'首个请求(s)':>11}  服务构建耗时")
+    for mode in args.modes:
+        command = [sys.executable, "-m", "benchmarks.bench_cold_start", "--child", mode,
+                   "--warmup-passes", str(args.warmup_passes), "--fake-load-seconds", str(args.fake_load_seconds)]
+        if args.fake_embeddings:
+            command.append("--fake-embeddings")
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        timings = ", ".join(f"{name}={seconds:.2f}" for name, seconds in result["timings"].items())
+        print(f"{mode:<8} {result['import']:>8.2f} {result['startup']:>8.2f} {result['ready']:>8.2f} "
+              f"{result['first_request']:>11.3f}  {timings}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+查询向量动态微批基准：不同收集窗口下的吞吐、平均批大小与p50/p99延迟
+
+运行: python -m benchmarks.bench_embedding_batcher --threads 16 --windows 0 2 5 10
+"""
+
+import time
+import argparse
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services.embedding_batcher import EmbeddingBatcher
+from benchmarks.fakes import HashingEmbeddings
+
+
+def run(window_ms: float, args) -> None:
+    embeddings = HashingEmbeddings(
+        per_call_latency=args.per_call_ms / 1000,
+        per_item_latency=args.per_item_ms / 1000
+    )
+    batcher = EmbeddingBatcher(embeddings, window_ms=window_ms, max_batch_size=args.max_batch_size)
+    latencies = []
+
+    def one(i: int):
+        start = time.perf_counter()
+        batcher.embed(f"第 {i} 个问题 question {i}")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    stats = batcher.get_stats()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{window_ms:>8.1f} {args.requests / elapsed:>10.1f} {stats['avg_batch_size']:>10.2f} "
+          f"{statistics.median(latencies) * 1000:>10.2f} {p99 * 1000:>10.2f}")
+    if stats['enabled']:
+        print(f"{'':>8} 批大小直方图: {stats['batch_size_histogram']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查询向量动态微批基准")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5, 10])
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--per-call-ms", type=float, default=4.0, help="模拟单次前向计算的固定开销")
+    parser.add_argument("--per-item-ms", type=float, default=0.3, help="模拟每条文本的计算耗时")
+    args = parser.parse_args()
+
+    print(f"{'窗口(ms)':>8} {'QPS':>10} {'平均批大小':>10} {'p50(ms)':>10} {'p99(ms)':>10}")
+    for window in args.windows:
+        run(window, args)
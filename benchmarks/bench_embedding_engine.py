@@ -0,0 +1,98 @@
+"""
+嵌入引擎基准：sentence-transformers（PyTorch）与 ONNX Runtime（float32 / 动态int8）的入库与查询吞吐，以及向量偏差
+
+- 入库：embed_documents 批量向量化的吞吐（块/秒）
+- 查询：逐条 embed_query 的 p50/p99 延迟
+- 偏差：与第一个引擎（基准）同一文本向量的余弦相似度，以及以查询检索文档块时 top-k 结果的重合率
+
+文本默认取合成的中英文混合文档块，--texts-file 可指定每行一个文档块的文本文件。
+
+运行: python -m benchmarks.bench_embedding_engine --onnx-dir ./models/minilm-onnx --engines torch onnx-fp32 onnx-int8 --threads 4
+"""
+
+import time
+import random
+import argparse
+import statistics
+
+import numpy as np
+
+from app.services.embedding_engine import OnnxEmbeddings, create_embeddings
+from benchmarks.bench_lexical_index import make_text
+
+TORCH_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def build_engine(name: str, args):
+    if name == "torch":
+        return create_embeddings(TORCH_MODEL)
+    quantized = name == "onnx-int8"
+    return OnnxEmbeddings(args.onnx_dir, quantized=quantized, intra_op_threads=args.threads,
+                          batch_size=args.batch_size)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--engines", nargs="+", default=["torch", "onnx-fp32", "onnx-int8"])
+    parser.add_argument("--onnx-dir", default="./models/minilm-onnx")
+    parser.add_argument("--threads", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--texts-file", default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.texts_file:
+        with open(args.texts_file, encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()][:args.chunks]
+    else:
+        texts = [make_text(rng) for _ in range(args.chunks)]
+    # 查询取文档块中的片段，使检索结果有意义
+    queries = [text[start:start + 24] for text in rng.sample(texts, min(args.queries, len(texts)))
+               for start in [rng.randint(0, max(0, len(text) - 24))]]
+
+    print(f"{len(texts)} 个文档块，{len(queries)} 个查询，ONNX线程数 {args.threads or '默认'}")
+    print(f"{'引擎':<10} {'入库(块/s)':>10} {'查询p50(ms)':>11} {'查询p99(ms)':>11} "
+          f"{'平均余弦':>8} {'最小余弦':>8} {'top-k重合':>9}")
+
+    reference = None
+    for name in args.engines:
+        engine = build_engine(name, args)
+        engine.embed_documents(texts[:8])  # 预热
+
+        start = time.perf_counter()
+        documents = normalize(np.asarray(engine.embed_documents(texts), dtype=np.float32))
+        ingest_rate = len(texts) / (time.perf_counter() - start)
+
+        latencies, query_vectors = [], []
+        for query in queries:
+            t0 = time.perf_counter()
+            query_vectors.append(engine.embed_query(query))
+            latencies.append(time.perf_counter() - t0)
+        query_vectors = normalize(np.asarray(query_vectors, dtype=np.float32))
+        top_k = np.argsort(-(query_vectors @ documents.T), axis=1)[:, :args.k]
+
+        latencies.sort()
+        p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+        if reference is None:
+            reference = (documents, top_k)
+            drift = "基准"
+            print(f"{name:<10} {ingest_rate:>10.1f} {statistics.median(latencies) * 1000:>11.2f} {p99 * 1000:>11.2f} "
+                  f"{drift:>8} {drift:>8} {drift:>9}")
+            continue
+
+        cosines = (documents * reference[0]).sum(axis=1)
+        overlap = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(top_k, reference[1])])
+        print(f"{name:<10} {ingest_rate:>10.1f} {statistics.median(latencies) * 1000:>11.2f} {p99 * 1000:>11.2f} "
+              f"{cosines.mean():>8.4f} {cosines.min():>8.4f} {overlap:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
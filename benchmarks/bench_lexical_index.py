@@ -0,0 +1,74 @@
+"""
+BM25词法索引基准：合成中英文混合文档块，测量建索引吞吐与检索p50/p99延迟
+
+运行: python -m benchmarks.bench_lexical_index --chunks 1000000 --queries 500
+     指定 --db-path 时复用已建好的索引（已有数据时跳过建索引）
+"""
+
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+
+from app.services.lexical_index import LexicalIndex
+
+# 常用汉字，用于合成中文文本
+COMMON_CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行"
+    "学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然"
+    "前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无"
+)
+
+
+def make_text(rng: random.Random) -> str:
+    chinese = "".join(rng.choice(COMMON_CHARS) for _ in range(rng.randint(150, 300)))
+    part_number = f"PN-{rng.randint(0, 999999):06d}"
+    return f"{chinese[:100]} 型号 {part_number} {chinese[100:]} error_code_{rng.randint(0, 9999)}"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--db-path", default=None)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    db_path = args.db_path or os.path.join(tempfile.mkdtemp(), "lexical_index.db")
+    index = LexicalIndex(db_path=db_path)
+
+    if len(index) == 0:
+        start = time.perf_counter()
+        for offset in range(0, args.chunks, args.batch_size):
+            count = min(args.batch_size, args.chunks - offset)
+            index.add([f"chunk-{offset + i}" for i in range(count)], [make_text(rng) for _ in range(count)])
+        build_time = time.perf_counter() - start
+        print(f"建索引: {args.chunks} 个文档块，{build_time:.1f}s（{args.chunks / build_time:.0f} 块/s）")
+    print(f"索引: {len(index)} 个文档块，文件大小 {os.path.getsize(db_path) / 1024 / 1024:.1f} MB")
+
+    queries = {
+        "型号精确匹配": lambda: f"PN-{rng.randint(0, 999999):06d} 的参数是什么",
+        "错误码": lambda: f"error_code_{rng.randint(0, 9999)} 怎么处理",
+        "中文关键词": lambda: "".join(rng.choice(COMMON_CHARS) for _ in range(rng.randint(4, 12))),
+    }
+    print(f"{'查询类型':<10} {'p50(ms)':>10} {'p99(ms)':>10} {'平均命中':>10}")
+    for name, make_query in queries.items():
+        latencies = []
+        hits = []
+        for _ in range(args.queries):
+            query = make_query()
+            t0 = time.perf_counter()
+            hits.append(len(index.search(query, k=20)))
+            latencies.append(time.perf_counter() - t0)
+        latencies.sort()
+        p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+        print(f"{name:<10} {statistics.median(latencies) * 1000:>10.2f} {p99 * 1000:>10.2f} "
+              f"{statistics.mean(hits):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
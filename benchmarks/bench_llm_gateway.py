@@ -0,0 +1,127 @@
+"""
+LLM网关基准：在本地模拟LLM服务（带限流、故障与长尾）上对比默认 ChatOpenAI 与 LLMGateway
+
+- ChatOpenAI: 默认设置（openai客户端自带2次重试，无并发限制）
+- gateway:    共享连接池 + 全抖动重试 + 并发限制
+- gateway+hedge: 另外开启对冲请求
+
+每种方案以相同并发发送相同数量的 ainvoke 请求，报告成功率、p50/p95/p99延迟、
+服务端收到的请求数（含重试与对冲）与限流次数。
+
+对冲只在网关没有排队时发出，观察对冲效果时应使客户端并发低于网关并发上限。
+
+运行: python -m benchmarks.bench_llm_gateway --requests 200 --concurrency 32 --server-concurrency 12
+     python -m benchmarks.bench_llm_gateway --requests 200 --concurrency 8 --slow-rate 0.05 --hedge-delay 1.0
+"""
+
+import os
+import time
+import socket
+import logging
+import asyncio
+import argparse
+import threading
+
+import httpx
+
+os.environ.setdefault("DEEPSEEK_API_KEY", "mock")
+
+from langchain_openai import ChatOpenAI
+from langchain.schema.messages import HumanMessage
+
+from app.services.llm_gateway import LLMGateway
+from benchmarks.loadtest import percentile
+from benchmarks.mock_llm_server import MockOptions, create_app
+
+
+def start_server(options: MockOptions) -> str:
+    """在后台线程启动模拟服务，返回 base_url"""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(options), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run(llm, total: int, concurrency: int):
+    latencies, failures = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await llm.ainvoke([HumanMessage(content=f"问题 {i}")])
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+    if isinstance(llm, LLMGateway):
+        await llm.aclose()
+    latencies.sort()
+    return latencies, failures, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0)
+    parser.add_argument("--server-concurrency", type=int, default=12, help="模拟服务的并发上限，超出返回429")
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--gateway-concurrency", type=int, default=10)
+    parser.add_argument("--hedge-delay", type=float, default=1.0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    options = MockOptions(
+        latency=args.latency, tokens_per_sec=args.tokens_per_sec, slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency, error_rate=args.error_rate,
+        max_concurrency=args.server_concurrency, retry_after=0.5
+    )
+    base_url = start_server(options)
+
+    scenarios = {
+        "ChatOpenAI": lambda: ChatOpenAI(model="mock", base_url=f"{base_url}/v1", api_key="mock"),
+        "gateway": lambda: LLMGateway(model="mock", base_url=f"{base_url}/v1", api_key="mock",
+                                      max_concurrency=args.gateway_concurrency, hedge_delay=0.0),
+        "gateway+hedge": lambda: LLMGateway(model="mock", base_url=f"{base_url}/v1", api_key="mock",
+                                            max_concurrency=args.gateway_concurrency, hedge_delay=args.hedge_delay,
+                                            hedge_max_ratio=0.2),
+    }
+
+    print(f"{args.requests} 个请求，客户端并发 {args.concurrency}，服务端并发上限 {args.server_concurrency}，"
+          f"故障率 {args.error_rate:.0%}，长尾比例 {args.slow_rate:.0%}（{args.slow_latency}s）")
+    print(f"{'方案':<14} {'成功率':>7} {'QPS':>7} {'p50(s)':>7} {'p95(s)':>7} {'p99(s)':>7} "
+          f"{'上游请求':>8} {'限流429':>7}  网关统计")
+    for name, build in scenarios.items():
+        before = httpx.get(f"{base_url}/stats").json()
+        llm = build()
+        latencies, failures, elapsed = asyncio.run(run(llm, args.requests, args.concurrency))
+        after = httpx.get(f"{base_url}/stats").json()
+
+        gateway_stats = ""
+        if isinstance(llm, LLMGateway):
+            stats = llm.get_stats()
+            gateway_stats = (f"重试 {stats['retries']}，对冲 {stats['hedges_issued']}（胜出 {stats['hedges_won']}），"
+                             f"平均排队 {stats['avg_queue_wait_ms']:.0f}ms")
+        print(f"{name:<14} {len(latencies) / args.requests:>7.1%} {len(latencies) / elapsed:>7.1f} "
+              f"{percentile(latencies, 0.5):>7.2f} {percentile(latencies, 0.95):>7.2f} {percentile(latencies, 0.99):>7.2f} "
+              f"{after['requests'] - before['requests']:>8} {after['rate_limited'] - before['rate_limited']:>7}  "
+              f"{gateway_stats}")
+
+
+if __name__ == "__main__":
+    main()
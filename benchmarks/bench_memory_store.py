@@ -0,0 +1,65 @@
+"""
+会话记忆存储内存占用与吞吐基准
+
+运行: python -m benchmarks.bench_memory_store --sessions 10000 --turns 5
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import tracemalloc
+
+from app.services.memory_store import InMemorySessionStore, SQLiteSessionStore
+
+QUESTION = "请问产品的保修期是多久？需要提供哪些材料？"
+ANSWER = "根据文档，产品保修期为一年，需要提供购买凭证和产品序列号。" * 8
+
+
+def fill(store, sessions: int, turns: int) -> float:
+    start = time.perf_counter()
+    for turn in range(turns):
+        for i in range(sessions):
+            store.add_turn(f"session-{i}", QUESTION, ANSWER)
+    return time.perf_counter() - start
+
+
+def bench_memory(args):
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = InMemorySessionStore(window=args.turns, max_sessions=args.sessions)
+    elapsed = fill(store, args.sessions, args.turns)
+    traced = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    stats = store.get_stats()
+    print(f"[memory] {stats['active_sessions']} 个会话, {stats['total_messages']} 条消息")
+    print(f"  写入: {args.sessions * args.turns / elapsed:.0f} 轮/秒")
+    print(f"  tracemalloc: {traced / 1024 / 1024:.1f} MB, 估算: {stats['approx_bytes'] / 1024 / 1024:.1f} MB")
+    print(f"  每万会话: {traced / args.sessions * 10000 / 1024 / 1024:.1f} MB")
+
+
+def bench_sqlite(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "memory.db")
+        store = SQLiteSessionStore(db_path=db_path, window=args.turns, max_sessions=args.sessions)
+        elapsed = fill(store, args.sessions, args.turns)
+
+        start = time.perf_counter()
+        for i in range(args.sessions):
+            store.get_messages(f"session-{i}")
+        read_elapsed = time.perf_counter() - start
+
+        stats = store.get_stats()
+        print(f"[sqlite] {stats['active_sessions']} 个会话, {stats['total_messages']} 条消息")
+        print(f"  写入: {args.sessions * args.turns / elapsed:.0f} 轮/秒, 读取: {args.sessions / read_elapsed:.0f} 次/秒")
+        print(f"  数据库文件: {os.path.getsize(db_path) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="会话记忆存储基准")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+    bench_memory(args)
+    bench_sqlite(args)
@@ -0,0 +1,210 @@
+"""
+多进程部署基准：共享检索服务进程 + N 个 uvicorn 工作进程的查询吞吐与每个工作进程的内存
+
+- 检索服务进程使用哈希嵌入替身（可配置每条文本的计算耗时），向量库与索引写入临时目录
+- LLM 使用本地模拟服务（benchmarks.mock_llm_server），工作进程经LLM网关真实发起HTTP调用
+- 对每个工作进程数，经HTTP以固定并发发送 /query，报告QPS、p50/p99延迟与工作进程的平均RSS
+
+QPS随工作进程数的扩展受限于机器核数（负载生成器、检索服务与模拟LLM服务也占用CPU），应在多核机器上运行。
+
+运行: python -m benchmarks.bench_multiworker --workers 1 2 4 --requests 400 --concurrency 32
+"""
+
+import os
+import sys
+import time
+import random
+import secrets
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from typing import List
+
+import httpx
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(workdir: str, llm_url: str, vector_backend: str):
+    """设置应用配置（必须在导入 app 模块之前调用），子进程继承这些环境变量"""
+    os.environ.update({
+        "CHROMA_DB_PATH": os.path.join(workdir, "chroma_db"),
+        "NUMPY_INDEX_PATH": os.path.join(workdir, "numpy_index"),
+        "LEXICAL_INDEX_PATH": os.path.join(workdir, "lexical_index.db"),
+        "DOCUMENT_REGISTRY_PATH": os.path.join(workdir, "document_registry.db"),
+        "CORPUS_VERSION_PATH": os.path.join(workdir, "corpus_version.db"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.db"),
+        "MEMORY_SQLITE_PATH": os.path.join(workdir, "memory.db"),
+        "MEMORY_BACKEND": "sqlite",
+        "VECTOR_BACKEND": vector_backend,
+        "ANSWER_CACHE_ENABLED": "false",
+        "SEARCH_SERVER_SOCKET": os.path.join(workdir, "search.sock"),
+        "SEARCH_SERVER_AUTHKEY": secrets.token_hex(16),
+        "DEEPSEEK_API_KEY": "bench",
+        "DEEPSEEK_BASE_URL": llm_url,
+        "ANONYMIZED_TELEMETRY": "False",
+        "LOG_LEVEL": "WARNING",
+    })
+
+
+def run_search_server(embed_latency: float):
+    """检索服务进程入口：安装哈希嵌入替身后启动检索服务"""
+    from app.services.search_server import SearchServer
+    from benchmarks.loadtest import install_embedder
+
+    install_embedder("hash", embed_latency)
+    server = SearchServer(os.environ["SEARCH_SERVER_SOCKET"])
+    server.start()
+    server.serve_forever()
+
+
+def wait_until(check, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if check():
+                return
+        except Exception:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("等待服务启动超时")
+
+
+def ingest(documents: int, paragraphs: int, workdir: str, rng: random.Random) -> List[str]:
+    """经检索服务写入合成文档，返回文档块文本"""
+    from app.services.document_processor import DocumentProcessor
+    from app.services.search_client import SearchClient, RemoteVectorStoreService
+    from benchmarks.loadtest import write_documents
+
+    processor = DocumentProcessor()
+    vector_store = RemoteVectorStoreService(SearchClient())
+    chunk_texts = []
+    for path in write_documents(os.path.join(workdir, "documents"), documents, paragraphs, rng):
+        chunks = processor.process_file(path, os.path.basename(path))
+        vector_store.add_documents(chunks)
+        chunk_texts.extend(chunk.page_content for chunk in chunks)
+    vector_store.client.close()
+    return chunk_texts
+
+
+def worker_rss_mb(pid: int) -> List[float]:
+    """uvicorn 多进程时统计其子进程（工作进程），单进程时统计自身"""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            pids = [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+    # 多进程模式下uvicorn还会创建 multiprocessing 的资源跟踪子进程，只统计监听端口的工作进程（RSS最大的N个）
+    rss = []
+    for child in pids or [pid]:
+        try:
+            with open(f"/proc/{child}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        rss.append(int(line.split()[1]) / 1024)
+        except OSError:
+            pass
+    return rss
+
+
+async def run_queries(base_url: str, questions: List[str], concurrency: int):
+    from benchmarks.loadtest import percentile
+
+    latencies, errors = [], 0
+    queue = iter(enumerate(questions))
+
+    async def client_loop(client: httpx.AsyncClient):
+        nonlocal errors
+        for i, question in queue:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/v1/query", json={"question": question, "session_id": f"bench-{i}"})
+                if response.status_code != 200 or response.json().get("error"):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.99), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多进程部署的查询吞吐与工作进程内存")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--paragraphs", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--embed-latency-ms", type=float, default=2.0)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--vector-backend", choices=["chroma", "numpy"], default="numpy")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_multiworker_")
+    llm_port = free_port()
+    configure_environment(workdir, f"http://127.0.0.1:{llm_port}/v1", args.vector_backend)
+    rng = random.Random(args.seed)
+
+    processes = [subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_llm_server", "--port", str(llm_port),
+         "--latency", str(args.llm_latency), "--tokens-per-sec", "400"]
+    )]
+    search_server = multiprocessing.get_context("spawn").Process(
+        target=run_search_server, args=(args.embed_latency_ms / 1000,), daemon=True
+    )
+    search_server.start()
+    try:
+        from app.services.search_client import SearchClient
+        from benchmarks.loadtest import make_questions
+
+        wait_until(lambda: httpx.get(f"http://127.0.0.1:{llm_port}/stats").status_code == 200)
+        wait_until(lambda: SearchClient().ping() is None)
+        chunk_texts = ingest(args.documents, args.paragraphs, workdir, rng)
+        print(f"检索服务已写入 {len(chunk_texts)} 个文档块；{args.requests} 个请求，并发 {args.concurrency}，"
+              f"CPU核数 {os.cpu_count()}")
+
+        print(f"{'工作进程':>8} {'QPS':>8} {'p50(ms)':>9} {'p99(ms)':>9} {'错误':>6} {'每进程RSS(MB)':>14}")
+        for workers in args.workers:
+            port = free_port()
+            api = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+                 "--workers", str(workers), "--log-level", "warning"]
+            )
+            processes.append(api)
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until(lambda: httpx.get(f"{base_url}/api/v1/health/ready").status_code == 200)
+
+            questions = make_questions(chunk_texts, args.requests + args.concurrency, rng)
+            asyncio.run(run_queries(base_url, questions[:args.concurrency], args.concurrency))
+            qps, p50, p99, errors = asyncio.run(run_queries(base_url, questions[args.concurrency:], args.concurrency))
+            rss = sorted(worker_rss_mb(api.pid), reverse=True)[:workers]
+            print(f"{workers:>8} {qps:>8.1f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {errors:>6} "
+                  f"{sum(rss) / max(1, len(rss)):>14.1f}")
+
+            api.terminate()
+            api.wait()
+
+    finally:
+        for process in processes:
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
+        search_server.terminate()
+
+
+if __name__ == "__main__":
+    main()
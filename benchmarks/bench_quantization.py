@@ -0,0 +1,117 @@
+"""
+NumPy向量索引量化基准：int8 / PQ 压缩编码的每向量字节数、内存节省与不同精排倍数下的 recall@k、延迟
+
+向量来源依次尝试：现有NumPy索引（NUMPY_INDEX_PATH）、文档块向量缓存（EMBEDDING_CACHE_PATH），
+都没有时使用合成向量。从语料中留出一部分向量作为查询，召回率以 float32 精确检索结果为基准。
+"第一轮字节/向量"为第一轮检索需要扫描（常驻内存）的数据量；原始向量仍保存在磁盘上，只在精排时按候选读取。
+
+运行: python -m benchmarks.bench_quantization --source auto --queries 200 --factors 1 2 4 8
+"""
+
+import os
+import time
+import argparse
+import sqlite3
+import tempfile
+import statistics
+
+import numpy as np
+
+from app.config import settings
+from app.services.vector_backend import NumpyBackend
+from benchmarks.bench_vector_backend import make_corpus, exact_top_k
+
+
+def load_index_vectors(directory: str, limit: int):
+    db_path = os.path.join(directory, "metadata.db")
+    vectors_path = os.path.join(directory, "vectors.bin")
+    if not (os.path.exists(db_path) and os.path.exists(vectors_path)):
+        return None
+    conn = sqlite3.connect(db_path)
+    meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+    if 'dim' not in meta:
+        return None
+    rows = [row for (row,) in conn.execute("SELECT row FROM chunks ORDER BY row LIMIT ?", (limit,))]
+    matrix = np.memmap(vectors_path, dtype=np.dtype(meta['dtype']), mode="r").reshape(-1, int(meta['dim']))
+    return np.asarray(matrix[rows], dtype=np.float32)
+
+
+def load_cache_vectors(db_path: str, limit: int):
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    blobs = [blob for (blob,) in conn.execute("SELECT vector FROM embeddings LIMIT ?", (limit,))]
+    if not blobs:
+        return None
+    vectors = [np.frombuffer(blob, dtype=np.float32) for blob in blobs]
+    # 缓存中可能混有不同模型的向量，只保留最常见的维度
+    dims, counts = np.unique([len(vector) for vector in vectors], return_counts=True)
+    dim = dims[counts.argmax()]
+    return np.stack([vector for vector in vectors if len(vector) == dim])
+
+
+def load_vectors(args):
+    """返回 (语料向量, 查询向量, 来源说明)"""
+    if args.source in ("auto", "index"):
+        vectors = load_index_vectors(settings.NUMPY_INDEX_PATH, args.chunks + args.queries)
+        if vectors is not None and len(vectors) > args.queries * 2:
+            return vectors[args.queries:], vectors[:args.queries], f"NumPy索引 {settings.NUMPY_INDEX_PATH}"
+    if args.source in ("auto", "cache"):
+        vectors = load_cache_vectors(settings.EMBEDDING_CACHE_PATH, args.chunks + args.queries)
+        if vectors is not None and len(vectors) > args.queries * 2:
+            return vectors[args.queries:], vectors[:args.queries], f"向量缓存 {settings.EMBEDDING_CACHE_PATH}"
+    vectors, queries = make_corpus(args.chunks, args.dim, args.queries, args.seed)
+    return vectors, queries, "合成向量"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", choices=["auto", "index", "cache", "synthetic"], default="auto")
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384, help="仅用于合成向量")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--factors", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--quantizations", nargs="+", default=["none", "int8", "pq"])
+    parser.add_argument("--pq-subvectors", type=int, default=settings.NUMPY_PQ_SUBVECTORS)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    vectors, queries, source = load_vectors(args)
+    truth = exact_top_k(vectors, queries, args.k)
+    dim = vectors.shape[1]
+    print(f"{source}: {len(vectors)} 个向量，{len(queries)} 个查询，维度 {dim}，top-{args.k}")
+    print(f"{'量化':<6} {'第一轮字节/向量':>14} {'相对float32节省':>14} {'精排倍数':>8} {'recall':>8} "
+          f"{'p50(ms)':>9} {'p99(ms)':>9}")
+
+    for kind in args.quantizations:
+        directory = tempfile.mkdtemp(prefix=f"bench_quant_{kind}_")
+        backend = NumpyBackend(directory=directory, quantization=kind, pq_subvectors=args.pq_subvectors,
+                               pq_train_size=min(settings.NUMPY_PQ_TRAIN_SIZE, len(vectors)))
+        for offset in range(0, len(vectors), 1000):
+            batch = vectors[offset:offset + 1000]
+            ids = [str(offset + i) for i in range(len(batch))]
+            backend.upsert(ids, batch.tolist(), ["" for _ in ids], [{"i": offset + i} for i in range(len(batch))])
+
+        if backend.quantizer is not None:
+            scanned = backend.quantizer.bytes_per_vector()
+        else:
+            scanned = dim * backend.dtype.itemsize
+        saved = 1 - scanned / (dim * 4)
+
+        for factor in (args.factors if kind != "none" else [1]):
+            backend.rescore_factor = factor
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                t0 = time.perf_counter()
+                results = backend.search([query.tolist()], k=args.k)[0]
+                latencies.append(time.perf_counter() - t0)
+                hits += len({doc.metadata["i"] for doc, _ in results} & set(expected.tolist()))
+            latencies.sort()
+            p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+            print(f"{kind:<6} {scanned:>14} {saved:>14.1%} {factor:>8} {hits / truth.size:>8.3f} "
+                  f"{statistics.median(latencies) * 1000:>9.2f} {p99 * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+突发相同问题的查询合并基准
+
+模拟公告发出后的提问高峰：每个请求是一个新会话，从少量热门问题中随机选一个（附带大小写、空白、
+末尾标点的差异），在 --window 秒内随机到达，一半走 aprocess_query、一半走 astream_query。
+对比只有语义答案缓存与再加上查询合并时的LLM调用次数与延迟。
+
+运行: python -m benchmarks.bench_query_coalescing --requests 300 --questions 5 --window 2.0 --llm-latency 1.0
+"""
+
+import time
+import random
+import asyncio
+import argparse
+import logging
+
+from app.services.rag_agent import RAGAgent
+from app.services.query_coalescer import QueryCoalescer
+from benchmarks.fakes import FakeLLM, FakeVectorStoreService
+from benchmarks.loadtest import percentile
+
+QUESTIONS = ["新版本什么时候上线", "如何申请退款", "会员价格有变化吗", "旧账号还能用吗", "客服电话是多少",
+             "数据会迁移吗", "支持哪些支付方式", "活动截止到哪天"]
+VARIANTS = ["{}", "{}？", " {} ", "{}?", "{}！"]
+
+
+def build_agent(args, coalescing: bool) -> RAGAgent:
+    agent = RAGAgent(FakeVectorStoreService(search_latency=args.search_latency))
+    agent.llm = FakeLLM(latency=args.llm_latency, answer="这是一个测试回答。" * 4, token_interval=0.01)
+    agent.query_coalescer = QueryCoalescer(enabled=coalescing)
+    return agent
+
+
+async def run(agent: RAGAgent, args):
+    rng = random.Random(args.seed)
+    latencies = []
+
+    async def one(i: int):
+        await asyncio.sleep(rng.uniform(0, args.window))
+        question = rng.choice(VARIANTS).format(rng.choice(QUESTIONS[:args.questions]))
+        session_id = f"user-{i}"
+        start = time.perf_counter()
+        if i % 2:
+            await agent.aprocess_query(question, session_id=session_id)
+        else:
+            async for _ in agent.astream_query(question, session_id=session_id):
+                pass
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    latencies.sort()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="突发相同问题的查询合并基准")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--questions", type=int, default=5, help="热门问题数（最多8个）")
+    parser.add_argument("--window", type=float, default=2.0, help="请求到达的时间窗口（秒）")
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--search-latency", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{args.requests} 个请求，{args.questions} 个热门问题，{args.window}s 内到达，LLM延迟 {args.llm_latency}s")
+    print(f"{'方案':<12} {'LLM调用':>8} {'合并加入':>8} {'p50(s)':>8} {'p95(s)':>8} {'p99(s)':>8}  节省token")
+    for name, coalescing in (("答案缓存", False), ("缓存+合并", True)):
+        agent = build_agent(args, coalescing)
+        latencies = asyncio.run(run(agent, args))
+        stats = agent.query_coalescer.get_stats()
+        print(f"{name:<12} {agent.llm.calls:>8} {stats['joined']:>8} {percentile(latencies, 0.5):>8.2f} "
+              f"{percentile(latencies, 0.95):>8.2f} {percentile(latencies, 0.99):>8.2f}  {stats['llm_tokens_saved']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+向量存储后端基准：Chroma(HNSW) 与 NumPy(float16/float32 内存映射暴力检索) 的写入耗时、检索延迟、内存与召回率
+
+召回率以 float32 精确暴力检索结果为基准（recall@k）。内存为进程RSS增量与索引文件大小，
+RSS 包含已访问的内存映射页，各后端在同一进程中依次运行，结果仅供相对比较。
+
+运行: python -m benchmarks.bench_vector_backend --chunks 100000 --queries 200 --dim 384
+"""
+
+import os
+import time
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+from app.services.vector_backend import ChromaBackend, NumpyBackend
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+
+
+def dir_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 1024 / 1024
+
+
+def make_corpus(chunks: int, dim: int, queries: int, seed: int):
+    """以若干簇中心加噪声合成向量，接近真实语料的聚簇分布"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(chunks // 100, 1), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), chunks)] + 0.5 * rng.standard_normal((chunks, dim)).astype(np.float32)
+    query_vectors = centers[rng.integers(0, len(centers), queries)] + 0.5 * rng.standard_normal((queries, dim)).astype(np.float32)
+    return vectors, query_vectors
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    normed_queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    truth = []
+    for start in range(0, len(queries), 64):
+        scores = normed_queries[start:start + 64] @ normed.T
+        truth.append(np.argsort(-scores, axis=1)[:, :k])
+    return np.concatenate(truth)
+
+
+def run(backend, name: str, directory: str, vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, args):
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), args.batch_size):
+        batch = vectors[offset:offset + args.batch_size]
+        ids = [f"chunk-{offset + i}" for i in range(len(batch))]
+        backend.upsert(ids, batch.tolist(), ["" for _ in ids], [{"chunk_id": chunk_id} for chunk_id in ids])
+    insert_time = time.perf_counter() - start
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        t0 = time.perf_counter()
+        results = backend.search([query.tolist()], k=args.k)[0]
+        latencies.append(time.perf_counter() - t0)
+        found = {int(doc.metadata["chunk_id"].split("-")[1]) for doc, _ in results}
+        hits += len(found & set(expected.tolist()))
+
+    t0 = time.perf_counter()
+    for offset in range(0, len(queries), args.query_batch):
+        backend.search(queries[offset:offset + args.query_batch].tolist(), k=args.k)
+    batch_qps = len(queries) / (time.perf_counter() - t0)
+
+    latencies.sort()
+    p99 = latencies[max(0, int(len(latencies) * 0.99) - 1)]
+    print(f"{name:<14} {insert_time:>9.1f} {statistics.median(latencies) * 1000:>9.2f} {p99 * 1000:>9.2f} "
+          f"{batch_qps:>10.0f} {hits / truth.size:>9.3f} {rss_mb() - rss_before:>9.0f} {dir_size_mb(directory):>9.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--query-batch", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--backends", nargs="+", default=["numpy-float16", "numpy-float32", "chroma"])
+    args = parser.parse_args()
+
+    vectors, queries = make_corpus(args.chunks, args.dim, args.queries, args.seed)
+    truth = exact_top_k(vectors, queries, args.k)
+
+    print(f"{args.chunks} 个文档块，维度 {args.dim}，top-{args.k}")
+    print(f"{'后端':<14} {'写入(s)':>9} {'p50(ms)':>9} {'p99(ms)':>9} {'批量QPS':>10} "
+          f"{'recall':>9} {'RSS增量MB':>9} {'磁盘MB':>9}")
+    for name in args.backends:
+        directory = tempfile.mkdtemp(prefix=f"bench_{name}_")
+        if name.startswith("numpy"):
+            backend = NumpyBackend(directory=directory, dtype=name.split("-")[1])
+        else:
+            backend = ChromaBackend(persist_directory=directory)
+        run(backend, name, directory, vectors, queries, truth, args)
+
+
+if __name__ == "__main__":
+    main()
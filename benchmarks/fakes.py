@@ -0,0 +1,137 @@
+"""
+基准测试使用的离线替身（不访问网络、不加载模型）
+"""
+
+import re
+import math
+import time
+import asyncio
+import hashlib
+from typing import List, Dict, Optional, Tuple
+
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.schema.messages import AIMessage, AIMessageChunk
+
+
+class FakeLLM:
+    """固定延迟的LLM替身，提供与ChatOpenAI一致的invoke/ainvoke/astream接口"""
+
+    def __init__(self,
+                 latency: float = 0.2,
+                 answer: str = "这是一个测试回答。",
+                 token_interval: float = 0.0):
+        self.latency = latency  # 首个token前的延迟
+        self.answer = answer
+        self.token_interval = token_interval  # 相邻token的间隔
+        self.calls = 0
+
+    def _generation_time(self) -> float:
+        """非流式调用的总耗时：首个token延迟 + 逐token生成时间"""
+        return self.latency + self.token_interval * max(0, len(self.answer) - 1)
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        self.calls += 1
+        time.sleep(self._generation_time())
+        return AIMessage(content=self.answer)
+
+    async def ainvoke(self, messages, **kwargs) -> AIMessage:
+        self.calls += 1
+        await asyncio.sleep(self._generation_time())
+        return AIMessage(content=self.answer)
+
+    async def astream(self, messages, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for i, char in enumerate(self.answer):
+            if i and self.token_interval:
+                await asyncio.sleep(self.token_interval)
+            yield AIMessageChunk(content=char)
+
+
+class HashingEmbeddings(Embeddings):
+    """基于特征哈希的确定性嵌入替身
+
+    英文按单词、中文按字二元组哈希到固定维度并归一化，共享词语的文本向量相近。
+    可配置每次调用的固定开销与每条文本的计算耗时，用于模拟模型前向计算。
+    """
+
+    def __init__(self,
+                 dim: int = 384,
+                 per_call_latency: float = 0.0,
+                 per_item_latency: float = 0.0):
+        self.dim = dim
+        self.per_call_latency = per_call_latency
+        self.per_item_latency = per_item_latency
+
+    def _features(self, text: str) -> List[str]:
+        words = re.findall(r"[a-z0-9]+", text.lower())
+        cjk = re.findall(r"[\u4e00-\u9fff]", text)
+        return words + [a + b for a, b in zip(cjk, cjk[1:])] + cjk
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for feature in self._features(text):
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _busy_wait(self, seconds: float):
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._busy_wait(self.per_call_latency + self.per_item_latency * len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class FakeVectorStoreService:
+    """模拟嵌入与检索耗时的向量存储替身"""
+
+    def __init__(self, search_latency: float = 0.02, docs_count: int = 3):
+        self.search_latency = search_latency
+        self.docs = [
+            Document(
+                page_content=f"测试文档内容 {i}",
+                metadata={'source': 'bench.txt', 'chunk_id': f'chunk-{i}', 'chunk_index': i}
+            )
+            for i in range(docs_count)
+        ]
+
+        self.corpus_version = 0
+
+    def embed_query(self, query: str) -> List[float]:
+        # 用忙等模拟嵌入前向计算占用CPU/持有线程的时间
+        deadline = time.perf_counter() + self.search_latency
+        while time.perf_counter() < deadline:
+            pass
+        digest = hashlib.md5(query.encode("utf-8")).digest()
+        return [b / 255.0 for b in digest]
+
+    def similarity_search_by_vector_with_score(self,
+                                               embedding: List[float],
+                                               k: int = 5,
+                                               filter_dict: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        return [(doc, 0.2 + 0.05 * i) for i, doc in enumerate(self.docs[:k])]
+
+    def hybrid_search_by_vector_with_score(self,
+                                           query: str,
+                                           embedding: List[float],
+                                           k: int = 5,
+                                           score_threshold: Optional[float] = None) -> List[Tuple[Document, float]]:
+        results = self.similarity_search_by_vector_with_score(embedding, k)
+        if score_threshold is None:
+            return results
+        return [(doc, score) for doc, score in results if score < score_threshold]
+
+    def similarity_search_with_score(self,
+                                     query: str,
+                                     k: int = 5,
+                                     filter_dict: Optional[Dict] = None) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(self.embed_query(query), k, filter_dict)
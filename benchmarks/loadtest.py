@@ -0,0 +1,316 @@
+"""
+离线负载测试：文档入库吞吐与 /query 并发负载，并与存储的基线比较（可用于发布前的性能门禁）
+
+- 入库：合成文本文件经 DocumentProcessor 解析分块、VectorStoreService.add_documents 向量化写入，统计块/秒
+- 查询：通过ASGI直接驱动 FastAPI 应用（含中间件与依赖注入，不经过网络），按固定并发发送 /query，
+  统计QPS、p50/p95/p99延迟与错误率
+- LLM使用确定性的替身（首token延迟 + 按token速率生成）；嵌入默认使用哈希替身，
+  --embedder local 使用 EMBEDDING_MODEL 指定的本地模型，auto 在本地模型目录存在时使用本地模型
+- 所有数据写入临时目录，不影响仓库中的向量库
+
+--baseline 指定基线文件时逐项比较，吞吐下降或延迟上升超过 --tolerance 即判为回归，退出码为1；
+--save-baseline 把本次结果写为新的基线。基线与硬件相关，应在同一台机器上生成与比较。
+
+运行: python -m benchmarks.loadtest --baseline benchmarks/baseline.json
+     python -m benchmarks.loadtest --save-baseline benchmarks/baseline.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+from typing import Dict, List, Any, Tuple
+
+# 指标名 -> 方向（higher: 越大越好，lower: 越小越好）
+METRIC_DIRECTIONS = {
+    "ingest_chunks_per_sec": "higher",
+    "query_qps": "higher",
+    "query_p50_ms": "lower",
+    "query_p95_ms": "lower",
+    "query_p99_ms": "lower",
+}
+# 错误率按绝对值比较
+MAX_ERROR_RATE_INCREASE = 0.01
+# 问题截取的文档块片段长度（过短时与文档块的向量距离超过相似度阈值，查询不会走到LLM）
+QUESTION_CHARS = 100
+
+
+def configure_environment(args, workdir: str):
+    """设置应用配置（必须在导入 app 模块之前调用，settings 在导入时读取环境变量）"""
+    os.environ.update({
+        "CHROMA_DB_PATH": os.path.join(workdir, "chroma_db"),
+        "NUMPY_INDEX_PATH": os.path.join(workdir, "numpy_index"),
+        "LEXICAL_INDEX_PATH": os.path.join(workdir, "lexical_index.db"),
+        "DOCUMENT_REGISTRY_PATH": os.path.join(workdir, "document_registry.db"),
+        "CORPUS_VERSION_PATH": os.path.join(workdir, "corpus_version.db"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.db"),
+        "MEMORY_SQLITE_PATH": os.path.join(workdir, "memory.db"),
+        "VECTOR_BACKEND": args.vector_backend,
+        "ANSWER_CACHE_ENABLED": "true" if args.answer_cache else "false",
+        "SERVICES_PRELOAD": "false",
+        "ANONYMIZED_TELEMETRY": "False",
+        "LOG_LEVEL": "WARNING",
+    })
+    os.environ.setdefault("DEEPSEEK_API_KEY", "loadtest")
+
+
+def resolve_embedder(name: str) -> str:
+    """auto: EMBEDDING_MODEL 指向存在的本地目录（含 onnx: 前缀）时使用本地模型，否则使用哈希替身"""
+    if name != "auto":
+        return name
+    from app.config import settings
+    from app.services.embedding_engine import ONNX_PREFIX
+    model_path = settings.EMBEDDING_MODEL
+    if model_path.startswith(ONNX_PREFIX):
+        model_path = model_path[len(ONNX_PREFIX):]
+    return "local" if os.path.isdir(model_path) else "hash"
+
+
+def install_embedder(embedder: str, embed_latency: float):
+    if embedder == "hash":
+        import app.services.vector_store as vector_store
+        from benchmarks.fakes import HashingEmbeddings
+        vector_store.create_embeddings = lambda model_name: HashingEmbeddings(per_item_latency=embed_latency)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))]
+
+
+def write_documents(directory: str, documents: int, paragraphs: int, rng: random.Random) -> List[str]:
+    from benchmarks.bench_lexical_index import make_text
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(documents):
+        path = os.path.join(directory, f"loadtest_{i:04d}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n\n".join(make_text(rng) for _ in range(paragraphs)))
+        paths.append(path)
+    return paths
+
+
+def run_ingest(services, paths: List[str]) -> Tuple[Dict[str, float], List[str]]:
+    """逐个文件解析分块并写入向量库，返回入库指标与全部文档块文本（用于生成查询）"""
+    document_processor = services.document_processor
+    vector_store_service = services.vector_store_service
+
+    chunk_texts: List[str] = []
+    process_time = 0.0
+    add_time = 0.0
+    start = time.perf_counter()
+    for path in paths:
+        t0 = time.perf_counter()
+        chunks = document_processor.process_file(path, os.path.basename(path))
+        t1 = time.perf_counter()
+        vector_store_service.add_documents(chunks)
+        add_time += time.perf_counter() - t1
+        process_time += t1 - t0
+        chunk_texts.extend(chunk.page_content for chunk in chunks)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "ingest_documents": len(paths),
+        "ingest_chunks": len(chunk_texts),
+        "ingest_seconds": elapsed,
+        "ingest_chunks_per_sec": len(chunk_texts) / elapsed,
+        "ingest_process_seconds": process_time,
+        "ingest_add_seconds": add_time,
+    }, chunk_texts
+
+
+def make_questions(chunk_texts: List[str], count: int, rng: random.Random) -> List[str]:
+    """从文档块中截取片段作为问题，保证能检索到相关文档；每个问题互不相同，避免命中答案缓存"""
+    questions = []
+    for i in range(count):
+        text = rng.choice(chunk_texts)
+        start = rng.randint(0, max(0, len(text) - QUESTION_CHARS))
+        questions.append(f"{text[start:start + QUESTION_CHARS]} 是什么意思？#{i}")
+    return questions
+
+
+async def run_queries(app, questions: List[str], concurrency: int, max_results: int) -> Dict[str, Any]:
+    """闭环负载：concurrency 个并发客户端依次发送问题，每个请求完成后立即发送下一个"""
+    import httpx
+
+    latencies: List[float] = []
+    outcomes = {"answered": 0, "empty": 0, "cached": 0, "coalesced": 0, "error": 0}
+    queue = iter(questions)
+
+    async def client_loop(client: "httpx.AsyncClient"):
+        for question in queue:
+            t0 = time.perf_counter()
+            try:
+                response = await client.post("/api/v1/query", json={"question": question, "max_results": max_results})
+                body = response.json()
+                if response.status_code != 200 or body.get("error"):
+                    outcomes["error"] += 1
+                elif body.get("cached"):
+                    outcomes["cached"] += 1
+                elif body.get("coalesced"):
+                    outcomes["coalesced"] += 1
+                elif body.get("retrieved_count"):
+                    outcomes["answered"] += 1
+                else:
+                    outcomes["empty"] += 1
+            except Exception:
+                outcomes["error"] += 1
+            latencies.append(time.perf_counter() - t0)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "query_requests": len(latencies),
+        "query_seconds": elapsed,
+        "query_qps": len(latencies) / elapsed,
+        "query_p50_ms": percentile(latencies, 0.50) * 1000,
+        "query_p95_ms": percentile(latencies, 0.95) * 1000,
+        "query_p99_ms": percentile(latencies, 0.99) * 1000,
+        "query_error_rate": outcomes["error"] / len(latencies) if latencies else 0.0,
+        "query_outcomes": outcomes,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """打印与基线的对比，有回归时返回False"""
+    if baseline.get("config") != results["config"]:
+        print("警告: 基线的测试配置与本次不同，对比结果仅供参考")
+        for key in sorted(set(baseline.get("config", {})) | set(results["config"])):
+            if baseline.get("config", {}).get(key) != results["config"].get(key):
+                print(f"  {key}: 基线 {baseline.get('config', {}).get(key)} / 本次 {results['config'].get(key)}")
+
+    current, previous = results["metrics"], baseline["metrics"]
+    passed = True
+    print(f"{'指标':<24} {'基线':>10} {'本次':>10} {'变化':>8}  结果")
+    for name, direction in METRIC_DIRECTIONS.items():
+        if name not in previous or not previous[name]:
+            continue
+        change = (current[name] - previous[name]) / previous[name]
+        regressed = change < -tolerance if direction == "higher" else change > tolerance
+        passed &= not regressed
+        print(f"{name:<24} {previous[name]:>10.2f} {current[name]:>10.2f} {change:>+8.1%}  {'回归' if regressed else '通过'}")
+
+    error_increase = current["query_error_rate"] - previous.get("query_error_rate", 0.0)
+    regressed = error_increase > MAX_ERROR_RATE_INCREASE
+    passed &= not regressed
+    print(f"{'query_error_rate':<24} {previous.get('query_error_rate', 0.0):>10.3f} "
+          f"{current['query_error_rate']:>10.3f} {error_increase:>+8.3f}  {'回归' if regressed else '通过'}")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线入库吞吐与查询负载测试")
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--paragraphs", type=int, default=30, help="每个文档的段落数")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--warmup-requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-results", type=int, default=5)
+    parser.add_argument("--embedder", choices=["hash", "local", "auto"], default="hash")
+    parser.add_argument("--embed-latency-ms", type=float, default=2.0, help="哈希替身每个文本的模拟计算耗时")
+    parser.add_argument("--llm-latency", type=float, default=0.1, help="LLM替身首个token前的延迟（秒）")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=200.0)
+    parser.add_argument("--llm-answer-tokens", type=int, default=40)
+    parser.add_argument("--vector-backend", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--answer-cache", action="store_true", help="启用语义答案缓存（默认关闭，使每个请求走完整管线）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="把结果写入JSON文件")
+    parser.add_argument("--baseline", default=None)
+    parser.add_argument("--save-baseline", default=None)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="允许的相对退化比例")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="loadtest_")
+    configure_environment(args, workdir)
+
+    # app 模块（包括间接导入 app.config 的基准模块）必须在设置环境变量之后导入
+    from app.main import app
+    from app.services.container import ServiceContainer
+    from app.utils import metrics
+    from benchmarks.fakes import FakeLLM
+
+    embedder = resolve_embedder(args.embedder)
+    install_embedder(embedder, args.embed_latency_ms / 1000)
+
+    rng = random.Random(args.seed)
+    services = ServiceContainer(warmup_passes=1)
+    app.state.services = services
+    metrics.service_stats_collector.bind(services)
+
+    paths = write_documents(os.path.join(workdir, "documents"), args.documents, args.paragraphs, rng)
+    ingest, chunk_texts = run_ingest(services, paths)
+    print(f"入库: {ingest['ingest_documents']} 个文档，{ingest['ingest_chunks']} 个文档块，"
+          f"{ingest['ingest_seconds']:.2f}s（{ingest['ingest_chunks_per_sec']:.1f} 块/s，"
+          f"解析分块 {ingest['ingest_process_seconds']:.2f}s，向量化写入 {ingest['ingest_add_seconds']:.2f}s）")
+
+    # 构建其余服务并预热后再开始计时
+    services.preload()
+    answer = ("根据检索到的文档内容" * args.llm_answer_tokens)[:args.llm_answer_tokens]
+    services.rag_agent.llm = FakeLLM(
+        latency=args.llm_latency,
+        answer=answer,
+        token_interval=1.0 / args.llm_tokens_per_sec if args.llm_tokens_per_sec > 0 else 0.0
+    )
+
+    questions = make_questions(chunk_texts, args.warmup_requests + args.requests, rng)
+    asyncio.run(run_queries(app, questions[:args.warmup_requests], args.concurrency, args.max_results))
+    query = asyncio.run(run_queries(app, questions[args.warmup_requests:], args.concurrency, args.max_results))
+    print(f"查询: {query['query_requests']} 个请求，并发 {args.concurrency}，QPS {query['query_qps']:.1f}，"
+          f"p50 {query['query_p50_ms']:.1f}ms，p95 {query['query_p95_ms']:.1f}ms，p99 {query['query_p99_ms']:.1f}ms，"
+          f"错误率 {query['query_error_rate']:.2%}，结果分布 {query['query_outcomes']}")
+
+    results = {
+        "config": {
+            "documents": args.documents,
+            "paragraphs": args.paragraphs,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "max_results": args.max_results,
+            "embedder": embedder,
+            "embed_latency_ms": args.embed_latency_ms if embedder == "hash" else None,
+            "llm_latency": args.llm_latency,
+            "llm_tokens_per_sec": args.llm_tokens_per_sec,
+            "llm_answer_tokens": args.llm_answer_tokens,
+            "vector_backend": args.vector_backend,
+            "answer_cache": args.answer_cache,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "metrics": {**ingest, **query},
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存: {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(results, baseline, args.tolerance):
+            print("性能回归：超出允许的退化比例")
+            sys.exit(1)
+        print("与基线相比无回归")
+
+
+if __name__ == "__main__":
+    main()
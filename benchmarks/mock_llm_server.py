@@ -0,0 +1,150 @@
+"""
+OpenAI兼容的本地模拟LLM服务，用于测试LLM网关的超时、重试、对冲与并发限制
+
+支持 POST /v1/chat/completions（流式与非流式），可配置：
+- 首token延迟、token生成速率、回答长度
+- 长尾：按比例把首token延迟替换为 --slow-latency
+- 故障：按比例返回429（带 Retry-After）或503
+- 服务端并发上限：超出时返回429，模拟供应商限流
+GET /stats 返回请求、限流与故障计数。
+
+运行: python -m benchmarks.mock_llm_server --port 8901 --latency 0.3 --error-rate 0.05 --max-concurrency 8
+     然后设置 DEEPSEEK_BASE_URL=http://127.0.0.1:8901/v1
+"""
+
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass, asdict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class MockOptions:
+    latency: float = 0.3  # 首个token前的延迟（秒）
+    tokens_per_sec: float = 50.0
+    answer_tokens: int = 40
+    slow_rate: float = 0.0  # 长尾请求比例
+    slow_latency: float = 3.0
+    error_rate: float = 0.0  # 故障比例，429与503各占一半
+    max_concurrency: int = 0  # 服务端并发上限，0表示不限
+    retry_after: float = 1.0
+    seed: int = 42
+
+
+def create_app(options: MockOptions) -> FastAPI:
+    app = FastAPI(title="Mock LLM")
+    rng = random.Random(options.seed)
+    stats = {"requests": 0, "completed": 0, "rate_limited": 0, "server_errors": 0, "slow": 0,
+             "concurrent": 0, "max_concurrent": 0}
+
+    def error_response(status_code: int, message: str) -> JSONResponse:
+        headers = {"retry-after": str(options.retry_after)} if status_code in (429, 503) else None
+        return JSONResponse(
+            status_code=status_code,
+            content={"error": {"message": message, "type": "mock_error", "code": status_code}},
+            headers=headers
+        )
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["requests"] += 1
+
+        if options.max_concurrency and stats["concurrent"] >= options.max_concurrency:
+            stats["rate_limited"] += 1
+            return error_response(429, "Rate limit reached (concurrency)")
+        draw = rng.random()
+        if draw < options.error_rate / 2:
+            stats["rate_limited"] += 1
+            return error_response(429, "Rate limit reached")
+        if draw < options.error_rate:
+            stats["server_errors"] += 1
+            return error_response(503, "Service temporarily unavailable")
+
+        latency = options.latency
+        if rng.random() < options.slow_rate:
+            latency = options.slow_latency
+            stats["slow"] += 1
+        tokens = ["模拟"] * options.answer_tokens
+        interval = 1.0 / options.tokens_per_sec if options.tokens_per_sec > 0 else 0.0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        model = body.get("model", "mock")
+
+        stats["concurrent"] += 1
+        stats["max_concurrent"] = max(stats["max_concurrent"], stats["concurrent"])
+
+        if not body.get("stream"):
+            try:
+                await asyncio.sleep(latency + interval * max(0, len(tokens) - 1))
+            finally:
+                stats["concurrent"] -= 1
+            stats["completed"] += 1
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop"
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+            }
+
+        def chunk(delta, finish_reason=None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def event_stream():
+            try:
+                await asyncio.sleep(latency)
+                yield chunk({"role": "assistant", "content": ""})
+                for i, token in enumerate(tokens):
+                    if i and interval:
+                        await asyncio.sleep(interval)
+                    yield chunk({"content": token})
+                yield chunk({}, "stop")
+                yield "data: [DONE]\n\n"
+                stats["completed"] += 1
+            finally:
+                stats["concurrent"] -= 1
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    async def get_stats():
+        return {**stats, "options": asdict(options)}
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI兼容的模拟LLM服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    for name, value in asdict(MockOptions()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+    args = parser.parse_args()
+
+    options = MockOptions(**{name: getattr(args, name) for name in asdict(MockOptions())})
+    uvicorn.run(create_app(options), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
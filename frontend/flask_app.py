@@ -3,26 +3,18 @@
 基于Flask的智能文档问答系统前端界面
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context
 import requests
 import json
 import os
 import time
-from werkzeug.utils import secure_filename
+from urllib.parse import quote
 
 app = Flask(__name__)
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
 # 配置
 API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:8000/api/v1")
-UPLOAD_FOLDER = 'uploads'
-ALLOWED_EXTENSIONS = {'.pdf', '.docx', '.txt'}
-
-# 确保上传目录存在
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-def allowed_file(filename):
-    return '.' in filename and ('.' + filename.rsplit('.', 1)[1].lower()) in ALLOWED_EXTENSIONS
 
 def call_api(endpoint, method='GET', data=None, files=None):
     """调用后端API"""
@@ -79,43 +71,91 @@ def chat():
     else:
         return jsonify({'error': f'查询失败: {result}'}), 500
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """流式聊天：将后端的Server-Sent Events原样转发给浏览器"""
+    data = request.get_json()
+    question = data.get('question', '').strip()
+    session_id = data.get('session_id', str(int(time.time())))
+
+    if not question:
+        return jsonify({'error': '问题不能为空'}), 400
+
+    try:
+        upstream = requests.post(
+            f"{API_BASE_URL}/query/stream",
+            json={
+                'question': question,
+                'session_id': session_id,
+                'max_results': 5
+            },
+            stream=True
+        )
+    except Exception as e:
+        return jsonify({'error': f'查询失败: {str(e)}'}), 500
+
+    if upstream.status_code != 200:
+        upstream.close()
+        return jsonify({'error': f'查询失败: {upstream.text}'}), 500
+
+    def generate():
+        try:
+            # chunk_size=None：数据到达即转发，不做缓冲
+            for chunk in upstream.iter_content(chunk_size=None):
+                yield chunk
+        finally:
+            upstream.close()
+
+    return Response(
+        stream_with_context(generate()),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
-    """处理文件上传"""
-    if 'file' not in request.files:
-        return jsonify({'error': '没有选择文件'}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
+    """将上传请求体原样流式转发给后端，不在本地落盘或缓冲整个文件"""
+    if not request.mimetype == 'multipart/form-data':
         return jsonify({'error': '没有选择文件'}), 400
-    
-    if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
-        
-        # 发送到后端API
-        try:
-            with open(filepath, 'rb') as f:
-                files = {'file': (filename, f, file.content_type)}
-                success, result = call_api('upload', 'POST', files=files)
-            
-            # 清理临时文件
-            os.remove(filepath)
-            
-            if success:
-                return jsonify(result)
-            else:
-                return jsonify({'error': f'上传失败: {result}'}), 500
-        except Exception as e:
-            return jsonify({'error': f'处理失败: {str(e)}'}), 500
-    
-    return jsonify({'error': '不支持的文件格式'}), 400
+
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return jsonify({'error': '文件大小超过限制'}), 413
+
+    headers = {'Content-Type': request.content_type}
+    if request.content_length:
+        headers['Content-Length'] = str(request.content_length)
+
+    try:
+        # request.stream 未经表单解析，requests 会按块读取并发送
+        response = requests.post(f"{API_BASE_URL}/upload", data=request.stream, headers=headers)
+    except Exception as e:
+        return jsonify({'error': f'处理失败: {str(e)}'}), 500
+
+    if response.status_code == 200:
+        return jsonify(response.json())
+
+    try:
+        detail = response.json().get('detail', response.text)
+    except ValueError:
+        detail = response.text
+    status_code = response.status_code if response.status_code in (400, 413, 429) else 500
+    return jsonify({'error': f'上传失败: {detail}'}), status_code
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """查询入库任务状态"""
+    success, result = call_api(f'jobs/{quote(job_id)}')
+    if success:
+        return jsonify(result)
+    else:
+        return jsonify({'error': f'查询任务失败: {result}'}), 500
 
 @app.route('/api/documents')
 def get_documents():
-    """获取文档信息"""
-    success, result = call_api('documents')
+    """分页获取文档信息"""
+    page = request.args.get('page', 1, type=int)
+    page_size = request.args.get('page_size', 20, type=int)
+    success, result = call_api(f'documents?page={page}&page_size={page_size}')
     if success:
         return jsonify(result)
     else:
@@ -130,10 +170,32 @@ def clear_documents():
     else:
         return jsonify({'error': f'清空失败: {result}'}), 500
 
+@app.route('/api/documents/<document_id>', methods=['DELETE'])
+def delete_document(document_id):
+    """删除单个文档"""
+    success, result = call_api(f'documents/{quote(document_id)}', 'DELETE')
+    if success:
+        return jsonify(result)
+    else:
+        return jsonify({'error': f'删除失败: {result}'}), 500
+
 @app.route('/api/memory/clear', methods=['POST'])
 def clear_memory():
-    """清空对话记忆"""
-    success, result = call_api('memory/clear', 'POST')
+    """清空请求体中session_id对应会话的对话记忆"""
+    data = request.get_json(silent=True) or {}
+    session_id = data.get('session_id')
+    if not session_id:
+        return jsonify({'error': '缺少session_id'}), 400
+    success, result = call_api(f"memory/clear?session_id={quote(session_id)}", 'POST')
+    if success:
+        return jsonify(result)
+    else:
+        return jsonify({'error': f'清空失败: {result}'}), 500
+
+@app.route('/api/memory/clear_all', methods=['POST'])
+def clear_all_memory():
+    """清空全部会话的对话记忆（管理页面使用）"""
+    success, result = call_api('memory/clear_all', 'POST')
     if success:
         return jsonify(result)
     else:
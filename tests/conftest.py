@@ -0,0 +1,46 @@
+"""
+测试公共配置：导入 app 之前把所有持久化路径指向临时目录，嵌入模型替换为哈希嵌入（离线、确定性）
+"""
+
+import os
+import tempfile
+
+import pytest
+
+_DATA_DIR = tempfile.mkdtemp(prefix="rag_tests_")
+os.environ.update({
+    "DEEPSEEK_API_KEY": "test",
+    "CHROMA_DB_PATH": os.path.join(_DATA_DIR, "chroma_db"),
+    "NUMPY_INDEX_PATH": os.path.join(_DATA_DIR, "numpy_index"),
+    "LEXICAL_INDEX_PATH": os.path.join(_DATA_DIR, "lexical_index.db"),
+    "DOCUMENT_REGISTRY_PATH": os.path.join(_DATA_DIR, "document_registry.db"),
+    "CORPUS_VERSION_PATH": os.path.join(_DATA_DIR, "corpus_version.db"),
+    "EMBEDDING_CACHE_PATH": os.path.join(_DATA_DIR, "embeddings.db"),
+    "MEMORY_SQLITE_PATH": os.path.join(_DATA_DIR, "memory.db"),
+    "VECTOR_BACKEND": "numpy",
+    "MEMORY_BACKEND": "memory",
+    "RERANKER": "none",
+    "HISTORY_SUMMARY_ENABLED": "false",
+    "ANONYMIZED_TELEMETRY": "False",
+})
+
+
+@pytest.fixture
+def vector_store_service(monkeypatch):
+    """使用哈希嵌入的真实向量存储（NumPy后端 + 词法索引），每个测试从空集合开始"""
+    import app.services.vector_store as vector_store
+    from benchmarks.fakes import HashingEmbeddings
+
+    monkeypatch.setattr(vector_store, "create_embeddings", lambda model_name: HashingEmbeddings())
+    service = vector_store.VectorStoreService()
+    service.reset_collection()
+    return service
+
+
+@pytest.fixture
+def document_registry():
+    from app.services.document_registry import DocumentRegistry
+
+    registry = DocumentRegistry()
+    registry.clear()
+    return registry
@@ -0,0 +1,139 @@
+import time
+import hashlib
+import threading
+
+import pytest
+
+from app.services.document_processor import DocumentProcessor
+from app.services.ingestion_queue import IngestionJobQueue, JOB_QUEUED, JOB_RUNNING
+
+# 每段长度介于分块大小（CHUNK_SIZE）的一半与分块大小之间且不含空格：每段恰好成为一个文档块
+PARAGRAPHS = [f"第{i}节：" + f"关于第{i}节的说明文字。" * 20 for i in range(10)]
+
+
+def write_file(tmp_path, name: str, paragraphs):
+    path = tmp_path / name
+    path.write_text("\n\n".join(paragraphs), encoding="utf-8")
+    return str(path)
+
+
+def file_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@pytest.fixture
+def ingestion_queue(vector_store_service, document_registry):
+    return IngestionJobQueue(DocumentProcessor(), vector_store_service, document_registry, max_workers=2)
+
+
+def ingest(queue: IngestionJobQueue, *uploads):
+    """提交 (文件路径, 文件名) 并等待全部任务结束"""
+    job_ids = [
+        queue.submit(path, filename, len(open(path, "rb").read()), file_hash(path))["job_id"]
+        for path, filename in uploads
+    ]
+    deadline = time.time() + 30
+    while any(queue.get_job(job_id)["status"] in (JOB_QUEUED, JOB_RUNNING) for job_id in job_ids):
+        assert time.time() < deadline, "入库任务超时"
+        time.sleep(0.02)
+    return [queue.get_job(job_id) for job_id in job_ids]
+
+
+def test_chunk_ids_are_deterministic(tmp_path):
+    processor = DocumentProcessor()
+    path = write_file(tmp_path, "guide.txt", PARAGRAPHS)
+
+    first = processor.process_file(path, "guide.txt")
+    second = processor.process_file(path, "guide.txt")
+
+    document_id = processor.make_document_id("guide.txt")
+    assert len(first) == len(PARAGRAPHS)
+    assert [doc.metadata["chunk_id"] for doc in first] == [doc.metadata["chunk_id"] for doc in second]
+    assert all(doc.metadata["chunk_id"].startswith(document_id) for doc in first)
+
+
+def test_reupload_only_reindexes_changed_chunks(tmp_path, ingestion_queue, vector_store_service, document_registry):
+    [first] = ingest(ingestion_queue, (write_file(tmp_path, "v1.txt", PARAGRAPHS), "guide.txt"))
+    assert first["result"]["chunks_added"] == len(PARAGRAPHS)
+
+    changed = PARAGRAPHS[:3] + ["第3节已更新。" * 30] + PARAGRAPHS[4:] + ["新增的第10节。" * 30]
+    [second] = ingest(ingestion_queue, (write_file(tmp_path, "v2.txt", changed), "guide.txt"))
+
+    result = second["result"]
+    assert (result["chunks_added"], result["chunks_kept"], result["chunks_removed"]) == (2, 9, 1)
+    assert result["document_id"] == first["result"]["document_id"]
+
+    registered = document_registry.get(result["document_id"])
+    assert registered["chunk_ids"] == result["document_ids"]
+    assert vector_store_service.count() == len(changed)
+
+
+def test_concurrent_reuploads_leave_no_orphan_chunks(tmp_path, ingestion_queue, vector_store_service,
+                                                     document_registry):
+    versions = [[f"版本{v} {paragraph}" for paragraph in PARAGRAPHS] for v in range(2)]
+    jobs = ingest(
+        ingestion_queue,
+        *((write_file(tmp_path, f"v{v}.txt", paragraphs), "guide.txt") for v, paragraphs in enumerate(versions))
+    )
+
+    assert all(job["status"] == "completed" for job in jobs)
+    [row] = document_registry.list_documents()
+    assert vector_store_service.count() == len(document_registry.get(row["document_id"])["chunk_ids"])
+
+
+def test_same_content_under_different_names_is_indexed_once(tmp_path, ingestion_queue, vector_store_service,
+                                                             document_registry):
+    jobs = ingest(
+        ingestion_queue,
+        (write_file(tmp_path, "a.txt", PARAGRAPHS), "a.txt"),
+        (write_file(tmp_path, "b.txt", PARAGRAPHS), "b.txt")
+    )
+
+    assert sorted(job["result"]["duplicate"] for job in jobs) == [False, True]
+    assert document_registry.count() == 1
+    assert vector_store_service.count() == len(PARAGRAPHS)
+
+
+def test_delete_document_removes_chunks_and_registry_row(tmp_path, ingestion_queue, vector_store_service,
+                                                         document_registry):
+    [job] = ingest(ingestion_queue, (write_file(tmp_path, "guide.txt", PARAGRAPHS), "guide.txt"))
+    document_id = job["result"]["document_id"]
+
+    deleted = ingestion_queue.delete_document(document_id)
+
+    assert deleted["chunk_ids"] == job["result"]["document_ids"]
+    assert vector_store_service.count() == 0
+    assert document_registry.count() == 0
+    assert ingestion_queue.delete_document(document_id) is None
+
+
+def test_delete_waits_for_reindexing_of_the_same_document(tmp_path, monkeypatch, ingestion_queue,
+                                                          vector_store_service, document_registry):
+    [first] = ingest(ingestion_queue, (write_file(tmp_path, "v1.txt", PARAGRAPHS), "guide.txt"))
+    document_id = first["result"]["document_id"]
+
+    # 让重新入库停在写入新块之前
+    writing, release = threading.Event(), threading.Event()
+    add_documents = vector_store_service.add_documents
+
+    def paused_add_documents(documents, **kwargs):
+        writing.set()
+        release.wait(10)
+        return add_documents(documents, **kwargs)
+
+    monkeypatch.setattr(vector_store_service, "add_documents", paused_add_documents)
+    path = write_file(tmp_path, "v2.txt", [f"新版本 {paragraph}" for paragraph in PARAGRAPHS])
+    job_id = ingestion_queue.submit(path, "guide.txt", len(open(path, "rb").read()), file_hash(path))["job_id"]
+    assert writing.wait(10)
+
+    deleter = threading.Thread(target=ingestion_queue.delete_document, args=(document_id,))
+    deleter.start()
+    deleter.join(0.2)
+    assert deleter.is_alive(), "删除应等待同一文档的入库任务"
+
+    release.set()
+    deleter.join(10)
+    assert ingestion_queue.get_job(job_id)["status"] == "completed"
+    assert document_registry.get(document_id) is None
+    assert vector_store_service.count() == 0
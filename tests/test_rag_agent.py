@@ -0,0 +1,216 @@
+import time
+import asyncio
+import threading
+
+import pytest
+from langchain.schema import Document
+
+from app.services.rag_agent import RAGAgent
+from app.services.answer_cache import SemanticAnswerCache
+from app.services.memory_store import InMemorySessionStore, SQLiteSessionStore
+from app.services.history_compactor import HistoryCompactor
+from app.services.reranker import RerankStage, StubReranker
+from benchmarks.fakes import FakeLLM, FakeVectorStoreService
+
+
+def make_agent(llm_latency: float = 0.0) -> RAGAgent:
+    agent = RAGAgent(FakeVectorStoreService(search_latency=0.0), memory_store=InMemorySessionStore())
+    agent.llm = FakeLLM(latency=llm_latency)
+    return agent
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def memory_store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore(window=2, max_sessions=2)
+    return SQLiteSessionStore(db_path=str(tmp_path / "memory.db"), window=2, max_sessions=2)
+
+
+def test_sessions_are_isolated(memory_store):
+    memory_store.add_turn("alice", "我的订单号是123", "好的")
+
+    assert [m.content for m in memory_store.get_messages("alice")] == ["我的订单号是123", "好的"]
+    assert memory_store.get_messages("bob") == []
+    assert not memory_store.has_history("bob")
+
+
+def test_missing_session_id_is_stateless(memory_store):
+    memory_store.add_turn(None, "问题", "回答")
+
+    assert memory_store.get_history(None) == ("", [])
+    assert not memory_store.has_history(None)
+    assert memory_store.get_stats()["active_sessions"] == 0
+
+
+def test_session_window_and_lru_eviction(memory_store):
+    for i in range(3):
+        memory_store.add_turn("alice", f"问题{i}", f"回答{i}")
+    # 窗口为2轮：只保留最近4条消息
+    assert [m.content for m in memory_store.get_messages("alice")] == ["问题1", "回答1", "问题2", "回答2"]
+
+    memory_store.add_turn("bob", "问题", "回答")
+    memory_store.get_messages("alice")  # alice 成为最近使用
+    memory_store.add_turn("carol", "问题", "回答")
+
+    assert memory_store.has_history("alice")
+    assert memory_store.has_history("carol")
+    assert not memory_store.has_history("bob")
+
+
+def test_anonymous_queries_do_not_share_history():
+    agent = make_agent()
+
+    asyncio.run(agent.aprocess_query("如何申请退款"))
+    second = asyncio.run(agent.aprocess_query("如何申请退款"))
+
+    # 未提供session_id的请求不记录历史，因此仍可命中答案缓存
+    assert agent.memory_store.get_stats()["active_sessions"] == 0
+    assert second["cached"] is True
+    assert agent.llm.calls == 1
+
+
+def test_clear_memory_only_clears_the_given_session():
+    agent = make_agent()
+    for session_id in ("alice", "bob"):
+        agent.memory_store.add_turn(session_id, "问题", "回答")
+
+    with pytest.raises(ValueError):
+        agent.clear_memory(None)
+    agent.clear_memory("alice")
+
+    assert not agent.memory_store.has_history("alice")
+    assert agent.memory_store.has_history("bob")
+
+    agent.clear_all_memory()
+    assert not agent.memory_store.has_history("bob")
+
+
+def test_async_queries_keep_memory_store_calls_off_the_event_loop(tmp_path):
+    class RecordingStore(SQLiteSessionStore):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            self.threads = []
+
+        def add_turn(self, *args):
+            self.threads.append(threading.current_thread())
+            return super().add_turn(*args)
+
+        def get_history(self, *args):
+            self.threads.append(threading.current_thread())
+            return super().get_history(*args)
+
+        def set_summary(self, *args):
+            self.threads.append(threading.current_thread())
+            return super().set_summary(*args)
+
+    store = RecordingStore(db_path=str(tmp_path / "memory.db"), window=5)
+    agent = RAGAgent(FakeVectorStoreService(search_latency=0.0), memory_store=store,
+                     history_compactor=HistoryCompactor(store, enabled=True))
+    agent.llm = FakeLLM(latency=0.0)
+
+    async def run():
+        for i in range(3):
+            await agent.aprocess_query(f"问题{i}", session_id="alice")
+        await asyncio.gather(*agent.history_compactor._tasks)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(run())
+
+    assert agent.history_compactor.summaries_made
+    assert store.threads and loop_thread not in store.threads
+
+
+def test_answer_cache_invalidated_on_corpus_version():
+    agent = make_agent()
+
+    asyncio.run(agent.aprocess_query("如何申请退款", session_id="a"))
+    cached = asyncio.run(agent.aprocess_query("如何申请退款", session_id="b"))
+    assert cached["cached"] is True
+    assert agent.llm.calls == 1
+
+    agent.vector_store_service.corpus_version += 1
+    refreshed = asyncio.run(agent.aprocess_query("如何申请退款", session_id="c"))
+    assert not refreshed.get("cached")
+    assert agent.llm.calls == 2
+
+
+def test_answer_cache_ignores_answers_from_stale_corpus():
+    cache = SemanticAnswerCache(similarity_threshold=0.95, ttl=60, max_entries=4)
+    embedding = [1.0, 0.0, 0.0]
+
+    cache.put(embedding, 5, corpus_version=1, result={"answer": "旧"})
+    assert cache.lookup(embedding, 5, corpus_version=1) == {"answer": "旧"}
+    assert cache.lookup(embedding, 5, corpus_version=2) is None
+
+    # 生成期间语料已更新：基于旧版本的答案不写入
+    cache.put(embedding, 5, corpus_version=1, result={"answer": "旧"})
+    assert cache.lookup(embedding, 5, corpus_version=2) is None
+
+
+def _candidates(count: int):
+    return [(Document(page_content=f"候选{i}", metadata={"chunk_id": f"c{i}"}), 0.1 * i) for i in range(count)]
+
+
+def test_rerank_reorders_within_budget():
+    stage = RerankStage(StubReranker(lambda query, text: float(text[-1])), time_budget_ms=1000)
+
+    reranked = stage.rerank("问题", _candidates(4), top_n=2)
+
+    assert [doc.metadata["chunk_id"] for doc, _ in reranked] == ["c3", "c2"]
+
+
+def test_rerank_falls_back_to_retrieval_order_when_over_budget():
+    def slow_score(query, text):
+        time.sleep(0.1)
+        return float(text[-1])
+
+    stage = RerankStage(StubReranker(slow_score), time_budget_ms=20)
+
+    start = time.perf_counter()
+    reranked = stage.rerank("问题", _candidates(4), top_n=2)
+
+    assert time.perf_counter() - start < 0.2
+    assert [doc.metadata["chunk_id"] for doc, _ in reranked] == ["c0", "c1"]
+
+
+def test_rerank_falls_back_to_retrieval_order_on_error():
+    def failing_score(query, text):
+        raise RuntimeError("模型不可用")
+
+    stage = RerankStage(StubReranker(failing_score), time_budget_ms=1000)
+
+    reranked = stage.rerank("问题", _candidates(4), top_n=2)
+
+    assert [doc.metadata["chunk_id"] for doc, _ in reranked] == ["c0", "c1"]
+
+
+def test_concurrent_identical_queries_are_coalesced():
+    agent = make_agent(llm_latency=0.2)
+    questions = ["如何申请退款", "如何申请退款？", " 如何申请退款 ", "如何申请退款?", "如何申请退款"]
+
+    async def run():
+        return await asyncio.gather(*(
+            agent.aprocess_query(question, session_id=f"user-{i}") for i, question in enumerate(questions)
+        ))
+
+    results = asyncio.run(run())
+
+    assert agent.llm.calls == 1
+    assert sum(1 for result in results if result.get("coalesced")) == len(questions) - 1
+    assert len({result["answer"] for result in results}) == 1
+
+
+def test_queries_with_history_are_not_coalesced():
+    agent = make_agent(llm_latency=0.2)
+    agent.memory_store.add_turn("alice", "之前的问题", "之前的回答")
+
+    async def run():
+        return await asyncio.gather(
+            agent.aprocess_query("如何申请退款", session_id="alice"),
+            agent.aprocess_query("如何申请退款", session_id="bob")
+        )
+
+    results = asyncio.run(run())
+
+    assert agent.llm.calls == 2
+    assert not any(result.get("coalesced") for result in results)
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+from langchain.schema import Document
+
+from app.services.corpus_version import CorpusVersion
+from app.services.embedding_engine import embedding_cache_key
+
+
+def add_chunks(vector_store_service, texts):
+    documents = [
+        Document(page_content=text, metadata={"source": "test.txt", "chunk_id": f"c{i}", "chunk_index": i})
+        for i, text in enumerate(texts)
+    ]
+    vector_store_service.add_documents(documents)
+    return {doc.metadata["chunk_id"]: doc for doc in documents}
+
+
+def test_add_and_delete_bump_corpus_version(vector_store_service):
+    version = vector_store_service.corpus_version
+
+    add_chunks(vector_store_service, ["退款流程说明", "会员价格说明"])
+    assert vector_store_service.count() == 2
+    assert vector_store_service.corpus_version > version
+
+    version = vector_store_service.corpus_version
+    assert vector_store_service.delete_documents(["c0"])
+    assert vector_store_service.count() == 1
+    assert vector_store_service.corpus_version > version
+
+
+def test_corpus_version_is_shared_through_the_data_directory(vector_store_service):
+    version = vector_store_service.corpus_version
+
+    # 另一个进程（同一数据目录）写入了文档
+    CorpusVersion().bump()
+
+    assert vector_store_service.corpus_version == version + 1
+
+
+def test_rrf_ranks_chunks_found_by_both_retrievers_first(vector_store_service, monkeypatch):
+    chunks = add_chunks(vector_store_service, ["甲", "乙", "丙", "丁"])
+    embedding = vector_store_service.embed_query("甲")
+
+    # 稠密检索: c0, c1, c2；词法检索: c2, c0, c3
+    monkeypatch.setattr(
+        vector_store_service, "similarity_search_by_vector_with_score",
+        lambda embedding, k: [(chunks["c0"], 0.1), (chunks["c1"], 0.2), (chunks["c2"], 0.3)]
+    )
+    monkeypatch.setattr(
+        vector_store_service.lexical_index, "search",
+        lambda query, k: [("c2", 3.0), ("c0", 2.0), ("c3", 1.0)]
+    )
+
+    results = vector_store_service.hybrid_search_by_vector_with_score(query="甲", embedding=embedding, k=4)
+
+    # c0: 1/(k+1) + 1/(k+2)，c2: 1/(k+3) + 1/(k+1)，c1: 1/(k+2)，c3: 1/(k+3)
+    assert [doc.metadata["chunk_id"] for doc, _ in results] == ["c0", "c2", "c1", "c3"]
+    # 仅词法命中的块按已存储向量计算余弦距离
+    lexical_only_distance = results[3][1]
+    assert 0.0 <= lexical_only_distance <= 2.0
+
+
+def test_rrf_keeps_top_k(vector_store_service, monkeypatch):
+    chunks = add_chunks(vector_store_service, ["甲", "乙", "丙"])
+    monkeypatch.setattr(
+        vector_store_service, "similarity_search_by_vector_with_score",
+        lambda embedding, k: [(chunks["c1"], 0.2), (chunks["c0"], 0.1)]
+    )
+    monkeypatch.setattr(vector_store_service.lexical_index, "search", lambda query, k: [("c2", 1.0), ("c1", 0.5)])
+
+    results = vector_store_service.hybrid_search_by_vector_with_score(
+        query="乙", embedding=vector_store_service.embed_query("乙"), k=2
+    )
+
+    # c1 两路都命中；c2 词法第1名高于 c0 稠密第2名
+    assert [doc.metadata["chunk_id"] for doc, _ in results] == ["c1", "c2"]
+
+
+def test_embedding_cache_key_separates_quantized_onnx_models():
+    model = "onnx:./models/minilm"
+    quantized = embedding_cache_key(model, SimpleNamespace(model_path="./models/minilm/model_quantized.onnx"))
+    full = embedding_cache_key(model, SimpleNamespace(model_path="./models/minilm/model.onnx"))
+
+    assert quantized != full
+    assert embedding_cache_key("sentence-transformers/x", SimpleNamespace()) == "sentence-transformers/x"
+
+
+def test_score_threshold_only_filters_dense_candidates(vector_store_service, monkeypatch):
+    chunks = add_chunks(vector_store_service, ["甲", "乙", "丙"])
+    monkeypatch.setattr(
+        vector_store_service, "similarity_search_by_vector_with_score",
+        lambda embedding, k: [(chunks["c0"], 0.1), (chunks["c1"], 0.9)]
+    )
+    monkeypatch.setattr(vector_store_service.lexical_index, "search", lambda query, k: [("c2", 5.0)])
+    # 仅词法命中的块（如错误码精确匹配）向量距离很大
+    monkeypatch.setattr(
+        vector_store_service, "_load_with_distance",
+        lambda chunk_ids, embedding: {chunk_id: (chunks[chunk_id], 0.95) for chunk_id in chunk_ids}
+    )
+
+    results = vector_store_service.hybrid_search_by_vector_with_score(
+        query="E1024", embedding=vector_store_service.embed_query("E1024"), k=3, score_threshold=0.6
+    )
+
+    assert sorted(doc.metadata["chunk_id"] for doc, _ in results) == ["c0", "c2"]